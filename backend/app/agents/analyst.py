@@ -1,38 +1,64 @@
-import base64
 import json
 import logging
-import os
 
+from app.agents.preprocessor import imageDataUrl
 from app.models.state import AuraState
-from dotenv import load_dotenv
+from app.services.cache import makeCacheKey, visionCache
+from app.services.deadlines import nodeTimeout
+from app.services.gateway import CircuitOpenError, fallbackReason, llmGateway
+from app.services.metrics import recordFallback
 from langchain_core.messages import HumanMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
 
-load_dotenv()
 logger = logging.getLogger(__name__)
 
 # We use Gemini Vision to analyze dimensions and condition
-llmAnalyst = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    google_api_key=os.getenv("GOOGLE_API_KEY"),
-    temperature=0.0
-)
+ANALYST_MODEL = "gemini-2.5-flash"
+ANALYST_TEMPERATURE = 0.0
+# Bump whenever the vision prompt changes so cached measurements are invalidated
+ANALYST_PROMPT_VERSION = "v1"
 
 
-def anatomicalAnalystNode(state: AuraState) -> AuraState:
+def analystCacheKey(state: AuraState, subject: str) -> str:
+    """
+    Cache key for measurements: image content + subject + prompt version + model.
+    """
+    return makeCacheKey("analyst", state.get("imageHash"), subject,
+                        ANALYST_PROMPT_VERSION, ANALYST_MODEL)
+
+
+def fallbackFeatures(state: AuraState) -> dict:
+    """
+    Default metrics used when vision analysis fails or quota is exceeded.
+    """
+    return {
+        "stumpLengthMm": 150.0,
+        "circumferenceMm": 280.0,
+        "shape": "conical",
+        "type": state.get("limbConfiguration", "Unknown")
+    }
+
+
+async def anatomicalAnalystNode(state: AuraState) -> AuraState:
     """
     Agent: Vision Analyst
     Role: Extracts anatomical features and estimates measurements from the image using Computer Vision (Gemini).
     """
     logger.info("--- 👁️ VISION ANALYST NODE ---")
 
-    current_messages = state.get("messages", [])
-    raw_img = state.get("rawImage")
     subject = state.get("subjectType", "HUMAN")
 
-    if not raw_img:
+    if not state.get("imageBlob") and not state.get("imagePayload"):
         logger.warning("Analyst: No image found, using default data.")
-        return state
+        return {}
+
+    # Same photo already measured? Skip the vision call entirely.
+    cacheKey = analystCacheKey(state, subject)
+    cached = await visionCache.aget(cacheKey)
+    if cached is not None:
+        return {
+            "anatomicalFeatures": cached,
+            "messages": [f"Analyst: Extracted features (cached) - {cached.get('shape')} shape, ~{cached.get('stumpLengthMm')}mm length."]
+        }
 
     # Vision Prompt
     prompt = f"""
@@ -54,44 +80,36 @@ def anatomicalAnalystNode(state: AuraState) -> AuraState:
     features = {}
 
     try:
-        # Properly encode bytes to base64 string
-        if isinstance(raw_img, bytes):
-            b64_str = base64.b64encode(raw_img).decode('utf-8')
-        else:
-            # Assume it might already be base64 string
-            b64_str = str(raw_img)
-
         msg = HumanMessage(
             content=[
                 {"type": "text", "text": prompt},
-                {"type": "image_url", "image_url": f"data:image/jpeg;base64,{b64_str}"}
+                # Shared preprocessed payload (see preprocessor.py)
+                {"type": "image_url", "image_url": await imageDataUrl(state)}
             ]
         )
 
-        response = llmAnalyst.invoke([msg])
+        response = await llmGateway.ainvoke(
+            "analyst", ANALYST_MODEL, [msg],
+            timeout=nodeTimeout(state, "analyst"), imageHash=state.get("imageHash"),
+            temperature=ANALYST_TEMPERATURE)
         content = response.content.replace("```json", "").replace("```", "").strip()
 
         features = json.loads(content)
         logger.info(f"Analyst Extracted: {features}")
+        # Only real measurements are cached, never the fallback below
+        await visionCache.aset(cacheKey, features)
 
-        current_messages.append(
-            f"Analyst: Extracted features - {features.get('shape')} shape, ~{features.get('stumpLengthMm')}mm length.")
+        message = f"Analyst: Extracted features - {features.get('shape')} shape, ~{features.get('stumpLengthMm')}mm length."
 
     except Exception as e:
-        logger.error(f"Analyst Error: {e}", exc_info=True)
-        # Fallback if Gemini fails or quota exceeded
-        features = {
-            "stumpLengthMm": 150.0,
-            "circumferenceMm": 280.0,
-            "shape": "conical",
-            "type": state.get("limbConfiguration", "Unknown")
-        }
-        current_messages.append(
-            "Analyst: Vision analysis failed, using fallback metrics.")
+        logger.error(f"Analyst Error: {e}", exc_info=not isinstance(e, CircuitOpenError))
+        # Fallback if Gemini fails, quota exceeded, the time budget ran out or the circuit is open
+        features = fallbackFeatures(state)
+        recordFallback("analyst")
+        message = f"Analyst: Vision analysis {fallbackReason(e)}, using fallback metrics."
 
+    # Fans out to the image-generation and engineering branches (see graph.py)
     return {
-        **state,
         "anatomicalFeatures": features,
-        "messages": current_messages,
-        "nextStep": "prompt_engineer" # Explicitly routing to next step
+        "messages": [message]
     }
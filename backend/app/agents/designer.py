@@ -1,88 +1,159 @@
+import asyncio
 import os
-import time
 
-import numpy as np
+from app.geometry.jobs import socketJob
+from app.geometry.store import meshStore
+from app.geometry.structural import preferredMaterial
 from app.models.state import AuraState
+from app.services.artifacts import PREVIEW_EXTENSION, artifactStore
+from app.services.mesh_pool import meshPool
+from app.services.metrics import meshTriangles
 from dotenv import load_dotenv
-from stl import mesh
 
 load_dotenv()
 
+# "parametric": loft every socket from the measurements
+# "library":    scale the nearest template from assets/base_models (falls back to parametric)
+SOCKET_SOURCE = os.getenv("SOCKET_SOURCE", "parametric")
+DEFAULT_WALL_THICKNESS_MM = 5.0
+# Extra wall added on top of the measured deficit when the safety audit sends a design back
+WALL_THICKNESS_MARGIN_MM = 0.5
+
 # Note: llmWriter moved to technical_writer.py
 
 
-def designEngineerNode(state: AuraState) -> AuraState:
+def retryWallThickness(state: AuraState) -> float:
+    """
+    Wall thickness for this run: the default, or, after a failed safety audit,
+    the previous wall plus the measured deficit (and a margin). Walls too weak for the
+    activities are thickened by the mesh job itself (see app/geometry/jobs.py).
+    """
+    audit = state.get("meshAudit") or {}
+    parameters = state.get("designParameters", {})
+    previous = parameters.get("wallThicknessMm", DEFAULT_WALL_THICKNESS_MM)
+    wall = DEFAULT_WALL_THICKNESS_MM
+    if audit and audit.get("thinVertexCount", 0) > 0:
+        deficit = max(audit["requiredThicknessMm"] - audit["minThicknessMm"], 0.0)
+        wall = round(previous + deficit + WALL_THICKNESS_MARGIN_MM, 2)
+    return wall
+
+
+def storePreviews(previews: list) -> list:
+    """
+    Stores the mesh job's preview LODs as artifacts; returns what the viewer needs per level.
+    """
+    stored = []
+    for preview in previews:
+        artifact = artifactStore.put(preview["data"], PREVIEW_EXTENSION)
+        stored.append({
+            "level": preview["level"],
+            "url": artifact["webPath"],
+            "triangles": preview["triangles"],
+            "vertices": preview["vertices"],
+            "bytes": artifact["size"],
+        })
+    return stored
+
+
+def measurement(features: dict, key: str, default: float) -> float:
+    """
+    Reads a numeric measurement from the analyst output (LLM values may be strings or missing).
+    """
+    try:
+        value = float(features.get(key, default))
+        return value if value > 0 else default
+    except (TypeError, ValueError):
+        return default
+
+
+async def designEngineerNode(state: AuraState) -> AuraState:
     """
     Agent: Biomechanical Engineer
-    Role: Generates STL file AND a DIY assembly guide.
+    Role: Generates the parametric socket STL from the anatomical measurements.
     """
     print("--- 📐 DESIGN ENGINEER NODE ---")
     features = state["anatomicalFeatures"]
-    stumpLength = features.get("stumpLengthMm", 150.0)
+    stumpLength = measurement(features, "stumpLengthMm", 150.0)
+    circumference = measurement(features, "circumferenceMm", 280.0)
+    shape = str(features.get("shape", "conical")).strip("'\" ").lower()
     subject = state.get("subjectType", "HUMAN")
+    attempts = state.get("designAttempts", 0) + 1
 
     # --- PART 1: STL GENERATION ---
     parameters = {
-        "material": "TPU" if "Run" in state.get("activityLevel", []) else "PLA",
-        "wallThicknessMm": 5.0,
+        # Replaced by the structural estimate's choice once the mesh exists
+        "material": preferredMaterial(state.get("activityLevel", [])),
+        "wallThicknessMm": retryWallThickness(state) if attempts > 1 else DEFAULT_WALL_THICKNESS_MM,
         "density": "Variable"
     }
 
-    currentMessages = state["messages"]
+    currentMessages = []
     webPath = ""
+    previewMeshes = []
 
     try:
-        # Load Base Model
-        # PRO TIP: You should have different base models for Animals vs Humans
-        base_asset = "base_socket.stl"
-
-        baseModelPath = os.path.join(os.path.dirname(
-            __file__), "..", "..", "assets", "base_models", base_asset)
-
-        if not os.path.exists(baseModelPath):
-            # Checking fallback for dev environment
-            # If assets/base_models doesn't exist, we create a dummy cube for the demo
-            print(f"Base model not found at {baseModelPath}, creating dummy...")
-
-            # Create a simple cube using numpy-stl logic if file missing
-            data = np.zeros(6, dtype=mesh.Mesh.dtype)
-            your_mesh = mesh.Mesh(data, remove_empty_areas=False)
-            # (Mock mesh creation omitted for brevity, usually we'd load a file)
-            # Let's assume the file exists or handle error gracefully
-            pass
-
-        # Loading logic (Placeholder for robust mesh loading)
-        # your_mesh = mesh.Mesh.from_file(baseModelPath)
-
-        # Saving Dummy Output for connection test
-        outputDir = os.path.join(os.path.dirname(__file__), "..", "..", "output")
-        os.makedirs(outputDir, exist_ok=True)
-
-        timestamp = int(time.time())
-        filename = f"prosthesis_{subject}_{timestamp}.stl"
-        outputPath = os.path.join(outputDir, filename)
-
-        # Mock save if mesh not loaded
-        with open(outputPath, 'w') as f:
-            f.write("Solid STL ASCII...")  # Dummy header
+        # Written under a temp name, then stored under its content hash (no collisions, dedup)
+        outputPath = artifactStore.tempPath(".stl")
+
+        # Geometry + export run in the mesh worker pool (CPU-bound, off the event loop)
+        result = await meshPool.run(socketJob, {
+            "stumpLengthMm": stumpLength,
+            "circumferenceMm": circumference,
+            "shape": shape,
+            "wallThicknessMm": parameters["wallThicknessMm"],
+            "outputPath": outputPath,
+            # A template that failed the audit would fail again: loft it on retries
+            "source": SOCKET_SOURCE if attempts == 1 else "parametric",
+            "subjectType": subject,
+            "limbConfiguration": state.get("limbConfiguration", ""),
+            "activityLevel": state.get("activityLevel", []),
+        })
+        structural = result["structural"]
+        parameters["wallThicknessMm"] = result["wallThicknessMm"]
+        parameters["triangleCount"] = result["triangleCount"]
+        parameters["material"] = structural["material"]
+        parameters["structural"] = structural
+        parameters["print"] = result["print"]
+        meshTriangles.observe(result["triangleCount"])
+        if result["baseModel"]:
+            parameters["baseModel"] = result["baseModel"]
+
+        artifact = await asyncio.to_thread(artifactStore.commit, outputPath, ".stl")
+        previewMeshes = await asyncio.to_thread(storePreviews, result["previews"])
 
         # Relative path for frontend
-        webPath = f"outputs/{filename}"
+        webPath = artifact["webPath"]
+        meshStore.remember(webPath, result["vertices"], result["faces"])
+        currentMessages.append(
+            f"Designer: Generated STL for {subject} at {stumpLength}mm "
+            f"({shape}, {parameters['triangleCount']} triangles, "
+            f"{parameters['wallThicknessMm']}mm wall, attempt {attempts}).")
+        if "strengthenedFromMm" in structural:
+            currentMessages.append(
+                f"Designer: Wall thickened from {structural['strengthenedFromMm']:g}mm to "
+                f"{structural['wallThicknessMm']:g}mm for {structural['governingLoadCase']} loads.")
+        currentMessages.append(
+            f"Designer: {structural['material']} safety factor {structural['safetyFactor']} under "
+            f"{structural['governingLoadCase']} loads (required {structural['requiredSafetyFactor']:g}, "
+            f"peak {structural['peakStressMpa']} MPa, {structural['elapsedMs']} ms).")
+        printing = result["print"]
         currentMessages.append(
-            f"Designer: Generated STL for {subject} at {stumpLength}mm.")
+            f"Designer: Print estimate {printing['massG']} g {printing['material']}, ${printing['costUsd']}, "
+            f"{printing['printTimeH']} h ({printing['layers']} layers at {printing['layerHeightMm']:g}mm).")
 
     except Exception as e:
         print(f"Design Error: {e}")
         webPath = "error_generating_file"
+        previewMeshes = []
 
     # --- PART 2: OUTPUT ---
     # The drafting logic has been moved to technical_writer.py
 
     return {
-        **state,
         "designParameters": parameters,
         # "designReasoning": ... (Handled by Writer now)
         "stlPath": webPath,
-        "nextStep": "safety",
+        "previewMeshes": previewMeshes,
+        "designAttempts": attempts,
         "messages": currentMessages
     }
@@ -0,0 +1,138 @@
+import asyncio
+import base64
+import io
+import logging
+import os
+
+from app.models.state import AuraState
+from app.services.blobs import blobStore
+from dotenv import load_dotenv
+from PIL import Image, ImageOps
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Longest edge sent to the vision models; phone photos are usually 3-4x larger
+IMAGE_MAX_EDGE_PX = int(os.getenv("IMAGE_MAX_EDGE_PX", "1536"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+
+def sniffMimeType(data: bytes) -> str:
+    """
+    Detects the real image type from magic bytes (uploads are often mislabeled).
+    """
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[4:8] == b"ftyp" and data[8:12] in (b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1"):
+        return "image/heic"
+    return "application/octet-stream"
+
+
+def preprocessImage(imageBlob: dict) -> dict:
+    """
+    Normalizes an uploaded photo for the vision agents:
+    applies EXIF orientation, strips metadata, downscales to IMAGE_MAX_EDGE_PX
+    and re-encodes as JPEG into the blob store. Formats Pillow cannot decode
+    (e.g. HEIC without a plugin) are passed through untouched with their sniffed MIME type.
+    The upload is decoded straight from its blob file, never read whole into memory.
+    """
+    sourceMime = sniffMimeType(blobStore.head(imageBlob))
+
+    try:
+        img = Image.open(blobStore.path(imageBlob["blobId"]))
+        # JPEG: let the decoder downscale in the DCT domain (much cheaper than a full decode)
+        img.draft("RGB", (IMAGE_MAX_EDGE_PX, IMAGE_MAX_EDGE_PX))
+        img = ImageOps.exif_transpose(img)
+
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        img.thumbnail((IMAGE_MAX_EDGE_PX, IMAGE_MAX_EDGE_PX), Image.Resampling.LANCZOS)
+
+        out = io.BytesIO()
+        # No exif/icc arguments: metadata is dropped on re-encode
+        img.save(out, format="JPEG", quality=IMAGE_JPEG_QUALITY)
+        encoded = blobStore.put(out.getvalue())
+
+        return {
+            "mimeType": "image/jpeg",
+            "blobId": encoded["blobId"],
+            "sourceMimeType": sourceMime,
+            "width": img.width,
+            "height": img.height,
+            "sourceBytes": imageBlob["size"],
+            "encodedBytes": encoded["size"],
+        }
+
+    except Exception as e:
+        logger.warning(f"Preprocessor: Could not decode image ({sourceMime}), sending original. {e}")
+        return {
+            "mimeType": sourceMime if sourceMime != "application/octet-stream" else "image/jpeg",
+            "blobId": imageBlob["blobId"],
+            "sourceMimeType": sourceMime,
+            "sourceBytes": imageBlob["size"],
+            "encodedBytes": imageBlob["size"],
+        }
+
+
+async def imageDataUrl(state: AuraState) -> str:
+    """
+    Returns the data URL the vision agents send to Gemini, encoded on demand from the blob store.
+    Uses the shared preprocessed payload; encodes the raw upload only if preprocessing did not run.
+    The blob read and base64 encoding run in a thread, off the event loop.
+    """
+    return await asyncio.to_thread(_encodeDataUrl, state)
+
+
+def _encodeDataUrl(state: AuraState) -> str:
+    payload = state.get("imagePayload")
+    if payload:
+        data = blobStore.read(payload)
+        mimeType = payload["mimeType"]
+    else:
+        imageBlob = state.get("imageBlob")
+        if not imageBlob:
+            raise ValueError("No image data provided in state")
+        data = blobStore.read(imageBlob)
+        mimeType = sniffMimeType(data)
+    return f"data:{mimeType};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+async def preprocessorNode(state: AuraState) -> AuraState:
+    """
+    Agent: Preprocessor
+    Role: Runs once per request to produce the single preprocessed image (a blob handle) shared by all vision agents.
+    """
+    logger.info("--- 🖼️ PREPROCESSOR NODE ---")
+
+    imageBlob = state.get("imageBlob")
+    if not imageBlob:
+        return {}
+
+    # Already preprocessed before the run (batch vision pass, see app/batch.py)
+    payload = state.get("imagePayload")
+    if payload and blobStore.exists(payload):
+        return {"messages": [f"Preprocessor: Reusing preprocessed {payload['mimeType']} "
+                             f"{payload['encodedBytes'] // 1024}KB."]}
+
+    # Decoding/resizing is CPU work: keep it off the event loop
+    payload = await asyncio.to_thread(preprocessImage, imageBlob)
+
+    return {
+        "imagePayload": payload,
+        "messages": [
+            f"Preprocessor: {payload['sourceMimeType']} {payload['sourceBytes'] // 1024}KB -> "
+            f"{payload['mimeType']} {payload['encodedBytes'] // 1024}KB."
+        ]
+    }
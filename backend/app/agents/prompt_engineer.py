@@ -1,32 +1,82 @@
 import os
+import random
 
 from app.models.state import AuraState
+from app.services.cache import makeCacheKey, textCache
+from app.services.deadlines import nodeTimeout
+from app.services.gateway import llmGateway
+from app.services.metrics import recordFallback
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
 
 load_dotenv()
 
-llmPrompter = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",  # Using Flash to save quota, but still 2.5 smarts
-    google_api_key=os.getenv("GOOGLE_API_KEY"),
-    temperature=0.7
-)
+PROMPTER_MODEL = "gemini-2.5-flash"  # Using Flash to save quota, but still 2.5 smarts
+PROMPTER_TEMPERATURE = 0.7
+# Bump whenever the meta-prompt changes so cached prompts are invalidated
+PROMPTER_PROMPT_VERSION = "v1"
+# Requests without user notes reuse generated prompts for identical inputs.
+# PROMPT_CACHE_VARIETY = distinct prompts kept per input: 1 always serves the same one,
+# N > 1 keeps generating until N are cached, then picks one at random; 0 disables the cache
+PROMPT_CACHE_VARIETY = int(os.getenv("PROMPT_CACHE_VARIETY", "1"))
+PROMPT_CACHE_TTL_S = float(os.getenv("PROMPT_CACHE_TTL_S", str(24 * 3600)))
+# Measurements only steer the look of the render: coarse steps keep similar stumps on one entry
+PROMPT_MEASUREMENT_STEP_MM = 10
 
 
-def promptEngineerNode(state: AuraState) -> AuraState:
+def promptFeatures(features: dict) -> dict:
+    """
+    The anatomical features that matter for an image prompt, normalized.
+    """
+    normalized = {"shape": str(features.get("shape", "conical")).strip("'\" ").lower()}
+    for key in ("stumpLengthMm", "circumferenceMm"):
+        try:
+            normalized[key] = int(round(float(features[key]) / PROMPT_MEASUREMENT_STEP_MM) * PROMPT_MEASUREMENT_STEP_MM)
+        except (KeyError, TypeError, ValueError):
+            pass
+    return normalized
+
+
+def promptCacheKey(subject: str, limbConfig: str, features: dict, activities: str) -> str:
+    return makeCacheKey("prompt_engineer", subject, limbConfig, features, activities,
+                        PROMPTER_PROMPT_VERSION, PROMPTER_MODEL)
+
+
+def fallbackPrompt(subject: str, limbConfig: str, userNotes: str) -> str:
+    """
+    Template prompt used when the model call fails or runs out of time.
+    """
+    subject = (subject or "HUMAN").lower()
+    prompt = (f"Photorealistic studio product shot of a futuristic {limbConfig} prosthesis "
+              f"for a {subject}, carbon fiber and titanium, voronoi patterns, soft lighting")
+    return f"{prompt}, {userNotes}" if userNotes else prompt
+
+
+async def promptEngineerNode(state: AuraState) -> AuraState:
     """
     Agent: Prompt Engineer
     Role: Crafts valid, high-quality prompts for the Image Generation Agent.
     """
     print("--- ✍️ PROMPT ENGINEER NODE ---")
 
-    # Gather Context
-    subject = state.get("subjectType", "HUMAN")
-    features = state.get("anatomicalFeatures", {})
-    activities = ", ".join(state.get("activityLevel", []))
-    userNotes = state.get("userNotes", "")
-    limbConfig = state.get("limbConfiguration", "Prosthesis")
+    # Gather Context (normalized, so equivalent requests share cache entries)
+    subject = str(state.get("subjectType") or "HUMAN").strip().upper()
+    features = promptFeatures(state.get("anatomicalFeatures", {}))
+    activities = ", ".join(sorted({a.strip().title() for a in state.get("activityLevel", []) if a.strip()}))
+    userNotes = (state.get("userNotes") or "").strip()
+    limbConfig = (state.get("limbConfiguration") or "Prosthesis").strip()
+
+    # Free-form user requests are never memoized: every such prompt is generated
+    cacheKey = None
+    cachedPrompts = []
+    if not userNotes and PROMPT_CACHE_VARIETY > 0:
+        cacheKey = promptCacheKey(subject, limbConfig, features, activities)
+        cachedPrompts = await textCache.aget(cacheKey) or []
+        if len(cachedPrompts) >= PROMPT_CACHE_VARIETY:
+            return {
+                "visualPrompt": random.choice(cachedPrompts),
+                "messages": ["Prompt Engineer: Creative prompt generated (cached)."]
+            }
 
     # Construct Meta-Prompt
     system_instruction = """
@@ -50,19 +100,26 @@ def promptEngineerNode(state: AuraState) -> AuraState:
     Create a prompt for a standalone product shot of this prosthesis.
     """
 
-    response = llmPrompter.invoke([
-        SystemMessage(content=system_instruction),
-        HumanMessage(content=user_context)
-    ])
+    try:
+        response = await llmGateway.ainvoke("prompt_engineer", PROMPTER_MODEL, [
+            SystemMessage(content=system_instruction),
+            HumanMessage(content=user_context)
+        ], timeout=nodeTimeout(state, "prompt_engineer"), temperature=PROMPTER_TEMPERATURE)
 
-    generated_prompt = response.content.strip()
+        generated_prompt = response.content.strip()
+        message = "Prompt Engineer: Creative prompt generated."
+        if cacheKey and generated_prompt and generated_prompt not in cachedPrompts:
+            await textCache.aset(cacheKey, (cachedPrompts + [generated_prompt])[-PROMPT_CACHE_VARIETY:],
+                          ttlSeconds=PROMPT_CACHE_TTL_S)
 
-    currentMessages = state["messages"]
-    currentMessages.append("Prompt Engineer: Creative prompt generated.")
+    except Exception as e:
+        print(f"Prompt Engineer Error: {e}")
+        # Fallback: plain template so the visualizer still gets a usable prompt
+        generated_prompt = fallbackPrompt(subject, limbConfig, userNotes)
+        recordFallback("prompt_engineer")
+        message = "Prompt Engineer: Model unavailable, using template prompt."
 
     return {
-        **state,
         "visualPrompt": generated_prompt,
-        "nextStep": "visualizer",
-        "messages": currentMessages
+        "messages": [message]
     }
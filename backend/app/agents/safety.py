@@ -1,35 +1,108 @@
+import asyncio
+import os
+
+from app.geometry.jobs import auditJob
+from app.geometry.store import meshStore
 from app.models.state import AuraState
-from langgraph.graph import END
+from app.services.mesh_pool import meshPool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MIN_WALL_THICKNESS_MM = float(os.getenv("MIN_WALL_THICKNESS_MM", "3.0"))
+# Designer runs allowed per request (first design + loop-backs from this node)
+MAX_DESIGN_ATTEMPTS = int(os.getenv("MAX_DESIGN_ATTEMPTS", "3"))
 
 
-def safetyAuditorNode(state: AuraState) -> AuraState:
+def retryOrStop(attempts: int, errorMsg: str, audit: dict = None) -> dict:
+    """
+    Sends the design back to the designer while attempts remain, otherwise blocks release.
+    """
+    update = {"meshAudit": audit} if audit is not None else {}
+    if attempts < MAX_DESIGN_ATTEMPTS:
+        return {
+            **update,
+            "safetyNotes": [errorMsg],
+            "nextStep": "design",  # Loop back
+            "messages": [f"Safety: {errorMsg} Sending back to design (attempt {attempts}/{MAX_DESIGN_ATTEMPTS})."]
+        }
+    return {
+        **update,
+        "safetyNotes": [f"{errorMsg} Design rejected after {attempts} attempts; do not print this file."],
+        "nextStep": "end",
+        "messages": [f"Safety: {errorMsg} Retry budget exhausted ({attempts}/{MAX_DESIGN_ATTEMPTS}). Release blocked."]
+    }
+
+
+async def safetyAuditorNode(state: AuraState) -> AuraState:
     """
     Agent: Safety Auditor
-    Role: Reviews parameters and image context before final release.
+    Role: Audits the generated socket geometry (real wall thickness, watertight,
+    manifold) and its estimated strength under the selected activities before final release.
     """
     print("--- 🦺 SAFETY AUDITOR NODE ---")
-    designParams = state.get("designParameters", {})
-    thickness = designParams.get("wallThicknessMm", 0)
-    currentMessages = state["messages"]
-    safetyNotes = state.get("safetyNotes", [])
-
-    # Check rule: Thickness < 3mm is unsafe
-    if thickness < 3.0:
-        errorMsg = "Critical: Wall thickness insufficient (< 3mm)."
-        safetyNotes.append(errorMsg)
-        currentMessages.append(f"Safety: {errorMsg} Sending back to design.")
+    attempts = state.get("designAttempts", 1)
+    stlPath = state.get("stlPath") or ""
+
+    loaded = await asyncio.to_thread(meshStore.get, stlPath) if stlPath.endswith(".stl") else None
+    if loaded is None:
+        return retryOrStop(attempts, "Critical: No socket mesh was generated.")
+
+    vertices, faces = loaded
+    try:
+        # Ray casting over ~100k triangles: runs in the mesh worker pool, off the event loop
+        audit = await meshPool.run(auditJob, vertices, faces, MIN_WALL_THICKNESS_MM)
+    except Exception as e:
+        # Geometry audit unavailable: fall back to the nominal design parameter
+        print(f"Safety Audit Error: {e}")
+        thickness = state.get("designParameters", {}).get("wallThicknessMm", 0)
+        if thickness < MIN_WALL_THICKNESS_MM:
+            return retryOrStop(attempts, f"Critical: Wall thickness insufficient (< {MIN_WALL_THICKNESS_MM:g}mm).")
         return {
-            **state,
-            "safetyNotes": safetyNotes,
-            "nextStep": "design",  # Loop back
-            "messages": currentMessages
+            "safetyNotes": ["Warning: Geometric audit unavailable; approved on nominal wall thickness only."],
+            "nextStep": "technical_writer",
+            "messages": [f"Safety: Geometric audit failed ({e}). Approved on nominal parameters."]
+        }
+
+    if not (audit["isWatertight"] and audit["isManifold"]):
+        # A thicker wall will not repair topology: block release straight away
+        errorMsg = (f"Critical: Mesh is not printable ({audit['boundaryEdges']} open edges, "
+                    f"{audit['nonManifoldEdges']} non-manifold edges).")
+        return {
+            "meshAudit": audit,
+            "safetyNotes": [errorMsg],
+            "nextStep": "end",
+            "messages": [f"Safety: {errorMsg} Release blocked."]
         }
 
-    currentMessages.append("Safety: Design approved. Ready for documentation.")
+    if audit["thinVertexCount"] > 0:
+        worst = audit["thinRegions"][0] if audit["thinRegions"] else {}
+        errorMsg = (f"Critical: Wall thickness insufficient ({audit['minThicknessMm']}mm < "
+                    f"{MIN_WALL_THICKNESS_MM:g}mm at {worst.get('centerMm', audit['minThicknessAtMm'])}, "
+                    f"{len(audit['thinRegions'])} thin region(s)).")
+        return retryOrStop(attempts, errorMsg, audit)
+
+    structural = state.get("designParameters", {}).get("structural")
+    if structural and not structural["passes"]:
+        errorMsg = (f"Critical: Estimated safety factor {structural['safetyFactor']} < "
+                    f"{structural['requiredSafetyFactor']:g} under {structural['governingLoadCase']} loads "
+                    f"({structural['material']}, {structural['wallThicknessMm']}mm wall, peak "
+                    f"{structural['peakStressMpa']} MPa at {structural['peakAtMm']}).")
+        # The mesh job already lofted the thinnest wall the estimate found strong enough:
+        # another design pass cannot fix it
+        reason = ("The strengthened wall still fails" if structural["achievable"]
+                  else "No candidate material or wall passes")
+        return {
+            "meshAudit": audit,
+            "safetyNotes": [f"{errorMsg} {reason}; do not print this file."],
+            "nextStep": "end",
+            "messages": [f"Safety: {errorMsg} Release blocked."]
+        }
 
+    strength = f", safety factor {structural['safetyFactor']}" if structural else ""
     return {
-        **state,
-        "safetyNotes": safetyNotes,
+        "meshAudit": audit,
         "nextStep": "technical_writer",
-        "messages": currentMessages
+        "messages": [f"Safety: Design approved (min wall {audit['minThicknessMm']}mm, watertight, manifold"
+                     f"{strength}). Ready for documentation."]
     }
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+
+from app.agents.analyst import anatomicalAnalystNode
+from app.agents.validator import validatorNode
+from app.models.state import AuraState
+from app.services.metrics import speculations
+
+logger = logging.getLogger(__name__)
+
+# Outcome counters for speculative analyst runs (VISION_MODE=speculative)
+#   started      -> analyst launched alongside the validator
+#   committed    -> validator approved, speculative result used
+#   cancelled    -> validator rejected while the analyst was still in flight
+#   discarded    -> validator rejected after the analyst had already finished (wasted call)
+#   mispredicted -> subject type guess was wrong, analyst re-run with the real one
+# (also exported as biostride_speculative_analyst_runs_total on GET /metrics)
+speculationStats = {"started": 0, "committed": 0, "cancelled": 0, "discarded": 0, "mispredicted": 0}
+
+
+def countSpeculation(outcome: str):
+    speculationStats[outcome] += 1
+    speculations.inc(outcome=outcome)
+
+
+async def speculativeVisionNode(state: AuraState) -> AuraState:
+    """
+    Agent: Validator + Vision Analyst (speculative)
+    Role: Starts the analyst at the same time as the validator, assuming the image will pass.
+    The analyst result is committed on approval and cancelled/discarded on rejection,
+    removing one vision-model latency from the critical path of accepted requests.
+    """
+    logger.info("--- ⚡ SPECULATIVE VISION NODE ---")
+
+    # The analyst prompt depends on the subject type, which only the validator knows.
+    # Guess the common case; a wrong guess costs one extra analyst call.
+    guessedSubject = state.get("subjectType") or "HUMAN"
+    analystTask = asyncio.create_task(anatomicalAnalystNode({**state, "subjectType": guessedSubject}))
+    countSpeculation("started")
+
+    try:
+        validation = await validatorNode(state)
+
+        if not validation.get("isValidLimb"):
+            if analystTask.done():
+                countSpeculation("discarded")
+            else:
+                analystTask.cancel()
+                countSpeculation("cancelled")
+            logger.info(f"Speculation rolled back: {speculationStats}")
+            return validation
+
+        subjectType = validation.get("subjectType", "HUMAN")
+        if subjectType != guessedSubject:
+            analystTask.cancel()
+            countSpeculation("mispredicted")
+            analysis = await anatomicalAnalystNode({**state, **validation})
+        else:
+            analysis = await analystTask
+            countSpeculation("committed")
+
+    finally:
+        if not analystTask.done():
+            analystTask.cancel()
+
+    return {
+        **validation,
+        **analysis,
+        "nextStep": "branches",  # Fan out to image generation + engineering
+        "messages": validation.get("messages", []) + analysis.get("messages", [])
+    }
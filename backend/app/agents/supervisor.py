@@ -1,17 +1,24 @@
 from app.models.state import AuraState
 
 
-def supervisorNode(state: AuraState) -> AuraState:
+async def supervisorNode(state: AuraState) -> AuraState:
     """
     Agent: Supervisor (Entry Point)
-    Role: Receives request and routes to first validation step.
+    Role: Receives request and routes to image preprocessing, then validation.
+    On a re-design of an existing session, routes straight to the branches
+    whose inputs changed (see app/services/sessions.py).
     """
     print("--- 🤖 SUPERVISOR NODE ---")
-    currentMessages = state.get("messages", [])
-    currentMessages.append("Supervisor: Workflow started. Routing to Validator.")
+    redesign = state.get("redesignSteps") or []
+    if redesign:
+        return {
+            "nextStep": redesign[0] if len(redesign) == 1 else "branches",
+            "redesignSteps": [],
+            "messages": [f"Supervisor: Re-design requested. Re-running {', '.join(redesign)} "
+                         "with the stored vision results."]
+        }
 
     return {
-        **state,
-        "nextStep": "validate",
-        "messages": currentMessages
+        "nextStep": "preprocess",
+        "messages": ["Supervisor: Workflow started. Routing to Preprocessor."]
     }
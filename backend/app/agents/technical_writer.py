@@ -1,32 +1,64 @@
 import os
 
 from app.models.state import AuraState
+from app.services.cache import makeCacheKey, textCache
+from app.services.deadlines import nodeTimeout
+from app.services.gateway import llmGateway
+from app.services.metrics import recordFallback
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
 
 load_dotenv()
 
 # We use the text model to generate the guide
-llmWriter = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    google_api_key=os.getenv("GOOGLE_API_KEY")
-)
+WRITER_MODEL = "gemini-2.5-flash"
+# Bump whenever guide_prompt changes so cached guides are invalidated
+WRITER_PROMPT_VERSION = "v1"
+# The guide depends only on subject, activities, material and wall: same inputs, same guide
+WRITER_CACHE_TTL_S = float(os.getenv("WRITER_CACHE_TTL_S", str(30 * 24 * 3600)))
 
 
-def technicalWriterNode(state: AuraState) -> AuraState:
+def writerInputs(state: AuraState) -> dict:
+    """
+    Normalized writer inputs: equivalent requests (activity order, case, float noise)
+    map to one prompt and one cache entry.
+    """
+    parameters = state.get("designParameters", {})
+    activities = state.get("activityLevel") or []
+    if isinstance(activities, str):
+        activities = [activities]
+    return {
+        "subject": str(state.get("subjectType") or "HUMAN").strip().upper(),
+        "activities": sorted({str(activity).strip().title() for activity in activities if str(activity).strip()}),
+        "material": str(parameters.get("material", "PLA")).strip(),
+        "wallThicknessMm": round(float(parameters.get("wallThicknessMm", 5.0)), 1),
+    }
+
+
+def writerCacheKey(inputs: dict) -> str:
+    return makeCacheKey("technical_writer", inputs, WRITER_PROMPT_VERSION, WRITER_MODEL)
+
+
+async def technicalWriterNode(state: AuraState) -> AuraState:
     """
     Agent: Technical Writer / Advisor
     Role: Analyzes the engineering parameters and writes a user-friendly guide and technical reasoning in Spanish.
     """
     print("--- ✍️ TECHNICAL WRITER NODE ---")
 
-    subject = state.get("subjectType", "HUMAN")
-    activity_level = state.get("activityLevel", "Unknown")
+    inputs = writerInputs(state)
+    subject = inputs["subject"]
+    activity_level = ", ".join(inputs["activities"]) or "Unknown"
     # We take the parameters decided by the Engineer
     parameters = state.get("designParameters", {})
-    material_engineer = parameters.get("material", "PLA")
-    thickness_engineer = parameters.get("wallThicknessMm", 5.0)
+    material_engineer = inputs["material"]
+    thickness_engineer = inputs["wallThicknessMm"]
+
+    # Same inputs already written up? Serve the guide without a model call.
+    cacheKey = writerCacheKey(inputs)
+    cached = await textCache.aget(cacheKey)
+    if cached is not None:
+        return writerResult(parameters, cached, cached=True)
 
     # --- DIY GUIDE GENERATION AND REASONING ---
     guide_prompt = f"""
@@ -50,7 +82,8 @@ def technicalWriterNode(state: AuraState) -> AuraState:
     """
 
     try:
-        response = llmWriter.invoke([HumanMessage(content=guide_prompt)])
+        response = await llmGateway.ainvoke("technical_writer", WRITER_MODEL, [HumanMessage(content=guide_prompt)],
+                                            timeout=nodeTimeout(state, "technical_writer"))
         content = response.content
 
         # Robust Parsing
@@ -77,25 +110,54 @@ def technicalWriterNode(state: AuraState) -> AuraState:
 
         if guide_lines:
             assembly_guide = "\n".join(guide_lines).strip()
+            # Only complete answers are cached, never the fallback below
+            await textCache.aset(cacheKey, {
+                "reasoning": reasoning,
+                "primaryMaterial": primary_mat,
+                "alternativeMaterial": alt_mat,
+                "assemblyGuide": assembly_guide,
+            }, ttlSeconds=WRITER_CACHE_TTL_S)
 
     except Exception as e:
         print(f"Writer Error: {e}")
+        recordFallback("technical_writer")
         reasoning = "Error en el análisis."
         primary_mat = material_engineer
         alt_mat = "N/A"
         assembly_guide = "No guide available."
 
+    return writerResult(parameters, {
+        "reasoning": reasoning,
+        "primaryMaterial": primary_mat,
+        "alternativeMaterial": alt_mat,
+        "assemblyGuide": assembly_guide,
+    })
+
+
+def printSection(parameters: dict) -> str:
+    """
+    Print estimate from the designer (app/geometry/printing.py), appended to the guide.
+    Built from numbers, not by the model, so cached guides stay valid for every mesh.
+    """
+    printing = parameters.get("print")
+    if not printing:
+        return ""
+    return (
+        "\n\n### Estimación de impresión\n"
+        f"- Material: {printing['material']} · ~{printing['massG']:g} g · ~{printing['costUsd']:.2f} USD de filamento\n"
+        f"- Tiempo estimado: ~{printing['printTimeH']:g} h ({printing['layers']} capas de "
+        f"{printing['layerHeightMm']:g} mm, relleno {printing['infill'] * 100:.0f}%)"
+    )
+
+
+def writerResult(parameters: dict, written: dict, cached: bool = False) -> dict:
     # We update the state with the enriched text data
     # Note: We preserve the numerical parameters from the engineer
-    currentMessages = state.get("messages", [])
-    currentMessages.append("Writer: Technical guide and reasoning generated.")
-
     return {
-        **state,
-        "designReasoning": reasoning,
+        "designReasoning": written["reasoning"],
         # We can update the material name if the writer gives a more specific one (e.g., "TPU Shore 95A")
-        "designParameters": {**parameters, "material": primary_mat},
-        "alternativeMaterial": alt_mat,
-        "assemblyGuide": assembly_guide,
-        "messages": currentMessages
+        "designParameters": {**parameters, "material": written["primaryMaterial"]},
+        "alternativeMaterial": written["alternativeMaterial"],
+        "assemblyGuide": written["assemblyGuide"] + printSection(parameters),
+        "messages": [f"Writer: Technical guide and reasoning generated{' (cached)' if cached else ''}."]
     }
@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+
+from app.agents.analyst import analystCacheKey, fallbackFeatures
+from app.agents.preprocessor import imageDataUrl
+from app.agents.validator import validatorCacheKey
+from app.models.state import AuraState
+from app.services.cache import makeCacheKey, visionCache
+from app.services.deadlines import nodeTimeout
+from app.services.gateway import llmGateway
+from app.services.metrics import recordFallback
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Single-pass mode (VISION_MODE=combined): validation + measurements in one multimodal call
+TRIAGE_MODEL = "gemini-2.5-flash"
+TRIAGE_TEMPERATURE = 0.0
+# Bump when the prompt changes (invalidates cached triage results)
+TRIAGE_PROMPT_VERSION = "v1"
+# Serve cached validator/analyst results to triage and the other way round. Off by default:
+# the prompts differ, so sharing mixes the two modes' measurements (e.g. in an A/B comparison)
+TRIAGE_SHARE_CACHE = os.getenv("TRIAGE_SHARE_CACHE", "false").lower() in ("1", "true", "yes")
+
+MEASUREMENT_KEYS = ("stumpLengthMm", "circumferenceMm", "shape", "skinTone", "visualCondition")
+
+
+def triageCacheKey(state: AuraState) -> str:
+    """
+    Cache key for a combined decision + measurements: image content + prompt version + model.
+    """
+    return makeCacheKey("triage", state.get("imageHash"), TRIAGE_PROMPT_VERSION, TRIAGE_MODEL)
+
+
+async def cachedTriage(state: AuraState):
+    """
+    Cached (isValid, subjectType, features, reason), or None. With TRIAGE_SHARE_CACHE the
+    split path's validator + analyst entries count too.
+    """
+    cached = await visionCache.aget(triageCacheKey(state))
+    if cached is not None:
+        return cached["isValidLimb"], cached["subjectType"], cached["features"], cached["reason"]
+    if not TRIAGE_SHARE_CACHE:
+        return None
+    decision = await visionCache.aget(validatorCacheKey(state))
+    if decision is None:
+        return None
+    if not decision["isValidLimb"]:
+        return False, decision["subjectType"], {}, decision["reason"]
+    features = await visionCache.aget(analystCacheKey(state, decision["subjectType"]))
+    if features is None:
+        return None
+    return True, decision["subjectType"], features, decision["reason"]
+
+
+async def storeTriage(state: AuraState, isValid: bool, subjectType: str, features: dict, reason: str):
+    await visionCache.aset(triageCacheKey(state), {
+        "isValidLimb": isValid, "subjectType": subjectType, "features": features, "reason": reason})
+    if TRIAGE_SHARE_CACHE:
+        await visionCache.aset(validatorCacheKey(state),
+                               {"isValidLimb": isValid, "subjectType": subjectType, "reason": reason})
+        if isValid:
+            await visionCache.aset(analystCacheKey(state, subjectType), features)
+
+
+def triageResult(isValid: bool, subjectType: str, features: dict, reason: str, cached: bool = False) -> dict:
+    """
+    Builds the state update for a combined triage decision (fresh or cached).
+    """
+    suffix = " (cached)" if cached else ""
+    if not isValid:
+        return {
+            "isValidLimb": False,
+            "nextStep": "end",
+            "messages": [f"Triage: REJECTED{suffix}. {reason}"],
+            "safetyNotes": ["Image rejected: No valid amputation or prosthetic context found."]
+        }
+    return {
+        "isValidLimb": True,
+        "subjectType": subjectType,
+        "anatomicalFeatures": features,
+        "nextStep": "branches",  # Fan out to image generation + engineering
+        "messages": [
+            f"Triage: Approved{suffix}. Subject identified as {subjectType}. "
+            f"Extracted features - {features.get('shape')} shape, ~{features.get('stumpLengthMm')}mm length."
+        ]
+    }
+
+
+async def triageNode(state: AuraState) -> AuraState:
+    """
+    Agent: Triage + Measure (combined Validator and Vision Analyst)
+    Role: Decides if the image is a valid prosthetic case AND extracts measurements in a single Gemini call.
+    """
+    logger.info("--- 🩺 TRIAGE NODE (combined) ---")
+
+    try:
+        if not state.get("imageBlob") and not state.get("imagePayload"):
+            raise ValueError("No image data provided in state")
+
+        cached = await cachedTriage(state)
+        if cached is not None:
+            return triageResult(*cached, cached=True)
+
+        promptText = """
+        You are an expert biomechanical triage agent and prosthetic fitting analyst. Analyze this image.
+
+        1. Does this image show a biological subject (human or animal) with a missing limb, amputation stump,
+           or a context clearly requiring a prosthetic device?
+        2. Identify the subject type: "HUMAN" or "ANIMAL".
+        3. If (1) is YES, estimate the anatomical features of the limb/stump based on visual proportions
+           (assume standard reference).
+
+        Output JSON ONLY:
+        {
+            "decision": "<YES|NO>",
+            "subjectType": "<HUMAN|ANIMAL>",
+            "reason": "<brief explanation>",
+            "stumpLengthMm": <estimated_number or null>,
+            "circumferenceMm": <estimated_number or null>,
+            "shape": "<'conical'|'cylindrical'|'bulbous'|'irregular'>",
+            "skinTone": "<description>",
+            "visualCondition": "<healthy|scarred|swollen>"
+        }
+        """
+
+        message = HumanMessage(
+            content=[
+                {"type": "text", "text": promptText},
+                {"type": "image_url", "image_url": {"url": await imageDataUrl(state)}}
+            ]
+        )
+
+        response = await llmGateway.ainvoke("triage", TRIAGE_MODEL, [message],
+                                            timeout=nodeTimeout(state, "triage"), imageHash=state.get("imageHash"),
+                                            temperature=TRIAGE_TEMPERATURE)
+        content = response.content.replace("```json", "").replace("```", "").strip()
+        result = json.loads(content)
+
+        isValid = str(result.get("decision", "NO")).upper() == "YES"
+        subjectType = "ANIMAL" if str(result.get("subjectType", "")).upper() == "ANIMAL" else "HUMAN"
+        reason = result.get("reason", "")
+
+        if not isValid:
+            await storeTriage(state, False, subjectType, {}, reason)
+            return triageResult(False, subjectType, {}, reason)
+
+        features = {key: result[key] for key in MEASUREMENT_KEYS if result.get(key) is not None}
+        if features.get("stumpLengthMm") and features.get("circumferenceMm"):
+            await storeTriage(state, True, subjectType, features, reason)
+        else:
+            # Approved but unmeasurable: same fallback as the analyst
+            features = fallbackFeatures(state)
+            recordFallback("triage")
+
+        return triageResult(True, subjectType, features, reason)
+
+    except Exception as e:
+        logger.error(f"Triage Error: {e}", exc_info=True)
+        recordFallback("triage")
+        # Default fail-safe (same as the validator)
+        return {
+            "nextStep": "end",
+            "messages": [f"Triage: System Error {e}"]
+        }
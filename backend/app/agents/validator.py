@@ -1,36 +1,62 @@
-import base64
-import os
-
+from app.agents.preprocessor import imageDataUrl
 from app.models.state import AuraState
-from dotenv import load_dotenv
+from app.services.cache import makeCacheKey, visionCache
+from app.services.deadlines import nodeTimeout
+from app.services.gateway import llmGateway
+from app.services.metrics import recordFallback
 from langchain_core.messages import HumanMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
 
-load_dotenv()
+# Specialized model settings for validation (client is shared, see services/llm.py)
+VALIDATOR_MODEL = "gemini-2.5-flash"
+VALIDATOR_TEMPERATURE = 0.0
+# Bump whenever promptText changes so cached decisions are invalidated
+VALIDATOR_PROMPT_VERSION = "v1"
+
+
+def validatorCacheKey(state: AuraState) -> str:
+    """
+    Cache key for a validation decision: image content + prompt version + model.
+    """
+    return makeCacheKey("validator", state.get("imageHash"),
+                        VALIDATOR_PROMPT_VERSION, VALIDATOR_MODEL)
+
 
-# Initialize specialized model instance for validation
-llmValidator = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    google_api_key=os.getenv("GOOGLE_API_KEY"),
-    temperature=0.0
-)
+def validationResult(isValid: bool, subjectType: str, content: str, cached: bool = False) -> dict:
+    """
+    Builds the state update for a validation decision (fresh or cached).
+    """
+    suffix = " (cached)" if cached else ""
+    if isValid:
+        return {
+            "isValidLimb": True,
+            "subjectType": subjectType,
+            "nextStep": "analyst",  # Go to measurements
+            "messages": [f"Validator: Approved{suffix}. Subject identified as {subjectType}."]
+        }
+    return {
+        "isValidLimb": False,
+        "nextStep": "end",
+        "messages": [f"Validator: REJECTED{suffix}. {content}"],
+        "safetyNotes": ["Image rejected: No valid amputation or prosthetic context found."]
+    }
 
 
-def validatorNode(state: AuraState) -> AuraState:
+async def validatorNode(state: AuraState) -> AuraState:
     """
     Agent: Validator (Bouncer)
     Role: Checks if the image contains a valid limb, stump, or subject (Human/Animal) suitable for a prosthesis.
     """
     print("--- 🛡️ VALIDATOR NODE ---")
-    currentMessages = state.get("messages", [])
 
     try:
-        raw_img = state.get("rawImage")
-        if not raw_img:
+        if not state.get("imageBlob") and not state.get("imagePayload"):
             raise ValueError("No image data provided in state")
 
-        # Encode image for Gemini
-        img_base64 = base64.b64encode(raw_img).decode("utf-8")
+        # Same photo already triaged? Skip the vision call entirely.
+        cacheKey = validatorCacheKey(state)
+        cached = await visionCache.aget(cacheKey)
+        if cached is not None:
+            return validationResult(cached["isValidLimb"], cached["subjectType"], cached["reason"], cached=True)
 
         # Expanded prompt to include animals as requested
         promptText = """
@@ -49,43 +75,33 @@ def validatorNode(state: AuraState) -> AuraState:
         message = HumanMessage(
             content=[
                 {"type": "text", "text": promptText},
-                {"type": "image_url", "image_url": {
-                    "url": f"data:image/jpeg;base64,{img_base64}"}}
+                # Shared preprocessed payload (see preprocessor.py)
+                {"type": "image_url", "image_url": {"url": await imageDataUrl(state)}}
             ]
         )
 
-        response = llmValidator.invoke([message])
+        response = await llmGateway.ainvoke(
+            "validator", VALIDATOR_MODEL, [message],
+            timeout=nodeTimeout(state, "validator"), imageHash=state.get("imageHash"),
+            temperature=VALIDATOR_TEMPERATURE)
         content = response.content.strip()
 
         # Simple parsing
         decision = "YES" if "DECISION: YES" in content else "NO"
         subjectType = "ANIMAL" if "TYPE: ANIMAL" in content else "HUMAN"
 
-        if decision == "YES":
-            currentMessages.append(
-                f"Validator: Approved. Subject identified as {subjectType}.")
-            return {
-                **state,
-                "isValidLimb": True,
-                "subjectType": subjectType,
-                "nextStep": "analyst",  # Go to measurements
-                "messages": currentMessages
-            }
-        else:
-            currentMessages.append(f"Validator: REJECTED. {content}")
-            return {
-                **state,
-                "isValidLimb": False,
-                "nextStep": "end",
-                "messages": currentMessages,
-                "safetyNotes": ["Image rejected: No valid amputation or prosthetic context found."]
-            }
+        await visionCache.aset(cacheKey, {
+            "isValidLimb": decision == "YES",
+            "subjectType": subjectType,
+            "reason": content
+        })
+        return validationResult(decision == "YES", subjectType, content)
 
     except Exception as e:
         print(f"Validation Error: {e}")
+        recordFallback("validator")
         # Default fail-safe
         return {
-            **state,
             "nextStep": "end",
-            "messages": currentMessages + [f"Validator: System Error {e}"]
+            "messages": [f"Validator: System Error {e}"]
         }
@@ -1,17 +1,35 @@
+import asyncio
 import logging
-import os
-import uuid
-from pathlib import Path
 
 from app.models.state import AuraState
+from app.services.artifacts import artifactStore
+from app.services.deadlines import nodeTimeout
+from app.services.gateway import CircuitOpenError, llmGateway
+from app.services.llm import isImageBackendConfigured
+from app.services.metrics import recordFallback
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-def visualizerNode(state: AuraState) -> AuraState:
+VISUALIZER_MODEL = "gemini-2.5-flash-image"
+
+
+def storeImage(part) -> dict:
+    """
+    Decodes a generated image part and stores it as a PNG artifact (blocking: run in a thread).
+    """
+    # part.as_image() returns a PIL Image
+    img = part.as_image()
+
+    # Written to a temp file, then stored under its content hash
+    output_path = artifactStore.tempPath(".png")
+    img.save(output_path)
+    return artifactStore.commit(output_path, ".png")
+
+
+async def visualizerNode(state: AuraState) -> AuraState:
     """
     Agent: Visualizer (Image Generator)
     Role: Uses Gemini 2.5 Flash Image (Nano Banana) to generate prosthetic previews.
@@ -25,46 +43,33 @@ def visualizerNode(state: AuraState) -> AuraState:
     logger.info("--- 🎨 VISUALIZER NODE (Nano Banana) ---")
 
     prompt = state.get("visualPrompt", "")
-    current_messages = state.get("messages", [])
-
-    # Configuration for Gemini (Nano Banana)
-    GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
     generated_url = ""
 
-    if GOOGLE_API_KEY:
+    # Gemini (Nano Banana) needs an API key; the fake backend (LLM_BACKEND=fake) does not
+    if isImageBackendConfigured():
         try:
             logger.info(f"Sending prompt to Gemini Nano Banana: {prompt[:50]}...")
 
-            client = genai.Client(api_key=GOOGLE_API_KEY)
-
-            response = client.models.generate_content(
-                model="gemini-2.5-flash-image",
+            # Shared client via the gateway (rate limits + coalescing, see services/gateway.py)
+            response = await llmGateway.generateContent(
+                "visualizer",
+                VISUALIZER_MODEL,
                 contents=[prompt],
                 config=types.GenerateContentConfig(
                     response_modalities=['IMAGE']
-                )
+                ),
+                timeout=nodeTimeout(state, "visualizer")
             )
 
             if response.parts:
                 for part in response.parts:
                     if part.inline_data:
-                        # part.as_image() returns a PIL Image
-                        img = part.as_image()
-
-                        # Configure Output Path using Pathlib
-                        # Logic: From agents/visualizer.py -> app/agents -> backend/app -> backend/
-                        base_dir = Path(__file__).resolve().parent.parent.parent
-                        output_dir = base_dir / "output"
-                        output_dir.mkdir(parents=True, exist_ok=True)
-                        
-                        filename = f"gen_{uuid.uuid4().hex}.png"
-                        output_path = output_dir / filename
-
-                        img.save(output_path)
-
-                        generated_url = f"/outputs/{filename}"
-                        logger.info(f"Image generated successfully: {filename}")
+                        # PNG decode/encode + content hash: off the event loop
+                        artifact = await asyncio.to_thread(storeImage, part)
+
+                        generated_url = f"/{artifact['webPath']}"
+                        logger.info(f"Image generated successfully: {artifact['name']}")
                         break  # Only save the first image
 
             if not generated_url:
@@ -72,8 +77,9 @@ def visualizerNode(state: AuraState) -> AuraState:
                 raise ValueError("No image part in response")
 
         except Exception as e:
-            logger.error(f"Visualizer API Error: {e}", exc_info=True)
+            logger.error(f"Visualizer API Error: {e}", exc_info=not isinstance(e, CircuitOpenError))
             generated_url = "/static/mock_prosthesis_human.png"
+            recordFallback("visualizer")
     else:
         logger.warning("No GOOGLE_API_KEY found. Using Mock.")
         if state.get("subjectType") == "ANIMAL":
@@ -81,12 +87,8 @@ def visualizerNode(state: AuraState) -> AuraState:
         else:
             generated_url = "/static/mock_prosthesis_human.png"
 
-    current_messages.append("Visualizer: Prosthetic preview generated.")
-
     return {
-        **state,
         "prosthesisImageUrl": generated_url,
         "tryOnImageUrl": generated_url,
-        "nextStep": "designer",
-        "messages": current_messages
+        "messages": ["Visualizer: Prosthetic preview generated."]
     }
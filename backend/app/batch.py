@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.agents.analyst import anatomicalAnalystNode
+from app.agents.preprocessor import preprocessorNode
+from app.agents.speculative import speculativeVisionNode
+from app.agents.triage import triageNode
+from app.agents.validator import validatorNode
+from app.graph import VISION_MODE
+from app.services.cache import makeCacheKey
+from app.services.deadlines import newDeadline
+from app.services.jobs import JobQueueFullError, SlotReservation, jobQueue
+from app.streaming import formatSseEvent
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Most photos accepted by one POST /api/process-batch call
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+# Vision passes + design runs a single batch may have in flight (0 = one per job queue worker).
+# Design runs also take a job queue slot, so batches never exceed the server-wide JOB_WORKERS.
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "0"))
+# Bulk intake yields to interactive requests in the job queue
+BATCH_PRIORITY = os.getenv("BATCH_PRIORITY", "low")
+# A full job queue makes batch items wait (backing off up to the max), never fail
+BATCH_QUEUE_BACKOFF_S = float(os.getenv("BATCH_QUEUE_BACKOFF_S", "0.5"))
+BATCH_QUEUE_BACKOFF_MAX_S = float(os.getenv("BATCH_QUEUE_BACKOFF_MAX_S", "10"))
+
+# Per-item options accepted in the `items` form field
+ITEM_OPTIONS = ("limbConfig", "activity", "notes")
+
+RunItem = Callable[[Dict[str, Any], Optional[Dict[str, Any]]], Awaitable[Dict[str, Any]]]
+
+
+def parseBatchItems(itemsJson: str, count: int, defaults: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Per-item options for `count` images: `itemsJson` is a JSON list (one object per image,
+    in upload order) of {"limbConfig", "activity", "notes"}; missing keys use `defaults`.
+    Raises ValueError for malformed input.
+    """
+    if not itemsJson.strip():
+        return [dict(defaults) for _ in range(count)]
+
+    try:
+        items = json.loads(itemsJson)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"items is not valid JSON: {e}") from None
+    if not isinstance(items, list) or len(items) != count:
+        raise ValueError(f"items must be a list with one entry per image ({count})")
+
+    options = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"items[{index}] must be an object")
+        unknown = set(item) - set(ITEM_OPTIONS)
+        if unknown:
+            raise ValueError(f"items[{index}] has unknown keys: {', '.join(sorted(unknown))}")
+        merged = {**defaults, **item}
+        if isinstance(merged["activity"], str):
+            merged["activity"] = [merged["activity"]]
+        if not isinstance(merged["activity"], list):
+            raise ValueError(f"items[{index}].activity must be a list of strings")
+        options.append(merged)
+    return options
+
+
+def designKey(item: Dict[str, Any]) -> str:
+    """
+    Items with the same image and the same options produce the same design: run it once.
+    """
+    return makeCacheKey(item["imageBlob"]["blobId"], item["limbConfig"], sorted(item["activity"]), item["notes"])
+
+
+async def runVisionStage(imageBlob: Dict[str, Any], visionMode: str = VISION_MODE) -> Dict[str, Any]:
+    """
+    Preprocesses one image and runs the vision agents of `visionMode` on it, outside the graph.
+    Their results land in the vision cache (keyed by image hash), so every design run for
+    this image skips straight past the model calls. Returns the vision part of the state.
+    """
+    state: Dict[str, Any] = {"imageBlob": imageBlob, "imageHash": imageBlob["blobId"], "deadline": newDeadline()}
+    state.update(await preprocessorNode(state))
+
+    if visionMode == "combined":
+        state.update(await triageNode(state))
+    elif visionMode == "speculative":
+        state.update(await speculativeVisionNode(state))
+    else:
+        state.update(await validatorNode(state))
+        if state.get("isValidLimb"):
+            state.update(await anatomicalAnalystNode(state))
+    return state
+
+
+async def queueSlot(priority: str = BATCH_PRIORITY) -> SlotReservation:
+    """
+    Joins the job queue, waiting with exponential backoff while it is full
+    (interactive requests get a 429 instead; bulk intake can wait its turn).
+    """
+    delay = BATCH_QUEUE_BACKOFF_S
+    while True:
+        if jobQueue.queued < jobQueue.queueLimit:
+            try:
+                slot = jobQueue.reserve(priority)
+                slot.enqueue()
+                return slot
+            except JobQueueFullError:
+                pass  # Filled up in between
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, BATCH_QUEUE_BACKOFF_MAX_S)
+
+
+async def batchDesignEvents(items: List[Dict[str, Any]], runItem: RunItem,
+                            concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[str]:
+    """
+    Runs a batch of design items and yields SSE frames as they finish.
+
+    Identical images get one vision pass; identical (image, options) items get one
+    design run whose result is sent for each of them. All vision passes and design
+    runs share `concurrency` (plus the job queue's worker limit for design runs); design
+    runs wait while the job queue is full instead of failing.
+    `runItem(item, imagePayload)` runs one design and returns its response state.
+
+    Events:
+        accepted -> {items, uniqueImages, uniqueDesigns, concurrency}
+        vision   -> {imageHash, indices, isValidLimb, subjectType, durationMs}
+        item     -> {index, filename, status: done|failed, durationMs, duplicateOf?, result|error}
+        done     -> {items, succeeded, failed, elapsedMs}
+    """
+    started = time.perf_counter()
+    concurrency = max(1, concurrency or jobQueue.workers)
+    budget = asyncio.Semaphore(concurrency)
+    # (SSE frame, whether it is an item result) in completion order
+    frames: asyncio.Queue = asyncio.Queue()
+    counts = {"done": 0, "failed": 0}
+
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    images: Dict[str, List[Dict[str, Any]]] = {}
+    for item in items:
+        groups.setdefault(designKey(item), []).append(item)
+        images.setdefault(item["imageBlob"]["blobId"], []).append(item)
+
+    async def visionPass(imageHash: str) -> Optional[Dict[str, Any]]:
+        startedAt = time.perf_counter()
+        async with budget:
+            try:
+                vision = await runVisionStage(images[imageHash][0]["imageBlob"])
+            except Exception as e:
+                # The design runs fall back to the graph's own vision stage
+                logger.error(f"Batch vision pass failed for {imageHash[:12]}: {e}", exc_info=True)
+                return None
+        frames.put_nowait((formatSseEvent("vision", {
+            "imageHash": imageHash,
+            "indices": [item["index"] for item in images[imageHash]],
+            "isValidLimb": vision.get("isValidLimb"),
+            "subjectType": vision.get("subjectType"),
+            "durationMs": round((time.perf_counter() - startedAt) * 1000, 1),
+        }), False))
+        return vision.get("imagePayload")
+
+    async def designRun(group: List[Dict[str, Any]], vision: asyncio.Task):
+        first = group[0]
+        imagePayload = await vision
+        startedAt = time.perf_counter()
+        try:
+            async with budget:
+                async with await queueSlot():
+                    result = await runItem(first, imagePayload)
+            outcome = {"status": "done", "result": result}
+        except Exception as e:
+            logger.error(f"Batch item {first['index']} failed: {e}", exc_info=True)
+            outcome = {"status": "failed", "error": str(e)}
+
+        durationMs = round((time.perf_counter() - startedAt) * 1000, 1)
+        counts[outcome["status"]] += len(group)
+        for item in group:
+            frame = {"index": item["index"], "filename": item["filename"], "durationMs": durationMs}
+            if item is not first:
+                frame["duplicateOf"] = first["index"]
+            frames.put_nowait((formatSseEvent("item", {**frame, **outcome}), True))
+
+    yield formatSseEvent("accepted", {
+        "items": len(items),
+        "uniqueImages": len(images),
+        "uniqueDesigns": len(groups),
+        "concurrency": concurrency,
+    })
+
+    # Vision passes are queued on the budget first, so the whole batch is seen by the
+    # vision models before design runs compete with it for slots
+    visionTasks = {imageHash: asyncio.create_task(visionPass(imageHash)) for imageHash in images}
+    tasks = list(visionTasks.values()) + [
+        asyncio.create_task(designRun(group, visionTasks[group[0]["imageBlob"]["blobId"]]))
+        for group in groups.values()
+    ]
+
+    try:
+        sentItems = 0
+        while sentItems < len(items):
+            frame, isItem = await frames.get()
+            sentItems += isItem
+            yield frame
+
+        yield formatSseEvent("done", {
+            "items": len(items),
+            "succeeded": counts["done"],
+            "failed": counts["failed"],
+            "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+        })
+    finally:
+        # Client went away (or the batch finished): stop anything still running
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,237 @@
+import os
+from typing import Any, Dict, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.geometry.socket import vertexNormals
+
+load_dotenv()
+
+# Rays stop at this multiple of the required thickness (cost grows with ray length)
+AUDIT_MAX_DISTANCE_FACTOR = float(os.getenv("AUDIT_MAX_DISTANCE_FACTOR", "2.0"))
+
+# Upper bound on hook/compress rounds when grouping thin vertices into regions
+_MAX_REGION_ROUNDS = 64
+# Hits closer than this to the ray origin are treated as the origin's own surface
+_MIN_HIT_MM = 1e-3
+
+
+def _triangleGrid(tri: np.ndarray, origin: np.ndarray, dims: np.ndarray, cell: float, pad: float):
+    """
+    Uniform grid over triangle bounding boxes (dilated by `pad`).
+    Returns (sorted cell keys, first index per key, triangles per key, triangle ids in key order).
+    """
+    lo = np.floor((tri.min(axis=1) - pad - origin) / cell).astype(np.int64)
+    hi = np.floor((tri.max(axis=1) + pad - origin) / cell).astype(np.int64)
+    extent = hi - lo + 1
+    counts = extent.prod(axis=1)
+
+    # Expand every triangle into the cells its box covers, without a Python loop
+    triIds = np.repeat(np.arange(len(tri)), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    ex = extent[triIds, 0]
+    ey = extent[triIds, 1]
+    ix = lo[triIds, 0] + local % ex
+    iy = lo[triIds, 1] + (local // ex) % ey
+    iz = lo[triIds, 2] + local // (ex * ey)
+    keys = (ix * dims[1] + iy) * dims[2] + iz
+
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    triIds = triIds[order]
+    # Run-length encode the sorted keys (cheaper than np.unique on millions of entries)
+    boundary = np.flatnonzero(np.diff(keys)) + 1
+    starts = np.concatenate([[0], boundary])
+    cellCounts = np.diff(np.concatenate([starts, [len(keys)]]))
+    cellKeys = keys[starts]
+    return cellKeys, starts, cellCounts, triIds
+
+
+def rayThickness(vertices: np.ndarray, faces: np.ndarray, directions: np.ndarray,
+                 maxDistance: float, cellSize: Optional[float] = None) -> np.ndarray:
+    """
+    Casts one ray per vertex along `directions` and returns the distance to the first
+    non-incident triangle hit (np.inf if nothing is hit within `maxDistance`).
+
+    Fully batched: a uniform grid narrows each ray to the triangles in the cells it
+    crosses, then plane + barycentric tests run once over all (ray, triangle) pairs.
+    """
+    cell = cellSize or max(maxDistance / 4.0, 1e-3)
+    step = 0.25 * cell
+    # Samples every `step` are within step/2 of any point on the ray: dilate boxes by that
+    # much (plus a little slack for float32 rounding of the sample positions)
+    pad = 0.5 * step + 1e-3 * cell
+    origin = vertices.min(axis=0) - pad - maxDistance
+
+    # Grid spans the mesh plus the longest ray, so every ray sample lands inside it
+    dims = np.floor((vertices.max(axis=0) + pad + maxDistance - origin) / cell).astype(np.int64) + 1
+    tri = vertices[faces]
+    cellKeys, starts, cellCounts, triIds = _triangleGrid(tri, origin, dims, cell, pad)
+
+    # Cells visited by each ray; a straight ray never re-enters a cell, so repeats are consecutive
+    samples = np.arange(0.0, maxDistance + step, step, dtype=np.float32)
+    start = ((vertices - origin) / cell).astype(np.float32)
+    slope = (directions / cell).astype(np.float32)
+    keys = np.zeros((len(vertices), len(samples)), dtype=np.int64)
+    for axis in range(3):
+        keys *= dims[axis]
+        keys += np.floor(start[:, axis, None] + slope[:, axis, None] * samples).astype(np.int64)
+    keep = np.ones(keys.shape, dtype=bool)
+    keep[:, 1:] = keys[:, 1:] != keys[:, :-1]
+    rayIds = np.broadcast_to(np.arange(len(vertices))[:, None], keys.shape)[keep]
+    keys = keys[keep]
+
+    pos = np.minimum(np.searchsorted(cellKeys, keys), len(cellKeys) - 1)
+    occupied = cellKeys[pos] == keys
+    rayIds, pos = rayIds[occupied], pos[occupied]
+
+    # Expand (ray, cell) into (ray, triangle) candidates. A triangle spanning several
+    # cells may be tested more than once for a ray; minimum.at below makes that harmless.
+    n = cellCounts[pos]
+    candRay = np.repeat(rayIds.astype(np.int32), n)
+    runOffset = (np.cumsum(n) - n - starts[pos]).astype(np.int32)
+    candTri = triIds[np.arange(n.sum(), dtype=np.int32) - np.repeat(runOffset, n)]
+
+    # Per-triangle / per-ray data as float32 component arrays (1-D gathers are the cheap ones)
+    v0 = tri[:, 0].astype(np.float32)
+    e1 = (tri[:, 1] - tri[:, 0]).astype(np.float32)
+    e2 = (tri[:, 2] - tri[:, 0]).astype(np.float32)
+    normal = np.cross(e1, e2)
+    normal /= np.maximum(np.linalg.norm(normal, axis=1, keepdims=True), 1e-12)
+    planeOffset = np.einsum("ij,ij->i", normal, v0)
+    aa = np.einsum("ij,ij->i", e1, e1)
+    ab = np.einsum("ij,ij->i", e1, e2)
+    bb = np.einsum("ij,ij->i", e2, e2)
+    invDet = 1.0 / np.maximum(aa * bb - ab * ab, 1e-12)
+    v0, e1, e2, normal = v0.T.copy(), e1.T.copy(), e2.T.copy(), normal.T.copy()
+    o = vertices.astype(np.float32).T.copy()
+    d = directions.astype(np.float32).T.copy()
+
+    def dot(a, ai, b, bi):
+        return a[0][ai] * b[0][bi] + a[1][ai] * b[1][bi] + a[2][ai] * b[2][bi]
+
+    # Leaving the material, the ray can only cross a surface facing along it (outward
+    # normals): this drops the ray's own side of the wall before any other test
+    denom = dot(normal, candTri, d, candRay)
+    keep = denom > 1e-6
+    candRay, candTri, denom = candRay[keep], candTri[keep], denom[keep]
+
+    # Distance along the ray to each candidate plane
+    t = (planeOffset[candTri] - dot(normal, candTri, o, candRay)) / denom
+    keep = (t > _MIN_HIT_MM) & (t <= maxDistance)
+    candRay, candTri, t = candRay[keep], candTri[keep], t[keep]
+
+    # Inside-triangle test at the plane hit point (barycentric coordinates)
+    px = o[0][candRay] + t * d[0][candRay] - v0[0][candTri]
+    py = o[1][candRay] + t * d[1][candRay] - v0[1][candTri]
+    pz = o[2][candRay] + t * d[2][candRay] - v0[2][candTri]
+    pa = dot((px, py, pz), slice(None), e1, candTri)
+    pb = dot((px, py, pz), slice(None), e2, candTri)
+    aaT, abT, bbT, invT = aa[candTri], ab[candTri], bb[candTri], invDet[candTri]
+    u = (bbT * pa - abT * pb) * invT
+    v = (aaT * pb - abT * pa) * invT
+    eps = 1e-5
+    hit = (u >= -eps) & (v >= -eps) & (u + v <= 1.0 + eps)
+
+    # Triangles touching the ray origin only meet it at t = 0 (rejected above by _MIN_HIT_MM)
+    thickness = np.full(len(vertices), np.inf)
+    np.minimum.at(thickness, candRay[hit], t[hit].astype(np.float64))
+    return thickness
+
+
+def edgeTopology(faces: np.ndarray, vertexCount: int) -> Dict[str, Any]:
+    """
+    Watertight: every undirected edge is shared by exactly two faces.
+    Manifold + consistently oriented: additionally, each directed edge appears once.
+    """
+    directed = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    directedKeys = directed[:, 0].astype(np.int64) * vertexCount + directed[:, 1]
+    undirected = np.sort(directed, axis=1)
+    undirectedKeys = undirected[:, 0].astype(np.int64) * vertexCount + undirected[:, 1]
+
+    _, edgeUse = np.unique(undirectedKeys, return_counts=True)
+    _, directedUse = np.unique(directedKeys, return_counts=True)
+
+    return {
+        "boundaryEdges": int((edgeUse == 1).sum()),
+        "nonManifoldEdges": int((edgeUse > 2).sum()),
+        "isWatertight": bool(np.all(edgeUse == 2)),
+        "isManifold": bool(np.all(edgeUse <= 2) and np.all(directedUse == 1)),
+    }
+
+
+def thinRegions(faces: np.ndarray, thin: np.ndarray, thickness: np.ndarray,
+                vertices: np.ndarray, limit: int = 5) -> list:
+    """
+    Groups thin vertices into connected regions (edges between two thin vertices),
+    worst regions first. Connected components by vectorized hooking + pointer jumping.
+    """
+    thinIds = np.flatnonzero(thin)
+    if len(thinIds) == 0:
+        return []
+
+    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    edges = edges[thin[edges[:, 0]] & thin[edges[:, 1]]]
+    labels = np.arange(len(vertices))
+    for _ in range(_MAX_REGION_ROUNDS):
+        a, b = labels[edges[:, 0]], labels[edges[:, 1]]
+        differ = a != b
+        if not differ.any():
+            break
+        # Hook the larger root onto the smaller one, then flatten the label trees
+        a, b = a[differ], b[differ]
+        np.minimum.at(labels, np.maximum(a, b), np.minimum(a, b))
+        while True:
+            parent = labels[labels]
+            if np.array_equal(parent, labels):
+                break
+            labels = parent
+
+    regionLabels = labels[thinIds]
+    order = np.argsort(regionLabels, kind="stable")
+    regionLabels, members = regionLabels[order], thinIds[order]
+    bounds = np.flatnonzero(np.diff(regionLabels)) + 1
+    regions = []
+    for group in np.split(members, bounds):
+        worst = group[np.argmin(thickness[group])]
+        regions.append({
+            "vertexCount": int(len(group)),
+            "minThicknessMm": round(float(thickness[worst]), 3),
+            "centerMm": [round(float(c), 1) for c in vertices[group].mean(axis=0)],
+        })
+    regions.sort(key=lambda r: r["minThicknessMm"])
+    return regions[:limit]
+
+
+def auditSocketMesh(vertices: np.ndarray, faces: np.ndarray, minThicknessMm: float = 3.0,
+                    maxDistanceMm: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Geometric safety audit of a closed socket shell.
+
+    Wall thickness is measured per vertex by casting a ray inwards (against the outward
+    vertex normal) to the opposite surface. Rays stop at `maxDistanceMm` (default
+    AUDIT_MAX_DISTANCE_FACTOR x the required thickness); longer walls report that cap.
+    Also checks watertightness and manifoldness.
+    """
+    maxDistance = maxDistanceMm or AUDIT_MAX_DISTANCE_FACTOR * minThicknessMm
+    directions = -vertexNormals(vertices, faces)
+    thickness = rayThickness(vertices, faces, directions, maxDistance)
+    measured = np.isfinite(thickness)
+    capped = np.where(measured, thickness, maxDistance)
+
+    thin = measured & (thickness < minThicknessMm)
+    topology = edgeTopology(faces, len(vertices))
+    minIdx = int(np.argmin(capped))
+
+    return {
+        **topology,
+        "minThicknessMm": round(float(capped[minIdx]), 3),
+        "minThicknessAtMm": [round(float(c), 1) for c in vertices[minIdx]],
+        "p5ThicknessMm": round(float(np.percentile(capped, 5)), 3),
+        "medianThicknessMm": round(float(np.median(capped)), 3),
+        "thinVertexCount": int(thin.sum()),
+        "unmeasuredVertexCount": int((~measured).sum()),
+        "thinRegions": thinRegions(faces, thin, capped, vertices),
+        "requiredThicknessMm": minThicknessMm,
+    }
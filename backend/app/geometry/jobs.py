@@ -0,0 +1,77 @@
+from typing import Any, Dict
+
+from app.geometry.audit import auditSocketMesh
+from app.geometry.library import baseModelLibrary
+from app.geometry.preview import buildPreviews
+from app.geometry.printing import estimatePrint
+from app.geometry.socket import buildSocketMesh, saveBinaryStl
+from app.geometry.structural import estimateStructure
+
+# Module-level job functions executed by the mesh worker pool (app/services/mesh_pool.py).
+# They must stay importable without the web app (workers are spawned processes).
+
+
+def socketJob(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Builds (or scales from the template library) a socket mesh, writes it as binary STL,
+    encodes the viewer's levels of detail (gzip-compressed preview meshes), estimates
+    its strength per material for the selected activities, and its filament mass,
+    cost and print time. A wall too weak for those activities is lofted again at the
+    thinnest wall the estimate found strong enough, within the same job.
+
+    spec keys: stumpLengthMm, circumferenceMm, shape, wallThicknessMm, outputPath,
+               source ("parametric" | "library"), subjectType, limbConfiguration, activityLevel
+    """
+    length = spec["stumpLengthMm"]
+    circumference = spec["circumferenceMm"]
+    wallThickness = spec["wallThicknessMm"]
+    baseModel = None
+
+    template = None
+    if spec.get("source") == "library":
+        template = baseModelLibrary.nearest(
+            spec.get("subjectType", ""), spec.get("limbConfiguration", ""), length, circumference)
+
+    if template is not None:
+        # Nearest preloaded template, scaled to the measured size
+        vertices, faces = baseModelLibrary.scaledMesh(template, length, circumference)
+        baseModel = template["name"]
+        wallThickness = round(template["wallThicknessMm"] * circumference / template["circumferenceMm"], 2)
+    else:
+        # Loft the socket shell (inner cavity = stump, outer = offset by wall thickness)
+        vertices, faces = buildSocketMesh(length, circumference, spec.get("shape", "conical"), wallThickness)
+
+    structural = estimateStructure(vertices, faces, wallThickness, spec.get("activityLevel", []),
+                                   spec.get("subjectType", "HUMAN"))
+    if not structural["passes"] and structural["achievable"]:
+        # Every candidate wall is already scored: build the one that passes now rather
+        # than sending the design back through the safety audit
+        initialWall = wallThickness
+        wallThickness = structural["requiredThicknessMm"]
+        vertices, faces = buildSocketMesh(length, circumference, spec.get("shape", "conical"), wallThickness)
+        baseModel = None
+        structural = estimateStructure(vertices, faces, wallThickness, spec.get("activityLevel", []),
+                                       spec.get("subjectType", "HUMAN"))
+        structural["strengthenedFromMm"] = initialWall
+
+    triangleCount = saveBinaryStl(vertices, faces, spec["outputPath"])
+    previews = buildPreviews(vertices, faces)
+    printing = estimatePrint(vertices, faces, structural["material"])
+
+    return {
+        "vertices": vertices,
+        "faces": faces,
+        "triangleCount": triangleCount,
+        "wallThicknessMm": wallThickness,
+        "baseModel": baseModel,
+        "previews": previews,
+        "structural": structural,
+        "print": printing,
+    }
+
+
+def auditJob(vertices, faces, minThicknessMm: float) -> Dict[str, Any]:
+    """
+    Geometric safety audit (wall thickness, watertightness, manifoldness) of a socket mesh.
+    """
+    return auditSocketMesh(vertices, faces, minThicknessMm)
@@ -0,0 +1,179 @@
+import bisect
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from stl import mesh
+
+logger = logging.getLogger(__name__)
+
+BASE_MODELS_DIR = Path(__file__).resolve().parent.parent.parent / "assets" / "base_models"
+# Optional sidecar describing each template; geometry-derived defaults otherwise
+INDEX_FILENAME = "index.json"
+ANY = "ANY"
+
+
+def loadStlTriangles(path: Path) -> np.ndarray:
+    """
+    Returns the (N, 3, 3) float32 triangle array of an STL file.
+    Binary files are memory-mapped (zero-copy, paged in on demand); ASCII files are parsed once.
+    """
+    size = path.stat().st_size
+    with open(path, "rb") as f:
+        header = f.read(84)
+    if len(header) == 84:
+        count = int(np.frombuffer(header[80:84], dtype="<u4")[0])
+        if size == 84 + count * mesh.Mesh.dtype.itemsize:
+            records = np.memmap(path, dtype=mesh.Mesh.dtype, mode="r", offset=84, shape=(count,))
+            return records["vectors"]
+    return mesh.Mesh.from_file(str(path)).vectors
+
+
+def weldTriangles(triangles: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts a triangle soup into an indexed mesh (shared vertices).
+    """
+    flat = np.ascontiguousarray(triangles, dtype=np.float64).reshape(-1, 3)
+    vertices, inverse = np.unique(flat, axis=0, return_inverse=True)
+    return vertices, inverse.reshape(-1, 3).astype(np.int64)
+
+
+class BaseModelLibrary:
+    """
+    Registry of socket templates in assets/base_models, loaded once at startup.
+
+    Templates are indexed by (subjectType, limbConfiguration) and sorted by nominal
+    length, so `nearest()` is a bisect plus a short outward sweep: O(log n) in the
+    library size. Templates are welded into indexed meshes once at load, so a request
+    only scales vertices.
+    """
+
+    def __init__(self, directory: Path = BASE_MODELS_DIR):
+        self.directory = Path(directory)
+        self.loaded = False
+        self._groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._lengths: Dict[Tuple[str, str], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Scans the directory and welds every STL template into an indexed mesh.
+        Safe to call more than once.
+        """
+        with self._lock:
+            groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+            index = {}
+            indexPath = self.directory / INDEX_FILENAME
+            if indexPath.exists():
+                index = json.loads(indexPath.read_text())
+
+            for path in sorted(self.directory.glob("*.stl")) if self.directory.exists() else []:
+                try:
+                    triangles = loadStlTriangles(path)
+                except Exception as e:
+                    logger.warning(f"Base model library: skipping {path.name}: {e}")
+                    continue
+
+                meta = index.get(path.name, {})
+                if "lengthMm" not in meta or "circumferenceMm" not in meta:
+                    # Derive nominal size from the geometry (outer bounds)
+                    lo = triangles.reshape(-1, 3).min(axis=0)
+                    hi = triangles.reshape(-1, 3).max(axis=0)
+                    meta = {
+                        "lengthMm": float(hi[2] - lo[2]),
+                        "circumferenceMm": float(np.pi * 0.5 * ((hi[0] - lo[0]) + (hi[1] - lo[1]))),
+                        **meta
+                    }
+
+                entry = {
+                    "name": path.name,
+                    "subjectType": str(meta.get("subjectType", ANY)).upper(),
+                    "limbConfiguration": str(meta.get("limbConfiguration", ANY)),
+                    "lengthMm": float(meta["lengthMm"]),
+                    "circumferenceMm": float(meta["circumferenceMm"]),
+                    "wallThicknessMm": float(meta.get("wallThicknessMm", 5.0)),
+                }
+                entry["vertices"], entry["faces"] = weldTriangles(triangles)
+                key = (entry["subjectType"], entry["limbConfiguration"])
+                groups.setdefault(key, []).append(entry)
+
+            for entries in groups.values():
+                entries.sort(key=lambda e: e["lengthMm"])
+
+            self._groups = groups
+            self._lengths = {key: [e["lengthMm"] for e in entries] for key, entries in groups.items()}
+            self.loaded = True
+
+        logger.info(f"Base model library: {self.size()} templates in {len(self._groups)} groups")
+
+    def size(self) -> int:
+        return sum(len(entries) for entries in self._groups.values())
+
+    def nearest(self, subjectType: str, limbConfiguration: str,
+                lengthMm: float, circumferenceMm: float) -> Optional[Dict[str, Any]]:
+        """
+        Returns the template closest in (length, circumference), preferring an exact
+        subject/limb match and falling back to wildcard ("ANY") groups.
+        """
+        if not self.loaded:
+            self.load()
+
+        subjectType = (subjectType or ANY).upper()
+        for key in ((subjectType, limbConfiguration), (subjectType, ANY), (ANY, limbConfiguration), (ANY, ANY)):
+            entries = self._groups.get(key)
+            if entries:
+                return self._nearestInGroup(entries, self._lengths[key], lengthMm, circumferenceMm)
+        return None
+
+    @staticmethod
+    def _nearestInGroup(entries, lengths, lengthMm, circumferenceMm):
+        # Relative distance, so 10 mm matters equally for length and circumference scale
+        def distance(entry):
+            dl = (entry["lengthMm"] - lengthMm) / lengthMm
+            dc = (entry["circumferenceMm"] - circumferenceMm) / circumferenceMm
+            return dl * dl + dc * dc
+
+        pos = bisect.bisect_left(lengths, lengthMm)
+        best, bestDist = None, float("inf")
+        lo, hi = pos - 1, pos
+        # Sweep outwards; stop each side once the length gap alone exceeds the best distance
+        while lo >= 0 or hi < len(entries):
+            if hi < len(entries):
+                dl = (lengths[hi] - lengthMm) / lengthMm
+                if dl * dl >= bestDist:
+                    hi = len(entries)
+                else:
+                    d = distance(entries[hi])
+                    if d < bestDist:
+                        best, bestDist = entries[hi], d
+                    hi += 1
+            if lo >= 0:
+                dl = (lengths[lo] - lengthMm) / lengthMm
+                if dl * dl >= bestDist:
+                    lo = -1
+                else:
+                    d = distance(entries[lo])
+                    if d < bestDist:
+                        best, bestDist = entries[lo], d
+                    lo -= 1
+        return best
+
+    @staticmethod
+    def scaledMesh(entry: Dict[str, Any], lengthMm: float, circumferenceMm: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Scales a template to the requested size (XY by circumference, Z by length)
+        and returns it as an indexed mesh (the faces are shared with the template).
+        """
+        scale = np.array([
+            circumferenceMm / entry["circumferenceMm"],
+            circumferenceMm / entry["circumferenceMm"],
+            lengthMm / entry["lengthMm"],
+        ])
+        return entry["vertices"] * scale, entry["faces"]
+
+
+# Shared registry, loaded by every mesh worker at startup (see app/services/mesh_pool.py)
+baseModelLibrary = BaseModelLibrary()
@@ -0,0 +1,30 @@
+# Printable socket materials (FDM, printed upright: layers are perpendicular to the socket axis).
+# Nominal values from typical datasheets and slicer profiles; the estimates only need them
+# to be in the right ratio to each other, not exact for a given filament brand or printer.
+#   densityGCm3         printed part density
+#   yieldMpa            tensile yield (or 0.2% offset) strength, in the layer plane
+#   fatigueRatio        endurance strength / yield for cyclic gait loading
+#   interlayerRatio     strength across layers / in-plane strength (axial tension splits layers)
+#   costPerKgUsd        filament spool price
+#   printSpeedMmS       typical toolpath speed
+#   maxFlowMm3S         melt rate limit of a standard 0.4 mm hotend
+MATERIALS = {
+    "PLA": {"densityGCm3": 1.24, "yieldMpa": 50.0, "fatigueRatio": 0.35, "interlayerRatio": 0.6,
+            "costPerKgUsd": 20.0, "printSpeedMmS": 60.0, "maxFlowMm3S": 15.0},
+    "PETG": {"densityGCm3": 1.27, "yieldMpa": 48.0, "fatigueRatio": 0.40, "interlayerRatio": 0.7,
+             "costPerKgUsd": 25.0, "printSpeedMmS": 50.0, "maxFlowMm3S": 12.0},
+    "TPU": {"densityGCm3": 1.21, "yieldMpa": 8.6, "fatigueRatio": 0.50, "interlayerRatio": 0.8,
+            "costPerKgUsd": 35.0, "printSpeedMmS": 25.0, "maxFlowMm3S": 4.0},
+    "PA12": {"densityGCm3": 1.01, "yieldMpa": 45.0, "fatigueRatio": 0.45, "interlayerRatio": 0.6,
+             "costPerKgUsd": 60.0, "printSpeedMmS": 45.0, "maxFlowMm3S": 10.0},
+    "PA12-CF": {"densityGCm3": 1.15, "yieldMpa": 70.0, "fatigueRatio": 0.40, "interlayerRatio": 0.5,
+                "costPerKgUsd": 90.0, "printSpeedMmS": 45.0, "maxFlowMm3S": 8.0},
+}
+
+
+def allowableStressMpa(material: str) -> float:
+    """
+    In-plane stress the material can carry indefinitely under gait cycles.
+    """
+    props = MATERIALS[material]
+    return props["yieldMpa"] * props["fatigueRatio"]
@@ -0,0 +1,181 @@
+import gzip
+import os
+import struct
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.geometry.socket import vertexNormals
+
+load_dotenv()
+
+# Triangle budgets of the viewer's levels of detail, finest first (the STL stays full resolution)
+PREVIEW_LOD_TRIANGLES = [int(v) for v in os.getenv("PREVIEW_LOD_TRIANGLES", "20000,5000").split(",") if v.strip()]
+
+# Preview mesh binary format ("BSPM" v1, little-endian, stored gzip-compressed):
+#   header   magic "BSPM", u16 version, u16 flags, u32 vertexCount, u32 triangleCount,
+#            f32[3] center, f32[3] halfExtent                                   (40 bytes)
+#   position int16[vertexCount][3]   p = center + q / 32767 * halfExtent
+#   normal   int8[vertexCount][2]    octahedral encoding of the unit normal
+#   padding  to a 4-byte boundary
+#   index    uint16[triangleCount][3] (uint32 if flags & FLAG_INDEX32)
+PREVIEW_MAGIC = b"BSPM"
+PREVIEW_VERSION = 1
+FLAG_INDEX32 = 1
+_HEADER = struct.Struct("<4sHHII3f3f")
+
+# Refinement passes when a clustering grid lands far from its triangle budget
+_MAX_CLUSTER_PASSES = 4
+_BUDGET_TOLERANCE = 1.25
+
+
+def clusterDecimate(vertices: np.ndarray, faces: np.ndarray, cellSize: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vertex-clustering decimation: vertices are merged per grid cell (to their mean)
+    and triangles that collapse are dropped. Vertices are also split by the dominant
+    axis of their normal, so the inner and outer skins of a thin socket wall never
+    merge even when the cell is wider than the wall.
+    """
+    normals = vertexNormals(vertices, faces)
+    axis = np.abs(normals).argmax(axis=1)
+    facing = axis * 2 + (normals[np.arange(len(normals)), axis] > 0)
+
+    cells = np.floor((vertices - vertices.min(axis=0)) / cellSize).astype(np.int64)
+    dims = cells.max(axis=0) + 1
+    keys = ((cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]) * 6 + facing
+    _, cluster = np.unique(keys, return_inverse=True)
+    cluster = cluster.ravel()
+
+    counts = np.bincount(cluster)
+    merged = np.column_stack([
+        np.bincount(cluster, weights=vertices[:, c]) / counts for c in range(3)
+    ])
+
+    remapped = cluster[faces]
+    a, b, c = remapped.T
+    remapped = remapped[(a != b) & (b != c) & (a != c)]
+
+    # Identical triangles (same corners, same winding) left by the merge: keep one
+    rotation = remapped.argmin(axis=1)
+    canonical = np.take_along_axis(remapped, (rotation[:, None] + np.arange(3)) % 3, axis=1)
+    _, first = np.unique(canonical, axis=0, return_index=True)
+    remapped = canonical[np.sort(first)]
+
+    # Drop clusters no triangle uses any more
+    used, compact = np.unique(remapped, return_inverse=True)
+    return merged[used], compact.reshape(-1, 3)
+
+
+def decimateToBudget(vertices: np.ndarray, faces: np.ndarray,
+                     targetTriangles: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Picks the clustering cell size for about `targetTriangles` triangles.
+    A surface of area A meshed at cell size h has roughly 2A/h^2 triangles.
+    """
+    if len(faces) <= targetTriangles:
+        return vertices, faces
+    tri = vertices[faces]
+    area = 0.5 * np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]), axis=1).sum()
+    cellSize = float(np.sqrt(2.0 * area / targetTriangles))
+
+    best = None
+    for _ in range(_MAX_CLUSTER_PASSES):
+        decimated = clusterDecimate(vertices, faces, cellSize)
+        count = len(decimated[1])
+        if count <= targetTriangles * _BUDGET_TOLERANCE:
+            best = decimated
+            if count >= targetTriangles / _BUDGET_TOLERANCE:
+                break
+        cellSize *= float(np.sqrt(count / targetTriangles))
+    return best if best is not None else decimated
+
+
+def octEncode(normals: np.ndarray) -> np.ndarray:
+    """
+    Unit normals -> int8 pairs (octahedral mapping, ~1 degree precision in 2 bytes).
+    """
+    n = normals / np.maximum(np.abs(normals).sum(axis=1, keepdims=True), 1e-12)
+    x, y, z = n.T
+    signX = np.where(x >= 0, 1.0, -1.0)
+    signY = np.where(y >= 0, 1.0, -1.0)
+    u = np.where(z >= 0, x, (1.0 - np.abs(y)) * signX)
+    v = np.where(z >= 0, y, (1.0 - np.abs(x)) * signY)
+    return np.round(np.clip(np.column_stack([u, v]), -1.0, 1.0) * 127).astype(np.int8)
+
+
+def octDecode(encoded: np.ndarray) -> np.ndarray:
+    u, v = (encoded.astype(np.float64) / 127).T
+    z = 1.0 - np.abs(u) - np.abs(v)
+    x = np.where(z >= 0, u, (1.0 - np.abs(v)) * np.where(u >= 0, 1.0, -1.0))
+    y = np.where(z >= 0, v, (1.0 - np.abs(u)) * np.where(v >= 0, 1.0, -1.0))
+    normals = np.column_stack([x, y, z])
+    return normals / np.linalg.norm(normals, axis=1, keepdims=True)
+
+
+def encodePreviewMesh(vertices: np.ndarray, faces: np.ndarray) -> bytes:
+    """
+    Packs an indexed mesh in the quantized preview format (uncompressed).
+    """
+    low, high = vertices.min(axis=0), vertices.max(axis=0)
+    center = (low + high) / 2.0
+    halfExtent = np.maximum((high - low) / 2.0, 1e-6)
+    positions = np.round((vertices - center) / halfExtent * 32767).astype("<i2")
+    normals = octEncode(vertexNormals(vertices, faces))
+
+    flags = FLAG_INDEX32 if len(vertices) > 0xFFFF else 0
+    indices = faces.astype("<u4" if flags & FLAG_INDEX32 else "<u2")
+
+    body = positions.tobytes() + normals.tobytes()
+    padding = b"\0" * (-(_HEADER.size + len(body)) % 4)
+    header = _HEADER.pack(PREVIEW_MAGIC, PREVIEW_VERSION, flags, len(vertices), len(faces),
+                          *center.astype(np.float32), *halfExtent.astype(np.float32))
+    return header + body + padding + indices.tobytes()
+
+
+def decodePreviewMesh(data: bytes) -> Dict[str, np.ndarray]:
+    """
+    Inverse of encodePreviewMesh (reference decoder for the viewer and for checks).
+    """
+    magic, version, flags, vertexCount, triangleCount, *rest = _HEADER.unpack_from(data)
+    if magic != PREVIEW_MAGIC or version != PREVIEW_VERSION:
+        raise ValueError("Not a BSPM v1 preview mesh")
+    center, halfExtent = np.array(rest[:3]), np.array(rest[3:])
+    offset = _HEADER.size
+    positions = np.frombuffer(data, "<i2", vertexCount * 3, offset).reshape(-1, 3)
+    offset += positions.nbytes
+    normals = np.frombuffer(data, np.int8, vertexCount * 2, offset).reshape(-1, 2)
+    offset += normals.nbytes
+    offset += -offset % 4
+    indexType = "<u4" if flags & FLAG_INDEX32 else "<u2"
+    faces = np.frombuffer(data, indexType, triangleCount * 3, offset).reshape(-1, 3)
+    return {
+        "vertices": center + positions / 32767.0 * halfExtent,
+        "normals": octDecode(normals),
+        "faces": faces.astype(np.int64),
+    }
+
+
+def buildPreviews(vertices: np.ndarray, faces: np.ndarray,
+                  budgets: List[int] = PREVIEW_LOD_TRIANGLES) -> List[Dict[str, Any]]:
+    """
+    Levels of detail of a socket mesh, finest first, each gzip-compressed in the
+    preview format. Levels that would not be smaller than the previous one are skipped.
+    """
+    previews = []
+    lastCount = len(faces) + 1
+    for budget in sorted(budgets, reverse=True):
+        lodVertices, lodFaces = decimateToBudget(vertices, faces, budget)
+        if len(lodFaces) >= lastCount:
+            continue
+        lastCount = len(lodFaces)
+        raw = encodePreviewMesh(lodVertices, lodFaces)
+        previews.append({
+            "level": len(previews),
+            "triangles": int(len(lodFaces)),
+            "vertices": int(len(lodVertices)),
+            "rawBytes": len(raw),
+            # mtime=0: identical meshes give identical bytes (content-addressed artifacts)
+            "data": gzip.compress(raw, compresslevel=9, mtime=0),
+        })
+    return previews
@@ -0,0 +1,157 @@
+import os
+import time
+from typing import Any, Dict, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.geometry.materials import MATERIALS
+
+load_dotenv()
+
+# Slicer settings assumed for the estimates (typical 0.4 mm nozzle profile)
+PRINT_LAYER_HEIGHT_MM = float(os.getenv("PRINT_LAYER_HEIGHT_MM", "0.2"))
+PRINT_LINE_WIDTH_MM = float(os.getenv("PRINT_LINE_WIDTH_MM", "0.45"))
+PRINT_PERIMETERS = int(os.getenv("PRINT_PERIMETERS", "3"))
+# Infill density inside the perimeters (sockets are printed dense)
+PRINT_INFILL = float(os.getenv("PRINT_INFILL", "0.5"))
+# Small layers wait for cooling; every layer change also costs a fixed overhead
+PRINT_MIN_LAYER_TIME_S = float(os.getenv("PRINT_MIN_LAYER_TIME_S", "8"))
+PRINT_LAYER_CHANGE_S = float(os.getenv("PRINT_LAYER_CHANGE_S", "1.0"))
+
+
+def meshVolumeArea(vertices: np.ndarray, faces: np.ndarray) -> Tuple[float, float]:
+    """
+    Enclosed volume (mm^3, sum of signed tetrahedra against the origin) and surface
+    area (mm^2) of a closed, outward-wound mesh.
+    """
+    v0, v1, v2 = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+    volume = float(np.einsum("ij,ij->i", v0, np.cross(v1, v2)).sum() / 6.0)
+    area = float(0.5 * np.linalg.norm(np.cross(v1 - v0, v2 - v0), axis=1).sum())
+    return abs(volume), area
+
+
+def _cross2(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+
+
+def sliceLayers(vertices: np.ndarray, faces: np.ndarray,
+                layerHeight: float = PRINT_LAYER_HEIGHT_MM) -> Dict[str, np.ndarray]:
+    """
+    Cross-section of a closed mesh at the middle of every print layer (z axis up).
+
+    Every plane is cut at once instead of slicing layer by layer. A triangle with corners
+    sorted by height (lo, mid, hi) is cut by a plane at z in a segment from its lo-hi edge
+    to its lo-mid edge (below mid) or mid-hi edge (above). Within each of those two pieces
+    the segment ends move linearly with z, so the segment's shoelace term (oriented by the
+    face normal, so inner walls subtract) is a quadratic in z and its length is linear.
+    Each piece adds its polynomial coefficients to the layers it spans through difference
+    arrays, and the per-layer sums are evaluated at the plane heights: O(triangles + layers).
+    Returns {"z", "area" (mm^2), "perimeter" (mm)}.
+    """
+    zMin = float(vertices[:, 2].min())
+    layerCount = max(1, int(np.ceil((float(vertices[:, 2].max()) - zMin) / layerHeight)))
+    planes = zMin + (np.arange(layerCount) + 0.5) * layerHeight
+    # Polynomials in z relative to the middle of the part (keeps the coefficients small)
+    zRef = zMin + 0.5 * layerCount * layerHeight
+
+    local = vertices - np.array([0.0, 0.0, zRef])
+    sortedFaces = np.take_along_axis(faces, np.argsort(local[:, 2][faces], axis=1), axis=1)
+    lo, mid, hi = local[sortedFaces[:, 0]], local[sortedFaces[:, 1]], local[sortedFaces[:, 2]]
+    # xy of the face normal (sorting may flip the winding, so take it from the original order)
+    e1 = local[faces[:, 1]] - local[faces[:, 0]]
+    e2 = local[faces[:, 2]] - local[faces[:, 0]]
+    normals = np.stack([e1[:, 1] * e2[:, 2] - e1[:, 2] * e2[:, 1], e1[:, 2] * e2[:, 0] - e1[:, 0] * e2[:, 2]], axis=1)
+
+    def edge(a: np.ndarray, b: np.ndarray):
+        # Point on edge a-b at height z as base + slope * z (xy), for a[z] <= z <= b[z]
+        dz = b[:, 2] - a[:, 2]
+        slope = (b[:, :2] - a[:, :2]) / np.where(dz > 0, dz, 1.0)[:, None]
+        return a[:, :2] - slope * a[:, 2:3], slope
+
+    longBase, longSlope = edge(lo, hi)
+    coefficients = np.zeros((5, layerCount + 1))
+    for start, stop, apex, (shortBase, shortSlope) in ((lo, mid, lo, edge(lo, mid)), (mid, hi, hi, edge(mid, hi))):
+        # Layers whose plane lies in [start z, stop z)
+        first = np.ceil((start[:, 2] + zRef - zMin) / layerHeight - 0.5).astype(np.int64)
+        last = np.ceil((stop[:, 2] + zRef - zMin) / layerHeight - 0.5).astype(np.int64)
+        keep = last > first
+        first, last = np.clip(first[keep], 0, layerCount), np.clip(last[keep], 0, layerCount)
+
+        p0, p1, q0, q1 = longBase[keep], longSlope[keep], shortBase[keep], shortSlope[keep]
+        # Segment direction is fixed within the piece: orient it so the outward normal is on its right
+        direction = q1 - p1
+        sign = np.where(_cross2(direction, normals[keep]) > 0, -1.0, 1.0)
+        if apex is hi:
+            sign = -sign
+        # 0.5 * cross(p0 + p1 z, q0 + q1 z) = c0 + c1 z + c2 z^2
+        terms = [0.5 * sign * _cross2(p0, q0), 0.5 * sign * (_cross2(p0, q1) + _cross2(p1, q0)),
+                 0.5 * sign * _cross2(p1, q1)]
+        # |q - p| grows linearly from 0 at the apex corner
+        rate = np.hypot(direction[:, 0], direction[:, 1])
+        apexZ = apex[keep, 2]
+        lengthSign = 1.0 if apex is lo else -1.0
+        terms += [-lengthSign * rate * apexZ, lengthSign * rate]
+        for index, term in enumerate(terms):
+            coefficients[index] += np.bincount(first, weights=term, minlength=layerCount + 1)
+            coefficients[index] -= np.bincount(last, weights=term, minlength=layerCount + 1)
+
+    c0, c1, c2, l0, l1 = np.cumsum(coefficients[:, :layerCount], axis=1)
+    z = planes - zRef
+    return {
+        "z": planes,
+        "area": np.abs(c0 + c1 * z + c2 * z ** 2),
+        "perimeter": l0 + l1 * z,
+    }
+
+
+def estimatePrint(vertices: np.ndarray, faces: np.ndarray, material: str,
+                  layerHeight: float = PRINT_LAYER_HEIGHT_MM) -> Dict[str, Any]:
+    """
+    Filament mass, material cost and print time of a socket mesh for every material.
+
+    Per layer, the perimeters fill (contour length x PRINT_PERIMETERS x line width) of the
+    cross-section and PRINT_INFILL of the rest. Layer time is the slower of the toolpath
+    length at the material's speed and the extruded volume at its melt-rate limit, never
+    below the minimum (cooling) layer time. Returns a JSON-safe summary for
+    designParameters["print"], with `material`'s figures at the top level.
+    """
+    startedAt = time.perf_counter()
+    volume, area = meshVolumeArea(vertices, faces)
+    layers = sliceLayers(vertices, faces, layerHeight)
+
+    shell = np.minimum(layers["area"], layers["perimeter"] * PRINT_PERIMETERS * PRINT_LINE_WIDTH_MM)
+    filled = shell + PRINT_INFILL * (layers["area"] - shell)
+    extruded = filled * layerHeight
+    pathLength = filled / PRINT_LINE_WIDTH_MM
+
+    # (materials, layers)
+    names = list(MATERIALS)
+    speed = np.array([MATERIALS[name]["printSpeedMmS"] for name in names])[:, None]
+    flow = np.array([MATERIALS[name]["maxFlowMm3S"] for name in names])[:, None]
+    layerSeconds = np.maximum(np.maximum(pathLength[None, :] / speed, extruded[None, :] / flow),
+                              PRINT_MIN_LAYER_TIME_S) + PRINT_LAYER_CHANGE_S
+    printHours = layerSeconds.sum(axis=1) / 3600.0
+
+    extrudedCm3 = float(extruded.sum()) / 1000.0
+    perMaterial = {}
+    for index, name in enumerate(names):
+        massG = extrudedCm3 * MATERIALS[name]["densityGCm3"]
+        perMaterial[name] = {
+            "massG": round(massG, 1),
+            "costUsd": round(massG / 1000.0 * MATERIALS[name]["costPerKgUsd"], 2),
+            "printTimeH": round(float(printHours[index]), 2),
+        }
+
+    return {
+        "material": material,
+        **perMaterial.get(material, {}),
+        "volumeCm3": round(volume / 1000.0, 1),
+        "surfaceAreaCm2": round(area / 100.0, 1),
+        "extrudedCm3": round(extrudedCm3, 1),
+        "layerHeightMm": layerHeight,
+        "layers": int(len(layers["z"])),
+        "infill": PRINT_INFILL,
+        "materials": perMaterial,
+        "elapsedMs": round((time.perf_counter() - startedAt) * 1000, 1),
+    }
@@ -0,0 +1,187 @@
+import os
+from typing import Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from stl import mesh
+
+load_dotenv()
+
+# Default mesh resolution (~93k triangles); raise for smoother print files
+SOCKET_ANGULAR_SEGMENTS = int(os.getenv("SOCKET_ANGULAR_SEGMENTS", "192"))
+SOCKET_AXIAL_SEGMENTS = int(os.getenv("SOCKET_AXIAL_SEGMENTS", "96"))
+
+SOCKET_SHAPES = ("conical", "cylindrical", "bulbous", "irregular")
+
+STL_HEADER = b"BIOSTRIDE socket (binary STL)".ljust(80, b" ")
+
+
+def profileScale(t: np.ndarray, shape: str) -> np.ndarray:
+    """
+    Radius multiplier along the socket height.
+    t = 0 at the distal end (bottom of the cavity), t = 1 at the proximal rim,
+    where the radius equals the measured circumference / 2π.
+    """
+    if shape == "cylindrical":
+        return np.ones_like(t)
+    if shape == "bulbous":
+        # Wider distal end, narrowing towards the rim
+        return 1.0 + 0.12 * np.sin(np.pi * (1.0 - t) * 0.8)
+    # conical / irregular
+    return 0.6 + 0.4 * t
+
+
+def angularScale(theta: np.ndarray, shape: str) -> np.ndarray:
+    """
+    Radius multiplier around the axis (non-circular cross-sections).
+    """
+    if shape == "irregular":
+        return 1.0 + 0.05 * np.cos(2.0 * theta) + 0.03 * np.sin(3.0 * theta)
+    return np.ones_like(theta)
+
+
+def vertexNormals(vertices: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    """
+    Area-weighted unit vertex normals (same orientation as the face winding).
+    """
+    tri = vertices[faces]
+    faceNormals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    normals = np.empty_like(vertices)
+    flatFaces = faces.ravel()
+    for axis in range(3):
+        weights = np.repeat(faceNormals[:, axis], 3)
+        normals[:, axis] = np.bincount(flatFaces, weights=weights, minlength=len(vertices))
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.maximum(lengths, 1e-12)
+
+
+def _revolvedSurface(ringRadii: np.ndarray, ringZ: np.ndarray, poleZ: float,
+                     theta: np.ndarray, shape: str) -> np.ndarray:
+    """
+    Vertices of a surface of revolution: one pole vertex followed by K rings of S vertices.
+    """
+    cosT = np.cos(theta) * angularScale(theta, shape)
+    sinT = np.sin(theta) * angularScale(theta, shape)
+    rings = np.empty((len(ringRadii), len(theta), 3))
+    rings[:, :, 0] = ringRadii[:, None] * cosT[None, :]
+    rings[:, :, 1] = ringRadii[:, None] * sinT[None, :]
+    rings[:, :, 2] = ringZ[:, None]
+    return np.vstack([[[0.0, 0.0, poleZ]], rings.reshape(-1, 3)])
+
+
+def _surfaceFaces(ringCount: int, segments: int, offset: int, outward: bool) -> np.ndarray:
+    """
+    Triangle indices for a pole fan + quad strips between consecutive rings.
+    `outward` selects the winding (normals away from the axis) vs. towards the axis.
+    """
+    j = np.arange(segments)
+    jNext = (j + 1) % segments
+    pole = offset
+    ring0 = offset + 1
+
+    fan = np.stack([np.full(segments, pole), ring0 + jNext, ring0 + j], axis=1)
+
+    k = np.arange(ringCount - 1)[:, None]
+    a = ring0 + k * segments + j            # (k, j)
+    b = ring0 + k * segments + jNext        # (k, j+1)
+    c = ring0 + (k + 1) * segments + jNext  # (k+1, j+1)
+    d = ring0 + (k + 1) * segments + j      # (k+1, j)
+    quads = np.concatenate([
+        np.stack([a, b, c], axis=-1).reshape(-1, 3),
+        np.stack([a, c, d], axis=-1).reshape(-1, 3),
+    ])
+
+    faces = np.concatenate([fan, quads])
+    if not outward:
+        faces = faces[:, [0, 2, 1]]
+    return faces
+
+
+def buildSocketMesh(stumpLengthMm: float, circumferenceMm: float, shape: str = "conical",
+                    wallThicknessMm: float = 5.0,
+                    angularSegments: int = SOCKET_ANGULAR_SEGMENTS,
+                    axialSegments: int = SOCKET_AXIAL_SEGMENTS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lofts a closed (watertight) prosthetic socket shell from anatomical measurements.
+
+    The inner surface follows the stump: a distal dome followed by `axialSegments`
+    rings up to `stumpLengthMm`, with the rim radius matching `circumferenceMm`.
+    The outer surface is the inner one offset by `wallThicknessMm` along its
+    vertex normals, and a rim strip joins both at the top.
+
+    Returns:
+        (vertices float64 (N, 3) in mm, faces int64 (M, 3)) with outward-facing winding.
+    """
+    shape = shape if shape in SOCKET_SHAPES else "conical"
+    segments = max(8, int(angularSegments))
+    axial = max(2, int(axialSegments))
+    domeRings = max(2, axial // 4)
+
+    rimRadius = circumferenceMm / (2.0 * np.pi)
+    theta = np.linspace(0.0, 2.0 * np.pi, segments, endpoint=False)
+
+    # Wall section: z from 0 (distal) to stumpLength (rim)
+    t = np.linspace(0.0, 1.0, axial + 1)
+    wallRadii = rimRadius * profileScale(t, shape)
+    wallZ = t * stumpLengthMm
+
+    # Distal dome: quarter ellipse from the pole up to the first wall ring
+    distalRadius = wallRadii[0]
+    domeDepth = min(distalRadius, 0.25 * stumpLengthMm)
+    phi = np.linspace(0.0, 0.5 * np.pi, domeRings + 1)[1:-1]
+    domeRadii = distalRadius * np.sin(phi)
+    domeZ = -domeDepth * np.cos(phi)
+
+    ringRadii = np.concatenate([domeRadii, wallRadii])
+    ringZ = np.concatenate([domeZ, wallZ])
+    ringCount = len(ringRadii)
+
+    # Inner surface: normals face into the cavity (away from the material)
+    inner = _revolvedSurface(ringRadii, ringZ, -domeDepth, theta, shape)
+    innerFaces = _surfaceFaces(ringCount, segments, 0, outward=False)
+
+    # Outer surface: offset along the inner normals (which point into the cavity)
+    outer = inner - wallThicknessMm * vertexNormals(inner, innerFaces)
+    offset = len(inner)
+    outerFaces = _surfaceFaces(ringCount, segments, offset, outward=True)
+
+    # Rim strip joining the top rings of both surfaces
+    j = np.arange(segments)
+    jNext = (j + 1) % segments
+    topRing = 1 + (ringCount - 1) * segments
+    innerTop = topRing + j
+    innerTopNext = topRing + jNext
+    outerTop = offset + innerTop
+    outerTopNext = offset + innerTopNext
+    rimFaces = np.concatenate([
+        np.stack([innerTop, outerTop, outerTopNext], axis=1),
+        np.stack([innerTop, outerTopNext, innerTopNext], axis=1),
+    ])
+
+    vertices = np.vstack([inner, outer])
+    faces = np.concatenate([innerFaces, outerFaces, rimFaces]).astype(np.int64)
+    return vertices, faces
+
+
+def toStlMesh(vertices: np.ndarray, faces: np.ndarray) -> mesh.Mesh:
+    """
+    Converts an indexed mesh into a numpy-stl Mesh (one record per triangle).
+    """
+    data = np.zeros(len(faces), dtype=mesh.Mesh.dtype)
+    data["vectors"] = vertices[faces]
+    return mesh.Mesh(data, remove_empty_areas=False)
+
+
+def saveBinaryStl(vertices: np.ndarray, faces: np.ndarray, path: str) -> int:
+    """
+    Writes the mesh as binary STL. Returns the triangle count.
+    The header is fixed (numpy-stl's save() stamps the current time), so the same
+    mesh always produces the same bytes and the artifact store can deduplicate it.
+    """
+    stlMesh = toStlMesh(vertices, faces)
+    stlMesh.update_normals()
+    with open(path, "wb") as f:
+        f.write(STL_HEADER)
+        f.write(np.uint32(len(faces)).tobytes())
+        f.write(stlMesh.data.tobytes())
+    return len(faces)
@@ -0,0 +1,59 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.geometry.library import loadStlTriangles, weldTriangles
+from app.services.artifacts import ArtifactStore, artifactStore
+
+load_dotenv()
+
+# Recent indexed meshes kept in memory (a 93k-triangle socket is ~3 MB)
+MESH_STORE_SIZE = int(os.getenv("MESH_STORE_SIZE", "16"))
+
+
+class MeshStore:
+    """
+    Indexed meshes (vertices, faces) of recently generated sockets, keyed by their
+    web path ("outputs/<aa>/<bb>/<sha256>.stl").
+
+    Lets downstream agents (Safety Auditor) work on the designer's geometry without
+    re-reading and re-welding the STL. Entries that were evicted, or written by another
+    worker process, are loaded from the artifact store instead.
+    """
+
+    def __init__(self, maxEntries: int = MESH_STORE_SIZE, artifacts: ArtifactStore = artifactStore):
+        self.maxEntries = maxEntries
+        self.artifacts = artifacts
+        self._meshes: "OrderedDict[str, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remember(self, stlPath: str, vertices: np.ndarray, faces: np.ndarray):
+        with self._lock:
+            self._meshes[stlPath] = (vertices, faces)
+            self._meshes.move_to_end(stlPath)
+            while len(self._meshes) > self.maxEntries:
+                self._meshes.popitem(last=False)
+
+    def get(self, stlPath: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Returns (vertices, faces) for a generated STL, or None if it does not exist.
+        """
+        with self._lock:
+            if stlPath in self._meshes:
+                self._meshes.move_to_end(stlPath)
+                return self._meshes[stlPath]
+
+        path = self.artifacts.localPath(stlPath) if stlPath else None
+        if path is None:
+            return None
+        vertices, faces = weldTriangles(loadStlTriangles(path))
+        self.remember(stlPath, vertices, faces)
+        return vertices, faces
+
+
+# Shared store for the API process
+meshStore = MeshStore()
@@ -0,0 +1,203 @@
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.geometry.materials import MATERIALS, allowableStressMpa
+
+load_dotenv()
+
+# Required ratio of allowable (fatigue) stress to peak stress under the governing load case
+STRUCTURAL_MIN_SAFETY_FACTOR = float(os.getenv("STRUCTURAL_MIN_SAFETY_FACTOR", "2.0"))
+# Wall thicknesses evaluated for every material (the socket's own wall is always added)
+STRUCTURAL_THICKNESSES_MM = [float(v) for v in os.getenv("STRUCTURAL_THICKNESSES_MM", "3,4,5,6,8,10,12").split(",")
+                             if v.strip()]
+# Body mass used for the load cases (no weight is collected from the user yet)
+STRUCTURAL_BODY_MASS_KG = float(os.getenv("STRUCTURAL_BODY_MASS_KG", "80"))
+STRUCTURAL_ANIMAL_MASS_KG = float(os.getenv("STRUCTURAL_ANIMAL_MASS_KG", "30"))
+# Distance from the socket's distal end to the ground (lever arm of lateral ground forces)
+STRUCTURAL_PYLON_LENGTH_MM = float(os.getenv("STRUCTURAL_PYLON_LENGTH_MM", "300"))
+# Share of the axial load carried by the distal end (the rest by the socket walls)
+STRUCTURAL_END_BEARING = float(os.getenv("STRUCTURAL_END_BEARING", "0.1"))
+
+GRAVITY = 9.81
+
+# Peak ground reaction per load case, in body weights: axial (heel strike / push-off)
+# and lateral (shear in the sagittal plane), from typical gait-lab ranges
+LOAD_CASES = {
+    "walk": {"axialBw": 1.5, "lateralRatio": 0.15},
+    "run": {"axialBw": 2.8, "lateralRatio": 0.20},
+    "sport": {"axialBw": 3.5, "lateralRatio": 0.25},
+}
+# Activity choices of the studio form -> load case (unknown activities count as walking)
+ACTIVITY_LOAD_CASES = {"Walk": "walk", "Daily": "walk", "Swimming": "walk", "Cycling": "walk",
+                       "Run": "run", "Sport": "sport"}
+# Material preference per governing load case; the first one that is strong enough is used
+MATERIAL_PREFERENCES = {
+    "walk": ("PLA", "PETG", "PA12", "PA12-CF"),
+    "run": ("TPU", "PETG", "PA12", "PA12-CF"),
+    "sport": ("PA12", "PETG", "PA12-CF"),
+}
+
+# Distal faces tilted more than ~17 degrees from the axis form the end cap (socket walls
+# taper far less than that); the tube model only applies above it
+_CAP_NORMAL_Z = 0.3
+_CAP_HEIGHT_FRACTION = 0.35
+
+
+def loadCases(activityLevel: List[str]) -> List[str]:
+    """
+    Load cases for the selected activities, lightest first (walking is always included).
+    """
+    names = {"walk"} | {ACTIVITY_LOAD_CASES.get(activity, "walk") for activity in activityLevel or []}
+    return [name for name in LOAD_CASES if name in names]
+
+
+def preferredMaterial(activityLevel: List[str]) -> str:
+    return MATERIAL_PREFERENCES[loadCases(activityLevel)[-1]][0]
+
+
+def unitStresses(vertices: np.ndarray, faces: np.ndarray, axialN: np.ndarray,
+                 lateralN: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Per-element stress resultants of the socket shell, for a unit wall thickness
+    (arrays of shape (loadCases, faces)); see estimateStructure for the model.
+
+        axial  -> axial membrane + beam bending stress * t   (MPa * mm)
+        hoop   -> hoop membrane stress * t                   (MPa * mm)
+        cap    -> end-cap plate bending stress * t^2         (MPa * mm^2)
+    """
+    tri = vertices[faces]
+    centroids = tri.mean(axis=1)
+    cross = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    doubleArea = np.linalg.norm(cross, axis=1)
+    normalZ = np.abs(cross[:, 2]) / np.maximum(doubleArea, 1e-12)
+
+    # Socket axis: z through the centre of the mesh
+    center = vertices[:, :2].mean(axis=0)
+    offset = centroids[:, :2] - center
+    radius = np.maximum(np.linalg.norm(offset, axis=1), 1.0)
+    bendingSide = offset[:, 0] / radius
+    z = centroids[:, 2]
+    zMin, zMax = z.min(), z.max()
+    height = max(zMax - zMin, 1.0)
+
+    cap = (normalZ > _CAP_NORMAL_Z) & (z < zMin + _CAP_HEIGHT_FRACTION * height)
+    capRadius = radius[cap].max() if cap.any() else radius.min()
+
+    # Walls take the load from the stump uniformly along their length: a section at
+    # height z carries the share transferred above it, with the lever arm down to the ground
+    share = ((zMax - z) / height)[None, :]
+    wallAxial = (1.0 - STRUCTURAL_END_BEARING) * axialN
+    moment = share * lateralN[:, None] * (STRUCTURAL_PYLON_LENGTH_MM + (z - zMin))[None, :]
+    # Thin-walled tube: A = 2 pi r t, I = pi r^3 t (stance load is compressive)
+    axial = -share * wallAxial[:, None] / (2.0 * np.pi * radius) + moment * bendingSide / (np.pi * radius ** 2)
+
+    # Stump-socket interface pressure over the inner surface (half the shell area)
+    innerArea = 0.25 * doubleArea.sum()
+    pressure = wallAxial / innerArea
+    hoop = pressure[:, None] * radius[None, :]
+
+    # End cap as a clamped circular plate under the end-bearing load: 3 q a^2 / 4 t^2
+    capPressure = STRUCTURAL_END_BEARING * axialN / (np.pi * capRadius ** 2)
+    capBending = np.where(cap[None, :], 0.75 * capPressure[:, None] * capRadius ** 2, 0.0)
+    # The cap carries its load in plate bending, not as part of the tube
+    axial = np.where(cap[None, :], 0.0, axial)
+    hoop = np.where(cap[None, :], 0.0, hoop)
+
+    return {"axial": axial, "hoop": hoop, "cap": capBending, "centroids": centroids}
+
+
+def estimateStructure(vertices: np.ndarray, faces: np.ndarray, wallThicknessMm: float,
+                      activityLevel: List[str], subjectType: str = "HUMAN",
+                      thicknesses: Optional[List[float]] = None,
+                      requiredSafetyFactor: float = STRUCTURAL_MIN_SAFETY_FACTOR) -> Dict[str, Any]:
+    """
+    Fast structural check of a socket mesh for the selected activities.
+
+    Shell + beam approximation per triangle: the socket is a thin-walled tube along z
+    (axial membrane load and beam bending from the lateral ground reaction), with hoop
+    stress from the stump pressure and plate bending in the distal end cap. Von Mises
+    stress per element and a separate check of axial tension across the print layers
+    give a safety factor against each material's fatigue strength. All load cases,
+    wall thicknesses and elements are evaluated in one broadcast (no Python loops
+    over elements), then the first preferred material that is strong enough is chosen.
+
+    Returns a JSON-safe summary for designParameters["structural"].
+    """
+    startedAt = time.perf_counter()
+    cases = loadCases(activityLevel)
+    bodyMass = STRUCTURAL_ANIMAL_MASS_KG if subjectType == "ANIMAL" else STRUCTURAL_BODY_MASS_KG
+    axialN = np.array([LOAD_CASES[case]["axialBw"] for case in cases]) * bodyMass * GRAVITY
+    lateralN = axialN * np.array([LOAD_CASES[case]["lateralRatio"] for case in cases])
+
+    unit = unitStresses(vertices, faces, axialN, lateralN)
+    wall = round(float(wallThicknessMm), 2)
+    candidates = np.array(sorted(set(thicknesses or STRUCTURAL_THICKNESSES_MM) | {wall}))
+
+    # (cases, thicknesses, elements): membrane terms scale with 1/t, plate bending with 1/t^2
+    t = candidates[None, :, None]
+    membrane = unit["axial"][:, None, :] / t
+    bending = unit["cap"][:, None, :] / t ** 2
+    axial = membrane + bending
+    hoop = unit["hoop"][:, None, :] / t + bending
+    vonMises = np.sqrt(axial ** 2 - axial * hoop + hoop ** 2)
+    peakVonMises = vonMises.max(axis=2)
+    # Only the walls' axial stress crosses the (horizontal) print layers; the cap bends in-plane
+    peakTension = np.maximum(membrane.max(axis=2), 1e-9)
+
+    # (cases, materials, thicknesses): the element maxima do not depend on the material
+    names = list(MATERIALS)
+    allowable = np.array([allowableStressMpa(name) for name in names])[None, :, None]
+    interlayer = np.array([MATERIALS[name]["interlayerRatio"] for name in names])[None, :, None]
+    factors = np.minimum(allowable / peakVonMises[:, None, :],
+                         allowable * interlayer / peakTension[:, None, :])
+    governing = factors.min(axis=0)
+    governingCase = factors.argmin(axis=0)
+
+    wallIndex = int(np.searchsorted(candidates, wall))
+    preferences = MATERIAL_PREFERENCES[cases[-1]]
+    material = next((name for name in preferences if governing[names.index(name), wallIndex] >= requiredSafetyFactor),
+                    None)
+    passes = material is not None
+    achievable = True
+    if passes:
+        requiredThickness = wall
+    else:
+        # Not strong enough at this wall: the preferred material at the thinnest wall that is
+        thicker = [(float(candidates[i]), name) for name in preferences for i in range(wallIndex + 1, len(candidates))
+                   if governing[names.index(name), i] >= requiredSafetyFactor]
+        if thicker:
+            requiredThickness, material = min(thicker, key=lambda item: (item[0], preferences.index(item[1])))
+        else:
+            achievable = False
+            material = max(preferences, key=lambda name: governing[names.index(name), -1])
+            requiredThickness = float(candidates[-1])
+
+    m = names.index(material)
+    case = int(governingCase[m, wallIndex])
+    peakElement = int(vonMises[case, wallIndex].argmax())
+    return {
+        "material": material,
+        "wallThicknessMm": wall,
+        "safetyFactor": round(float(governing[m, wallIndex]), 2),
+        "requiredSafetyFactor": requiredSafetyFactor,
+        "passes": passes,
+        # False when no candidate wall is strong enough (a thicker retry would not help)
+        "achievable": achievable,
+        "requiredThicknessMm": round(requiredThickness, 2),
+        "governingLoadCase": cases[case],
+        "peakStressMpa": round(float(peakVonMises[case, wallIndex]), 2),
+        "peakAtMm": [round(float(v), 1) for v in unit["centroids"][peakElement]],
+        "loadCases": [{"name": name, "axialN": round(float(a)), "lateralN": round(float(b))}
+                      for name, a, b in zip(cases, axialN, lateralN)],
+        # Safety factor per material and wall thickness under the governing load case
+        "candidates": [
+            {"material": name, "thicknessMm": float(candidates[i]), "safetyFactor": round(float(governing[j, i]), 2)}
+            for j, name in enumerate(names) for i in range(len(candidates))
+        ],
+        "elements": int(len(faces)),
+        "elapsedMs": round((time.perf_counter() - startedAt) * 1000, 1),
+    }
@@ -1,28 +1,76 @@
+import functools
+import os
+import time
+
+from dotenv import load_dotenv
+from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.graph import END, StateGraph
 
 from app.agents.analyst import anatomicalAnalystNode
 from app.agents.designer import designEngineerNode
+from app.agents.preprocessor import preprocessorNode
 from app.agents.prompt_engineer import promptEngineerNode
 from app.agents.safety import safetyAuditorNode
+from app.agents.speculative import speculativeVisionNode
 from app.agents.supervisor import supervisorNode
 from app.agents.technical_writer import technicalWriterNode
+from app.agents.triage import triageNode
 from app.agents.validator import validatorNode
 from app.agents.visualizer import visualizerNode
 from app.models.state import AuraState
-
-
-def buildInfoGraph():
+from app.services import metrics
+
+load_dotenv()
+
+# Vision stage topology, switchable per deployment (A/B):
+#   "split"    -> Validator, then Vision Analyst (two multimodal calls)
+#   "combined" -> single Triage node doing both in one structured call
+#   "speculative" -> Validator and Vision Analyst started concurrently; analyst result
+#                    committed on approval, cancelled/discarded on rejection
+VISION_MODE = os.getenv("VISION_MODE", "split")
+
+
+def instrumentNode(name: str, node):
+    """
+    Wraps a node to record its wall time and outcome (Prometheus + ?timings=true breakdown).
+    """
+    @functools.wraps(node)
+    async def instrumented(state: AuraState) -> AuraState:
+        startedAt = time.perf_counter()
+        status = "error"
+        try:
+            result = await node(state)
+            status = "ok"
+            return result
+        finally:
+            elapsed = time.perf_counter() - startedAt
+            metrics.nodeDuration.observe(elapsed, node=name)
+            metrics.nodeRuns.inc(node=name, status=status)
+            timings = metrics.currentTimings.get()
+            if timings is not None:
+                timings.addNode(name, elapsed, status)
+
+    return instrumented
+
+
+def buildInfoGraph(visionMode: str = VISION_MODE, checkpointer=None):
     workflow = StateGraph(AuraState)
 
     # 1. Add All Nodes
-    workflow.add_node("supervisor", supervisorNode)
-    workflow.add_node("validator", validatorNode)
-    workflow.add_node("analyst", anatomicalAnalystNode)
-    workflow.add_node("prompt_engineer", promptEngineerNode)
-    workflow.add_node("visualizer", visualizerNode)
-    workflow.add_node("designer", designEngineerNode)
-    workflow.add_node("safety", safetyAuditorNode)
-    workflow.add_node("technical_writer", technicalWriterNode)
+    workflow.add_node("supervisor", instrumentNode("supervisor", supervisorNode))
+    workflow.add_node("preprocessor", instrumentNode("preprocessor", preprocessorNode))
+    if visionMode == "combined":
+        workflow.add_node("triage", instrumentNode("triage", triageNode))
+    elif visionMode == "speculative":
+        workflow.add_node("vision", instrumentNode("vision", speculativeVisionNode))
+    else:
+        workflow.add_node("validator", instrumentNode("validator", validatorNode))
+        workflow.add_node("analyst", instrumentNode("analyst", anatomicalAnalystNode))
+    workflow.add_node("prompt_engineer", instrumentNode("prompt_engineer", promptEngineerNode))
+    workflow.add_node("visualizer", instrumentNode("visualizer", visualizerNode))
+    workflow.add_node("designer", instrumentNode("designer", designEngineerNode))
+    workflow.add_node("safety", instrumentNode("safety", safetyAuditorNode))
+    workflow.add_node("technical_writer", instrumentNode("technical_writer", technicalWriterNode))
 
     # 2. Set Entry Point
     workflow.set_entry_point("supervisor")
@@ -30,6 +78,8 @@ def buildInfoGraph():
     # 3. Router Logic
     def routeStep(state: AuraState):
         step = state.get("nextStep", END)
+        if step == "preprocess":
+            return "preprocessor"
         if step == "validate":
             return "validator"
         if step == "analyst":
@@ -46,32 +96,59 @@ def buildInfoGraph():
             return "safety"
         if step == "technical_writer":
             return "technical_writer"
+        if step == "branches":
+            return ["prompt_engineer", "designer"]  # Parallel fan-out
         return END
 
     # 4. Define Edges
 
-    # Supervisor -> Validator
+    # Supervisor -> Preprocessor (new design)
+    # Supervisor -> Designer and/or Prompt Engineer (re-design of a checkpointed session:
+    # vision results are reused, only the branches whose inputs changed run again)
     workflow.add_conditional_edges(
         "supervisor",
         routeStep,
-        {"validator": "validator", END: END}
-    )
-
-    # Validator -> Analyst (or BLOCK/END)
-    workflow.add_conditional_edges(
-        "validator",
-        routeStep,
-        {"analyst": "analyst", END: END}
+        {"preprocessor": "preprocessor", "designer": "designer", "prompt_engineer": "prompt_engineer", END: END}
     )
 
-    # Analyst -> Prompt Engineer
-    workflow.add_edge("analyst", "prompt_engineer")
-
-    # Prompt Engineer -> Visualizer
+    # Vision stage fans out into two independent branches that run concurrently:
+    #   Image generation: Prompt Engineer -> Visualizer
+    #   Engineering:      Designer -> Safety -> Technical Writer
+    # Neither branch reads the other's outputs; both join at END.
+    if visionMode == "combined":
+        # Preprocessor -> Triage -> both branches (or BLOCK/END)
+        workflow.add_edge("preprocessor", "triage")
+        workflow.add_conditional_edges(
+            "triage",
+            routeStep,
+            {"prompt_engineer": "prompt_engineer", "designer": "designer", END: END}
+        )
+    elif visionMode == "speculative":
+        # Preprocessor -> Validator || Analyst -> both branches (or BLOCK/END)
+        workflow.add_edge("preprocessor", "vision")
+        workflow.add_conditional_edges(
+            "vision",
+            routeStep,
+            {"prompt_engineer": "prompt_engineer", "designer": "designer", END: END}
+        )
+    else:
+        # Preprocessor -> Validator (image decoded/resized/encoded once for all vision agents)
+        workflow.add_edge("preprocessor", "validator")
+
+        # Validator -> Analyst (or BLOCK/END)
+        workflow.add_conditional_edges(
+            "validator",
+            routeStep,
+            {"analyst": "analyst", END: END}
+        )
+
+        # Analyst -> both branches
+        workflow.add_edge("analyst", "prompt_engineer")
+        workflow.add_edge("analyst", "designer")
+
+    # Prompt Engineer -> Visualizer -> END
     workflow.add_edge("prompt_engineer", "visualizer")
-
-    # Visualizer -> Designer
-    workflow.add_edge("visualizer", "designer")
+    workflow.add_edge("visualizer", END)
 
     # Designer -> Safety
     workflow.add_edge("designer", "safety")
@@ -86,8 +163,11 @@ def buildInfoGraph():
     # Technical Writer -> END
     workflow.add_edge("technical_writer", END)
 
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
 
+# Per-session checkpoints (thread_id = sessionId), used by incremental re-design
+checkpointer = InMemorySaver()
 
 # Validated Graph Instance
-auraGraph = buildInfoGraph()
+auraGraph = buildInfoGraph(checkpointer=checkpointer)
@@ -1,20 +1,50 @@
+import asyncio
+import gzip
 import logging
-import os
+import weakref
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-from app.graph import auraGraph
+from app.batch import BATCH_MAX_ITEMS, batchDesignEvents, parseBatchItems
+from app.geometry.library import baseModelLibrary
+from app.graph import auraGraph, checkpointer
 from app.models.state import AuraState
-from fastapi import FastAPI, File, Form, UploadFile
+from app.services.artifacts import artifactStore
+from app.services.blobs import UploadTooLargeError, blobStore
+from app.services.cache import textCache, visionCache
+from app.services.deadlines import newDeadline
+from app.services.gateway import llmGateway
+from app.services.jobs import PRIORITIES, JobQueueFullError, jobQueue
+from app.services.mesh_pool import meshPool
+from app.services.metrics import CONTENT_TYPE, RequestTimings, currentTimings, registry
+from app.services.sessions import DesignSessions, SessionNotFoundError, redesignSteps
+from app.streaming import formatSseEvent, queuedDesignEvents, toResponseState
+from fastapi import FastAPI, File, Form, Query, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
 # --- Configuration ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="BIOSTRIDE API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Mesh workers load the socket template library themselves; without workers the
+    # geometry runs in this process, so load it here once instead of on the first request
+    if meshPool.workers <= 0:
+        baseModelLibrary.load()
+    meshPool.start()
+    await jobQueue.start()
+    await artifactStore.start()
+    yield
+    await artifactStore.stop()
+    await jobQueue.stop()
+    meshPool.shutdown()
+
+
+app = FastAPI(title="BIOSTRIDE API", lifespan=lifespan)
 
 # --- CORS & Middleware ---
 app.add_middleware(
@@ -27,63 +57,447 @@ app.add_middleware(
 
 # --- Path Configuration ---
 BASE_DIR = Path(__file__).resolve().parent.parent
-OUTPUT_DIR = BASE_DIR / "output"
 FRONTEND_DIR = BASE_DIR.parent / "frontend"
 
-# Ensure output directory exists
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+# Content-addressed artifacts never change, so browsers and CDNs may cache them for good
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Every design run is a checkpointed session that can be re-designed incrementally
+designSessions = DesignSessions(checkpointer)
+
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def collectRuntimeStats():
+    """
+    Scrape-time gauges from the caches, job queue, sessions and LLM gateway (GET /metrics).
+    """
+    caches = [visionCache.stats(), textCache.stats()]
+    jobs = jobQueue.stats()
+    gateway = llmGateway.stats()
+    yield "cache_entries", "Entries held in memory per result cache.", [
+        ({"cache": cache["namespace"]}, cache["size"]) for cache in caches
+    ]
+    yield "cache_lookups", "Result cache lookups by result since start.", [
+        ({"cache": cache["namespace"], "result": result}, value) for cache in caches
+        for result, value in (("hit", cache["hits"] - cache["diskHits"]), ("disk_hit", cache["diskHits"]),
+                              ("miss", cache["misses"]))
+    ]
+    yield "cache_evictions", "Result cache evictions since start.", [
+        ({"cache": cache["namespace"]}, cache["evictions"]) for cache in caches
+    ]
+    yield "jobs", "Design jobs by state (queued/running now, completed/failed/rejected since start).", [
+        ({"state": key}, jobs[key]) for key in ("queued", "running", "completed", "failed", "rejected")
+    ]
+    yield "job_workers", "Concurrent design runs allowed.", [({}, jobs["workers"])]
+    yield "design_sessions", "Checkpointed design sessions kept for re-design.", [
+        ({}, designSessions.stats()["sessions"])
+    ]
+    artifacts = artifactStore.stats()
+    yield "artifact_files", "Files in the artifact store (as of the last sweep).", [({}, artifacts["files"])]
+    yield "artifact_bytes", "Bytes in the artifact store (as of the last sweep).", [({}, artifacts["bytes"])]
+    yield "artifact_writes", "Artifacts produced since start, by whether the content was already stored.", [
+        ({"result": "stored"}, artifacts["stored"]),
+        ({"result": "deduplicated"}, artifacts["deduplicated"]),
+    ]
+    yield "llm_in_flight", "Distinct model calls in flight (after coalescing).", [({}, gateway["inFlight"])]
+    yield "llm_circuit_state", "Circuit breaker state per model (0 closed, 1 half-open, 2 open).", [
+        ({"model": model}, BREAKER_STATES.get(stats["state"], 0)) for model, stats in gateway["breakers"].items()
+    ]
+    yield "llm_bucket_waiting", "Calls waiting for a rate-limit token.", [
+        ({"bucket": name}, stats["waiting"]) for name, stats in gateway["buckets"].items()
+    ]
+    yield "llm_bucket_wait_seconds", "Total time calls spent waiting for rate-limit tokens.", [
+        ({"bucket": name}, stats["waitedSeconds"]) for name, stats in gateway["buckets"].items()
+    ]
+
+
+registry.collector(collectRuntimeStats)
+
+def buildInitialState(imageBlob: Dict[str, Any], filename: str, limbConfig: str, activity: List[str],
+                      notes: str, imagePayload: Optional[Dict[str, Any]] = None) -> AuraState:
+    """
+    Builds the initial graph state from the uploaded image's blob handle and user preferences.
+    The state never holds the image bytes: agents read them from the blob store on demand.
+    An `imagePayload` from an earlier preprocessing pass is reused instead of preprocessing again.
+    """
+    state = {
+        "imageBlob": imageBlob,
+        "imageHash": imageBlob["blobId"],
+        "referenceScale": 0.0,
+
+        # User Inputs
+        "limbConfiguration": limbConfig,
+        "activityLevel": activity,
+        "userNotes": notes,
+
+        # Internal System Data
+        "anatomicalFeatures": {},
+        "designParameters": {},
+        "stlPath": "",
+        "safetyNotes": [],
+        "nextStep": "",
+        "messages": [f"System: Received image {filename}"]
+    }
+    if imagePayload:
+        state["imagePayload"] = imagePayload
+    return state
+
+
+async def runDesign(imageBlob: Dict[str, Any], filename: str, limbConfig: str, activity: List[str], notes: str,
+                    timings: Optional[RequestTimings] = None,
+                    imagePayload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Runs the agent graph as a new design session and returns the JSON-safe final state
+    (with a per-node / per-call breakdown under "timings" if `timings` is given).
+    """
+    initial_state = buildInitialState(imageBlob, filename, limbConfig, activity, notes, imagePayload)
+    sessionId = designSessions.create()
+    initial_state["sessionId"] = sessionId
+    # Per-request deadline, propagated through the state to every node's time budget
+    initial_state["deadline"] = newDeadline()
+    token = currentTimings.set(timings)
+    try:
+        async with designSessions.lock(sessionId):
+            final_state = await auraGraph.ainvoke(initial_state, designSessions.config(sessionId))
+    finally:
+        currentTimings.reset(token)
+    response_state = toResponseState(final_state)
+    if timings is not None:
+        response_state["timings"] = timings.summary()
+    return response_state
+
+
+async def designJob(payload: Dict[str, Any], data: bytes) -> Dict[str, Any]:
+    # Background job handler (POST /api/jobs); jobs persisted before blob handles carry the bytes
+    imageBlob = payload.get("imageBlob") or await asyncio.to_thread(blobStore.put, data)
+    return await runDesign(imageBlob, payload["filename"], payload["limbConfig"], payload["activity"], payload["notes"])
+
+
+jobQueue.register("design", designJob)
+
+
+def queueFullResponse(error: JobQueueFullError) -> JSONResponse:
+    # Early backpressure: the client retries later instead of piling onto Gemini
+    return JSONResponse(content={"error": str(error)}, status_code=429, headers={"Retry-After": "5"})
+
+
+def uploadTooLargeResponse(error: UploadTooLargeError) -> JSONResponse:
+    return JSONResponse(content={"error": str(error)}, status_code=413)
+
 
 @app.post("/api/process-design")
 async def process_design(
     image: UploadFile = File(...),
     limbConfig: str = Form("Not specified"),
     activity: List[str] = Form([]),
-    notes: str = Form("")
+    notes: str = Form(""),
+    timings: bool = Query(False)
 ):
     """
     Main Endpoint: Processes the uploaded image and user preferences through the BIOSTRIDE AI Agent Graph.
+    Runs under the job queue's concurrency limit (waits for a free worker, 429 if the queue is full).
+    With ?timings=true the response includes per-node wall times, model calls, tokens and estimated cost.
     """
+    try:
+        slot = jobQueue.reserve("high")
+    except JobQueueFullError as e:
+        return queueFullResponse(e)
+
     try:
         logger.info(f"Processing design request for file: {image.filename}")
-        
-        # Read the image bytes
-        image_bytes = await image.read()
-
-        # Initialize State
-        initial_state: AuraState = {
-            "rawImage": image_bytes,
-            "referenceScale": 0.0,
-            
-            # User Inputs
-            "limbConfiguration": limbConfig,
-            "activityLevel": activity,
-            "userNotes": notes,
-
-            # Internal System Data
-            "anatomicalFeatures": {},
-            "designParameters": {},
-            "stlPath": "",
-            "safetyNotes": [],
-            "nextStep": "",
-            "messages": [f"System: Received image {image.filename}"]
-        }
-
-        # Execute Graph
-        final_state = await auraGraph.ainvoke(initial_state)
-
-        # Create Response (Remove binary data)
-        response_state = final_state.copy()
-        response_state.pop("rawImage", None) 
 
+        # Stream the upload to the blob store (never held in memory whole)
+        imageBlob = await blobStore.saveUpload(image)
+
+        # Execute Graph (as a new design session) once a worker is free
+        async with slot:
+            response_state = await runDesign(imageBlob, image.filename, limbConfig, activity, notes,
+                                             RequestTimings() if timings else None)
+
+        # Create Response (binary data already removed)
         return JSONResponse(content=response_state)
 
+    except UploadTooLargeError as e:
+        return uploadTooLargeResponse(e)
+    except JobQueueFullError as e:
+        # The queue filled up while the upload was being stored
+        return queueFullResponse(e)
     except Exception as e:
         logger.error(f"Error processing design: {str(e)}", exc_info=True)
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
-# --- Static Files Mounting ---
-app.mount("/outputs", StaticFiles(directory=str(OUTPUT_DIR)), name="outputs")
 
+@app.post("/api/process-design/stream")
+async def process_design_stream(
+    image: UploadFile = File(...),
+    limbConfig: str = Form("Not specified"),
+    activity: List[str] = Form([]),
+    notes: str = Form("")
+):
+    """
+    Streaming Endpoint: Same pipeline as /api/process-design, but pushes each node's
+    messages, timings and partial artifacts as Server-Sent Events while the graph runs.
+    A `queued` event reports the queue position while waiting for a worker.
+    """
+    try:
+        slot = jobQueue.reserve("high")
+    except JobQueueFullError as e:
+        return queueFullResponse(e)
+
+    logger.info(f"Streaming design request for file: {image.filename}")
+
+    # The upload must be stored before the response starts streaming
+    try:
+        imageBlob = await blobStore.saveUpload(image)
+    except UploadTooLargeError as e:
+        return uploadTooLargeResponse(e)
+    initial_state = buildInitialState(imageBlob, image.filename, limbConfig, activity, notes)
+    # Join the queue before the response starts: if it filled up during the upload the
+    # client still gets a 429, not a 200 with an error event
+    try:
+        slot.enqueue()
+    except JobQueueFullError as e:
+        return queueFullResponse(e)
+    sessionId = designSessions.create()
+    initial_state["sessionId"] = sessionId
+
+    events = queuedDesignEvents(auraGraph, initial_state, designSessions.config(sessionId), slot,
+                                designSessions.lock(sessionId))
+    # A client that disconnects before the first frame never starts the generator (so its
+    # finally never runs): give the slot back when the generator is collected
+    weakref.finalize(events, slot.release)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/process-batch")
+async def process_batch(
+    images: List[UploadFile] = File(...),
+    items: str = Form(""),
+    limbConfig: str = Form("Not specified"),
+    activity: List[str] = Form([]),
+    notes: str = Form("")
+):
+    """
+    Batch Intake: runs many photos in one call and streams each item's result as Server-Sent
+    Events as soon as it finishes (completion order, tagged with the upload index).
+    `items` is an optional JSON list of per-image {limbConfig, activity, notes}; the plain
+    form fields are the defaults. Identical photos share one vision pass and identical
+    (photo, options) items one design run; the batch runs under a shared concurrency budget
+    and the job queue's worker limit (see app/batch.py).
+    """
+    if len(images) > BATCH_MAX_ITEMS:
+        return JSONResponse(content={"error": f"A batch holds at most {BATCH_MAX_ITEMS} images."},
+                            status_code=413)
+    try:
+        options = parseBatchItems(items, len(images), {"limbConfig": limbConfig, "activity": activity,
+                                                       "notes": notes})
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=422)
+
+    logger.info(f"Batch design request with {len(images)} images")
+
+    # All uploads must be stored before the response starts streaming
+    batch = []
+    try:
+        for index, (image, option) in enumerate(zip(images, options)):
+            imageBlob = await blobStore.saveUpload(image)
+            batch.append({**option, "index": index, "filename": image.filename, "imageBlob": imageBlob})
+    except UploadTooLargeError as e:
+        return uploadTooLargeResponse(e)
+
+    async def runItem(item: Dict[str, Any], imagePayload: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return await runDesign(item["imageBlob"], item["filename"], item["limbConfig"], item["activity"],
+                               item["notes"], imagePayload=imagePayload)
+
+    return StreamingResponse(
+        batchDesignEvents(batch, runItem),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(
+    image: UploadFile = File(...),
+    limbConfig: str = Form("Not specified"),
+    activity: List[str] = Form([]),
+    notes: str = Form(""),
+    priority: str = Form("normal")
+):
+    """
+    Job Submission: queues a design run and returns immediately with its job id.
+    Poll GET /api/jobs/{jobId} or follow GET /api/jobs/{jobId}/events for the result.
+    """
+    if priority not in PRIORITIES:
+        return JSONResponse(content={"error": f"priority must be one of {', '.join(PRIORITIES)}"},
+                            status_code=422)
+    try:
+        imageBlob = await blobStore.saveUpload(image)
+    except UploadTooLargeError as e:
+        return uploadTooLargeResponse(e)
+    # Only the blob handle is queued (and persisted): the worker reads the image from the store
+    payload = {"filename": image.filename, "limbConfig": limbConfig, "activity": activity, "notes": notes,
+               "imageBlob": imageBlob}
+    try:
+        jobId = jobQueue.submit("design", payload, priority=priority)
+    except JobQueueFullError as e:
+        return queueFullResponse(e)
+
+    logger.info(f"Queued design job {jobId} for file: {image.filename}")
+    return JSONResponse(content=jobQueue.get(jobId), status_code=202)
+
+
+@app.get("/api/jobs/{jobId}")
+async def get_job(jobId: str):
+    """
+    Job Status: queued (with position) / running / done (with result) / failed (with error).
+    """
+    job = jobQueue.get(jobId)
+    if job is None:
+        return JSONResponse(content={"error": "Unknown or expired job."}, status_code=404)
+    return JSONResponse(content=job)
+
+
+@app.get("/api/jobs/{jobId}/events")
+async def job_events(jobId: str):
+    """
+    Job Stream: Server-Sent Events with `status` updates until the job finishes,
+    then the final `status` (with result or error).
+    """
+    if jobQueue.get(jobId) is None:
+        return JSONResponse(content={"error": "Unknown or expired job."}, status_code=404)
+
+    async def events():
+        lastStatus = None
+        while True:
+            job = await jobQueue.wait(jobId, timeout=1.0)
+            if job is None:
+                yield formatSseEvent("error", {"error": "Unknown or expired job."})
+                return
+            status = (job["status"], job.get("position"))
+            if status != lastStatus or job["finishedAt"] is not None:
+                yield formatSseEvent("status", job)
+                lastStatus = status
+            if job["finishedAt"] is not None:
+                return
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.patch("/api/designs/{sessionId}")
+async def redesign(
+    sessionId: str,
+    limbConfig: Optional[str] = Form(None),
+    activity: Optional[List[str]] = Form(None),
+    notes: Optional[str] = Form(None)
+):
+    """
+    Incremental Re-design: applies changed user inputs to an existing design session
+    and re-runs only the branches that read them (e.g. a new activity re-runs
+    Designer -> Safety -> Technical Writer). Vision results and unaffected outputs
+    are reused from the session checkpoint. Omitted fields are left unchanged.
+    """
+    try:
+        lock = designSessions.lock(sessionId)
+    except SessionNotFoundError:
+        return JSONResponse(content={"error": "Unknown or expired design session."}, status_code=404)
+
+    try:
+        config = designSessions.config(sessionId)
+        async with lock:
+            current = (await auraGraph.aget_state(config)).values
+            if not current.get("isValidLimb"):
+                return JSONResponse(content={"error": "This session has no approved design to update."},
+                                    status_code=409)
+
+            changes = {
+                key: value for key, value in
+                (("limbConfiguration", limbConfig), ("activityLevel", activity), ("userNotes", notes))
+                if value is not None
+            }
+            steps = redesignSteps(current, changes)
+            if not steps:
+                response_state = toResponseState(current)
+                response_state["messages"] = ["Supervisor: No input changed. Design is up to date."]
+                return JSONResponse(content=response_state)
+
+            logger.info(f"Re-design of session {sessionId}: {', '.join(steps)}")
+            update = {**changes, "redesignSteps": steps, "deadline": newDeadline()}
+            if "designer" in steps:
+                update.update({"designAttempts": 0, "meshAudit": {}})
+            seenMessages = len(current.get("messages", []))
+            seenNotes = len(current.get("safetyNotes", []))
+
+            final_state = await auraGraph.ainvoke(update, config)
+
+        # Return this iteration's log (and, if the design was regenerated, its safety notes only)
+        response_state = toResponseState(final_state)
+        response_state["messages"] = final_state["messages"][seenMessages:]
+        if "designer" in steps:
+            response_state["safetyNotes"] = final_state["safetyNotes"][seenNotes:]
+        return JSONResponse(content=response_state)
+
+    except Exception as e:
+        logger.error(f"Error re-designing session {sessionId}: {str(e)}", exc_info=True)
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@app.get("/outputs/{name:path}")
+async def get_artifact(name: str, request: Request):
+    """
+    Artifact Download: generated STLs and previews. Content-addressed names get their hash
+    as a strong ETag (If-None-Match -> 304) and immutable caching; Range requests are supported.
+    Preview meshes are stored gzip-compressed and sent as-is (Content-Encoding: gzip).
+    """
+    path = artifactStore.localPath(name)
+    if path is None:
+        return JSONResponse(content={"error": "Artifact not found or expired."}, status_code=404)
+
+    etag = artifactStore.etag(name)
+    if etag is None:
+        # Legacy (timestamp/uuid-named) files: default validators, no long-term caching
+        return FileResponse(path)
+
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    precompressed = artifactStore.isPrecompressed(name)
+    acceptsGzip = "gzip" in request.headers.get("accept-encoding", "")
+    if precompressed:
+        headers["Vary"] = "Accept-Encoding"
+        if not acceptsGzip:
+            headers["ETag"] = f'{etag[:-1]}-identity"'
+
+    ifNoneMatch = request.headers.get("if-none-match", "")
+    if headers["ETag"] in (tag.strip() for tag in ifNoneMatch.split(",")) or ifNoneMatch.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    if precompressed and not acceptsGzip:
+        # Rare (every browser sends Accept-Encoding: gzip): inflate for this client
+        data = await asyncio.to_thread(lambda: gzip.decompress(path.read_bytes()))
+        return Response(content=data, media_type="application/octet-stream", headers=headers)
+    if precompressed:
+        headers["Content-Encoding"] = "gzip"
+        return FileResponse(path, media_type="application/octet-stream", headers=headers)
+    return FileResponse(path, headers=headers)
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus scrape endpoint: node and model-call latencies, tokens, estimated cost,
+    fallbacks, mesh sizes, plus cache / queue / gateway gauges.
+    """
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
+# --- Static Files Mounting ---
 if FRONTEND_DIR.exists():
     app.mount("/", StaticFiles(directory=str(FRONTEND_DIR), html=True), name="static")
 else:
@@ -1,12 +1,22 @@
-from typing import Any, Dict, List, Optional, TypedDict
+import operator
+from typing import Annotated, Any, Dict, List, Optional, TypedDict
 
 
 class AuraState(TypedDict):
     """
     State definition for the AuraPrint AI graph.
     Using camelCase for keys as per project instructions.
+
+    Nodes return only the keys they change. `messages` and `safetyNotes` are
+    append-only (reducer: list concatenation) so parallel branches can both write them.
     """
-    rawImage: Optional[bytes]          # Original photo
+    sessionId: str                     # Design session (checkpointer thread) for re-design
+    redesignSteps: List[str]           # Branches to re-run on a re-design ("designer", "prompt_engineer")
+    deadline: float                    # Epoch seconds by which the run must finish (per-node budgets are capped by it)
+
+    imageBlob: Dict[str, Any]          # Handle of the original photo in the blob store ({"blobId", "size"})
+    imageHash: str                     # sha256 of the uploaded bytes (cache key, same as the blobId)
+    imagePayload: Dict[str, Any]       # Handle + metadata of the preprocessed image shared by vision agents
     referenceScale: float              # mm per pixel
 
     # User Inputs
@@ -27,8 +37,11 @@ class AuraState(TypedDict):
     # Engineering & DIY
     designParameters: Dict[str, Any]   # CAD params
     stlPath: Optional[str]             # Path to STL
+    previewMeshes: List[Dict[str, Any]]  # Viewer LODs (quantized, gzip-served), finest first
+    designAttempts: int                # Designer runs so far (bounded safety loop-back)
+    meshAudit: Dict[str, Any]          # Geometric audit of the STL (thickness, watertight, manifold)
     assemblyGuide: str                 # DIY markdown instructions
 
-    safetyNotes: List[str]             # Safety warnings
+    safetyNotes: Annotated[List[str], operator.add]  # Safety warnings
     nextStep: str                      # Flow control (Router)
-    messages: List[str]                # Conversation/Log history
+    messages: Annotated[List[str], operator.add]     # Conversation/Log history
@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Generated STLs and preview images, served under /outputs
+ARTIFACT_DIR = Path(os.getenv("ARTIFACT_DIR", "") or Path(__file__).resolve().parent.parent.parent / "output")
+# Disk budget and lifetime; the sweeper deletes the least recently produced artifacts first
+ARTIFACT_MAX_MB = float(os.getenv("ARTIFACT_MAX_MB", "2048"))
+ARTIFACT_TTL_S = float(os.getenv("ARTIFACT_TTL_S", str(7 * 24 * 3600)))
+ARTIFACT_SWEEP_INTERVAL_S = float(os.getenv("ARTIFACT_SWEEP_INTERVAL_S", "600"))
+
+WEB_PREFIX = "outputs/"
+# Preview meshes (app/geometry/preview.py) are stored gzip-compressed and served as such
+PREVIEW_EXTENSION = ".bspm"
+PRECOMPRESSED_EXTENSIONS = (PREVIEW_EXTENSION,)
+TEMP_PREFIX = ".tmp-"
+# Unfinished writes (e.g. a mesh job that crashed) are removed after this long
+TEMP_TTL_S = 3600
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# Content-addressed names: <aa>/<bb>/<sha256>.<ext>
+ARTIFACT_NAME = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.[a-z0-9]+$")
+
+
+def fileSha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """
+    Content-addressed output files.
+
+    - every artifact is named by the sha256 of its bytes, so concurrent requests can
+      never overwrite each other and identical outputs are stored once
+    - files live in two levels of 256 shard directories, keeping every directory small
+    - a background sweeper deletes artifacts older than `ttlSeconds`, then the oldest
+      ones until the total is under `maxBytes` (re-producing an artifact refreshes it)
+    - names never change meaning, so they are served with a strong ETag (the hash)
+      and as immutable (see GET /outputs/{path} in main.py)
+    """
+
+    def __init__(self, root: Path = ARTIFACT_DIR, maxBytes: int = int(ARTIFACT_MAX_MB * 1024 * 1024),
+                 ttlSeconds: float = ARTIFACT_TTL_S, sweepIntervalSeconds: float = ARTIFACT_SWEEP_INTERVAL_S):
+        self.root = Path(root)
+        self.maxBytes = maxBytes
+        self.ttlSeconds = ttlSeconds
+        self.sweepIntervalSeconds = sweepIntervalSeconds
+        self._sweeper: Optional[asyncio.Task] = None
+        self.stored = 0
+        self.deduplicated = 0
+        self.evicted = 0
+        self.totalBytes = 0
+        self.count = 0
+
+    # --- Writing ---
+
+    def tempPath(self, extension: str) -> str:
+        """
+        A unique path inside the store for a producer to write to before commit().
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        return str(self.root / f"{TEMP_PREFIX}{uuid.uuid4().hex}{extension}")
+
+    def commit(self, tempPath: str, extension: str) -> Dict[str, Any]:
+        """
+        Moves a finished file to its content-addressed name and returns
+        {"name", "webPath", "size", "deduplicated"}.
+        """
+        digest = fileSha256(tempPath)
+        size = os.path.getsize(tempPath)
+        name = f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+        target = self.root / name
+        deduplicated = target.exists()
+        if deduplicated:
+            os.remove(tempPath)
+            os.utime(target)
+            self.deduplicated += 1
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tempPath, target)
+            self.stored += 1
+        return {"name": name, "webPath": WEB_PREFIX + name, "size": size, "deduplicated": deduplicated}
+
+    def put(self, data: bytes, extension: str) -> Dict[str, Any]:
+        tempPath = self.tempPath(extension)
+        with open(tempPath, "wb") as f:
+            f.write(data)
+        return self.commit(tempPath, extension)
+
+    # --- Reading ---
+
+    def localPath(self, name: str) -> Optional[Path]:
+        """
+        File for an artifact name or web path ("outputs/..."), or None if it does not
+        exist or points outside the store.
+        """
+        if name.startswith("/"):
+            name = name[1:]
+        if name.startswith(WEB_PREFIX):
+            name = name[len(WEB_PREFIX):]
+        root = self.root.resolve()
+        path = (root / name).resolve()
+        if root not in path.parents or path.name.startswith(TEMP_PREFIX) or not path.is_file():
+            return None
+        return path
+
+    @staticmethod
+    def isPrecompressed(name: str) -> bool:
+        return name.endswith(PRECOMPRESSED_EXTENSIONS)
+
+    def etag(self, name: str) -> Optional[str]:
+        """
+        Strong ETag of a content-addressed artifact (None for legacy, non-hashed files).
+        """
+        match = ARTIFACT_NAME.match(name)
+        return f'"{match.group(1)}"' if match else None
+
+    # --- Eviction ---
+
+    async def start(self):
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweepLoop())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    async def _sweepLoop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Artifact sweep failed: {e}", exc_info=True)
+            await asyncio.sleep(self.sweepIntervalSeconds)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Deletes expired artifacts and stale temp files, then the oldest artifacts
+        while the store is over its size budget. Returns how many files were removed.
+        """
+        now = now or time.time()
+        cutoff = now - self.ttlSeconds
+        files = []
+        removed = 0
+        for path, stat in self._scan():
+            isTemp = path.name.startswith(TEMP_PREFIX)
+            if stat.st_mtime < (now - TEMP_TTL_S if isTemp else cutoff):
+                removed += self._remove(path)
+            elif not isTemp:
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        kept = len(files)
+        if total > self.maxBytes:
+            files.sort()
+            for _, size, path in files:
+                if total <= self.maxBytes:
+                    break
+                removed += self._remove(path)
+                total -= size
+                kept -= 1
+        self.totalBytes = total
+        self.count = kept
+        if removed:
+            self.evicted += removed
+            logger.info(f"Artifact store: evicted {removed} files, {total / (1024 * 1024):.1f} MB kept")
+        return removed
+
+    def _scan(self):
+        if not self.root.is_dir():
+            return
+        stack = [self.root]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(Path(entry.path))
+                        elif entry.is_file(follow_symlinks=False):
+                            yield Path(entry.path), entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        pass
+
+    @staticmethod
+    def _remove(path: Path) -> int:
+        try:
+            path.unlink()
+            return 1
+        except FileNotFoundError:
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "evicted": self.evicted,
+            "files": self.count,
+            "bytes": self.totalBytes,
+            "maxBytes": self.maxBytes,
+        }
+
+
+# Shared store for the designer's STLs and the visualizer's previews
+artifactStore = ArtifactStore()
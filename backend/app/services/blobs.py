@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Uploaded photos and preprocessed payloads, stored by sha256 (identical uploads share one file)
+BLOB_DIR = os.getenv("BLOB_DIR", "") or os.path.join(tempfile.gettempdir(), "biostride_blobs")
+# Uploads above this size are rejected with HTTP 413
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "20"))
+# Blobs not uploaded again for this long are deleted (long enough for queued jobs and re-designs)
+BLOB_TTL_S = float(os.getenv("BLOB_TTL_S", str(24 * 3600)))
+
+CHUNK_BYTES = 1024 * 1024
+SWEEP_INTERVAL_S = 300
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_UPLOAD_MB (mapped to HTTP 413)."""
+
+
+class BlobNotFoundError(KeyError):
+    """Raised for handles whose blob was swept or never stored."""
+
+
+class BlobStore:
+    """
+    Content-addressed files on local disk. The graph state only carries a small
+    handle ({"blobId", "size"}); agents read the bytes when they need them, so a
+    request's memory does not grow with the size of its upload.
+
+    Uploads are streamed to a temp file in chunks while hashing, then renamed to
+    `<root>/<id[:2]>/<id>`. Blobs not stored again for `ttlSeconds` are swept.
+    """
+
+    def __init__(self, root: str = BLOB_DIR, maxBytes: int = int(MAX_UPLOAD_MB * 1024 * 1024),
+                 ttlSeconds: float = BLOB_TTL_S):
+        self.root = root
+        self.maxBytes = maxBytes
+        self.ttlSeconds = ttlSeconds
+        self._lastSweep = 0.0
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.swept = 0
+
+    def path(self, blobId: str) -> str:
+        return os.path.join(self.root, blobId[:2], blobId)
+
+    # --- Writing ---
+
+    async def saveUpload(self, upload) -> Dict[str, Any]:
+        """
+        Streams a FastAPI UploadFile into the store and returns its handle.
+        Raises UploadTooLargeError as soon as the limit is crossed.
+        """
+        size = getattr(upload, "size", None)
+        if size is not None and size > self.maxBytes:
+            self.rejected += 1
+            raise UploadTooLargeError(self._tooLargeMessage())
+
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        received = 0
+        fd, tempPath = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = await upload.read(CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    received += len(chunk)
+                    if received > self.maxBytes:
+                        self.rejected += 1
+                        raise UploadTooLargeError(self._tooLargeMessage())
+                    digest.update(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+            return await asyncio.to_thread(self._commit, tempPath, digest.hexdigest(), received)
+        finally:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+
+    def put(self, data: bytes) -> Dict[str, Any]:
+        """
+        Stores bytes already in memory (e.g. the preprocessed image) and returns their handle.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        fd, tempPath = tempfile.mkstemp(dir=self.root, prefix=".put-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            return self._commit(tempPath, hashlib.sha256(data).hexdigest(), len(data))
+        finally:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+
+    def _commit(self, tempPath: str, blobId: str, size: int) -> Dict[str, Any]:
+        target = self.path(blobId)
+        if os.path.exists(target):
+            # Same content already stored: keep the existing file, refresh its age
+            os.utime(target)
+            self.deduplicated += 1
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tempPath, target)
+            self.stored += 1
+        self._maybeSweep()
+        return {"blobId": blobId, "size": size}
+
+    def _tooLargeMessage(self) -> str:
+        return f"Upload exceeds the {self.maxBytes / (1024 * 1024):g} MB limit."
+
+    # --- Reading ---
+
+    def read(self, handle: Dict[str, Any]) -> bytes:
+        try:
+            with open(self.path(handle["blobId"]), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise BlobNotFoundError(handle["blobId"]) from None
+
+    def head(self, handle: Dict[str, Any], size: int = 16) -> bytes:
+        """
+        First bytes of a blob (enough to sniff its image type).
+        """
+        try:
+            with open(self.path(handle["blobId"]), "rb") as f:
+                return f.read(size)
+        except FileNotFoundError:
+            raise BlobNotFoundError(handle["blobId"]) from None
+
+    def exists(self, handle: Optional[Dict[str, Any]]) -> bool:
+        return bool(handle) and os.path.exists(self.path(handle["blobId"]))
+
+    # --- Eviction ---
+
+    def _maybeSweep(self):
+        now = time.time()
+        with self._lock:
+            if now - self._lastSweep < SWEEP_INTERVAL_S:
+                return
+            self._lastSweep = now
+        self.sweep(now)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Deletes blobs (and abandoned temp files) older than the TTL. Returns how many were removed.
+        """
+        cutoff = (now or time.time()) - self.ttlSeconds
+        removed = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        if removed:
+            self.swept += removed
+            logger.info(f"Blob store: swept {removed} expired blobs")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "swept": self.swept,
+        }
+
+
+# Shared store for uploads and preprocessed images
+blobStore = BlobStore()
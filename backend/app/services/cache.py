@@ -0,0 +1,236 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+def makeCacheKey(*parts: Any) -> str:
+    """
+    Builds a stable cache key from arbitrary JSON-serializable parts.
+    """
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier result cache for expensive agent calls.
+
+    Tier 1: in-process LRU (OrderedDict) bounded by `maxEntries`.
+    Tier 2: optional SQLite file shared by every worker process on the host,
+            bounded by `maxDiskEntries`.
+    Both tiers expire entries after `ttlSeconds`. Values must be JSON-serializable.
+
+    Async callers use aget()/aset(): the in-process tier is checked inline and the
+    SQLite tier (blocking, up to its 5 s busy timeout under write contention) runs in
+    a thread, so the event loop never waits on the shared file.
+    """
+
+    def __init__(self, namespace: str, maxEntries: int = 512, ttlSeconds: float = 86400.0,
+                 dbPath: Optional[str] = None, maxDiskEntries: int = 50000):
+        self.namespace = namespace
+        self.maxEntries = maxEntries
+        self.ttlSeconds = ttlSeconds
+        self.dbPath = dbPath
+        self.maxDiskEntries = maxDiskEntries
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes the shared SQLite connection (used from worker threads)
+        self._dbLock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._writesSinceTrim = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.diskHits = 0
+        self.evictions = 0
+
+    # --- Disk tier ---
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if not self.dbPath:
+            return None
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.dbPath)), exist_ok=True)
+            db = sqlite3.connect(self.dbPath, timeout=5.0, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS result_cache ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, created_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _diskGet(self, key: str, now: float) -> Optional[Any]:
+        db = self._connect()
+        if db is None:
+            return None
+        row = db.execute(
+            "SELECT value, expires_at FROM result_cache WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            db.execute("DELETE FROM result_cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+            db.commit()
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _diskSet(self, key: str, value: Any, now: float, expiresAt: float):
+        db = self._connect()
+        if db is None:
+            return
+        db.execute(
+            "INSERT OR REPLACE INTO result_cache (namespace, key, value, expires_at, created_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value), expiresAt, now)
+        )
+        self._writesSinceTrim += 1
+        if self._writesSinceTrim >= 100:
+            # Periodic TTL + size eviction for the shared tier
+            self._writesSinceTrim = 0
+            db.execute("DELETE FROM result_cache WHERE expires_at <= ?", (now,))
+            db.execute(
+                "DELETE FROM result_cache WHERE namespace = ? AND key IN ("
+                " SELECT key FROM result_cache WHERE namespace = ?"
+                " ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.maxDiskEntries)
+            )
+        db.commit()
+
+    def _diskRead(self, key: str, now: float) -> Optional[Any]:
+        if not self.dbPath:
+            return None
+        with self._dbLock:
+            try:
+                return self._diskGet(key, now)
+            except sqlite3.Error as e:
+                logger.warning(f"Cache '{self.namespace}' disk read failed: {e}")
+                return None
+
+    def _diskWrite(self, key: str, value: Any, now: float, expiresAt: float):
+        if not self.dbPath:
+            return
+        with self._dbLock:
+            try:
+                self._diskSet(key, value, now, expiresAt)
+            except sqlite3.Error as e:
+                logger.warning(f"Cache '{self.namespace}' disk write failed: {e}")
+
+    # --- Public API ---
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        value = self._memoryGet(key, now)
+        if value is not None:
+            return value
+        return self._promote(key, self._diskRead(key, now))
+
+    def set(self, key: str, value: Any, ttlSeconds: Optional[float] = None):
+        now, expiresAt = self._memoryStore(key, value, ttlSeconds)
+        self._diskWrite(key, value, now, expiresAt)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """
+        get() for async code: a memory miss reads the disk tier in a thread.
+        """
+        now = time.time()
+        value = self._memoryGet(key, now)
+        if value is not None:
+            return value
+        found = await asyncio.to_thread(self._diskRead, key, now) if self.dbPath else None
+        return self._promote(key, found)
+
+    async def aset(self, key: str, value: Any, ttlSeconds: Optional[float] = None):
+        """
+        set() for async code: the disk tier is written in a thread.
+        """
+        now, expiresAt = self._memoryStore(key, value, ttlSeconds)
+        if self.dbPath:
+            await asyncio.to_thread(self._diskWrite, key, value, now, expiresAt)
+
+    # --- Memory tier ---
+
+    def _memoryGet(self, key: str, now: float) -> Optional[Any]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expiresAt, value = entry
+            if expiresAt > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._memory[key]
+            return None
+
+    def _promote(self, key: str, found: Optional[tuple]) -> Optional[Any]:
+        # Counts the lookup that missed memory; a disk hit is copied into the in-process tier
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return None
+            value, expiresAt = found
+            self._memorySet(key, value, expiresAt)
+            self.hits += 1
+            self.diskHits += 1
+            return value
+
+    def _memoryStore(self, key: str, value: Any, ttlSeconds: Optional[float]):
+        now = time.time()
+        expiresAt = now + (ttlSeconds if ttlSeconds is not None else self.ttlSeconds)
+        with self._lock:
+            self._memorySet(key, value, expiresAt)
+        return now, expiresAt
+
+    def _memorySet(self, key: str, value: Any, expiresAt: float):
+        self._memory[key] = (expiresAt, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxEntries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "namespace": self.namespace,
+                "hits": self.hits,
+                "misses": self.misses,
+                "diskHits": self.diskHits,
+                "evictions": self.evictions,
+                "size": len(self._memory),
+            }
+
+
+# Shared cache for validator / vision-analyst results, keyed by image hash + prompt version + model
+visionCache = ResultCache(
+    "vision",
+    maxEntries=int(os.getenv("VISION_CACHE_SIZE", "512")),
+    ttlSeconds=float(os.getenv("VISION_CACHE_TTL_S", str(7 * 24 * 3600))),
+    dbPath=os.getenv("VISION_CACHE_DB") or None,
+)
+
+# Shared cache for text-agent outputs (technical writer guides, prompt engineer prompts),
+# keyed by normalized inputs + prompt version + model. Each agent sets its own TTL per entry.
+textCache = ResultCache(
+    "text",
+    maxEntries=int(os.getenv("TEXT_CACHE_SIZE", "1024")),
+    ttlSeconds=7 * 24 * 3600,
+    dbPath=os.getenv("TEXT_CACHE_DB") or None,
+)
@@ -0,0 +1,43 @@
+import os
+import time
+from typing import Any, Dict
+
+from app.services.gateway import parseNamedValues
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Wall-clock budget for one design run, from the moment it gets a worker
+REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", "90"))
+
+# Longest a single agent may wait for its model call (quota wait included).
+# Overridable per node, e.g. NODE_BUDGETS_S="visualizer=30,technical_writer=20"
+NODE_BUDGETS_S = {
+    "validator": 20.0,
+    "triage": 30.0,
+    "analyst": 25.0,
+    "prompt_engineer": 15.0,
+    "visualizer": 45.0,
+    "technical_writer": 30.0,
+    **parseNamedValues(os.getenv("NODE_BUDGETS_S", "")),
+}
+DEFAULT_NODE_BUDGET_S = 30.0
+
+
+def newDeadline(seconds: float = REQUEST_DEADLINE_S) -> float:
+    """
+    Absolute deadline (epoch seconds) stored in AuraState["deadline"].
+    """
+    return time.time() + seconds
+
+
+def nodeTimeout(state: Dict[str, Any], node: str) -> float:
+    """
+    Seconds `node` may spend on its model call: its own budget, capped by what is
+    left of the request deadline (0 once the deadline has passed).
+    """
+    budget = NODE_BUDGETS_S.get(node, DEFAULT_NODE_BUDGET_S)
+    deadline = state.get("deadline")
+    if deadline is None:
+        return budget
+    return max(0.0, min(budget, deadline - time.time()))
@@ -0,0 +1,200 @@
+import asyncio
+import io
+import json
+import os
+import random
+import re
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage
+from PIL import Image
+
+load_dotenv()
+
+# Local stand-in for Gemini (LLM_BACKEND=fake): benchmarks and load tests without API quota.
+# Latency spec: "fixed:<ms>", "uniform:<minMs>:<maxMs>" or "lognormal:<medianMs>:<sigma>"
+FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "lognormal:900:0.35")
+FAKE_LLM_IMAGE_LATENCY = os.getenv("FAKE_LLM_IMAGE_LATENCY", "lognormal:4000:0.3")
+# Share of calls failing with a 503 / a 429 quota error
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_QUOTA_ERROR_RATE = float(os.getenv("FAKE_LLM_QUOTA_ERROR_RATE", "0"))
+# Share of images the validator rejects
+FAKE_LLM_REJECT_RATE = float(os.getenv("FAKE_LLM_REJECT_RATE", "0"))
+FAKE_LLM_SEED = os.getenv("FAKE_LLM_SEED", "")
+
+# Gemini bills an inline image at a flat token count (input), a generated one at another (output)
+IMAGE_TOKENS = 258
+GENERATED_IMAGE_TOKENS = 1290
+
+_random = random.Random(int(FAKE_LLM_SEED) if FAKE_LLM_SEED else None)
+
+
+def sampleLatency(spec: str) -> float:
+    """
+    Draws one latency (seconds) from a spec string (see FAKE_LLM_LATENCY).
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(":") if v]
+    if kind == "fixed":
+        ms = values[0]
+    elif kind == "uniform":
+        ms = _random.uniform(values[0], values[1])
+    elif kind == "lognormal":
+        ms = _random.lognormvariate(0.0, values[1]) * values[0]
+    else:
+        raise ValueError(f"Unknown latency distribution '{spec}'")
+    return max(0.0, ms) / 1000.0
+
+
+async def simulateUpstream(spec: str):
+    """
+    Waits like a model call would, then fails at the configured error rates.
+    """
+    await asyncio.sleep(sampleLatency(spec))
+    roll = _random.random()
+    if roll < FAKE_LLM_QUOTA_ERROR_RATE:
+        raise RuntimeError("429 RESOURCE_EXHAUSTED: fake quota exceeded")
+    if roll < FAKE_LLM_QUOTA_ERROR_RATE + FAKE_LLM_ERROR_RATE:
+        raise RuntimeError("503 UNAVAILABLE: fake upstream error")
+
+
+def messageText(messages: List[Any]) -> str:
+    parts = []
+    for message in messages:
+        content = message.content
+        if isinstance(content, str):
+            parts.append(content)
+            continue
+        for part in content:
+            if isinstance(part, dict) and part.get("type") == "text":
+                parts.append(part["text"])
+    return "\n".join(parts)
+
+
+def imageCount(messages: List[Any]) -> int:
+    return sum(
+        1 for message in messages if not isinstance(message.content, str)
+        for part in message.content if isinstance(part, dict) and part.get("type") == "image_url"
+    )
+
+
+def fakeMeasurements() -> Dict[str, Any]:
+    return {
+        "stumpLengthMm": round(_random.uniform(120, 220)),
+        "circumferenceMm": round(_random.uniform(240, 360)),
+        "shape": _random.choice(["conical", "cylindrical", "bulbous"]),
+        "skinTone": "medium",
+        "visualCondition": "healthy",
+    }
+
+
+def cannedResponse(prompt: str) -> str:
+    """
+    Answers each agent's prompt in the format its parser expects.
+    """
+    valid = _random.random() >= FAKE_LLM_REJECT_RATE
+    if '"decision"' in prompt:  # Combined triage
+        return json.dumps({
+            "decision": "YES" if valid else "NO",
+            "subjectType": "HUMAN",
+            "reason": "Residual limb visible." if valid else "No amputation visible.",
+            **fakeMeasurements(),
+        })
+    if "DECISION: [YES/NO]" in prompt:  # Validator
+        decision = "YES" if valid else "NO"
+        return f"DECISION: {decision}\nTYPE: HUMAN\nREASON: Fake validation."
+    if '"stumpLengthMm"' in prompt:  # Vision analyst
+        return "```json\n" + json.dumps(fakeMeasurements()) + "\n```"
+    if "REASONING:" in prompt:  # Technical writer
+        material = re.search(r"Material (\S+),", prompt)
+        return (
+            "REASONING: Material y espesor adecuados para la actividad indicada.\n"
+            f"PRIMARY_MATERIAL: {material.group(1) if material else 'PETG'}\n"
+            "ALTERNATIVE_MATERIAL: PLA+ | Más rígido y fácil de imprimir\n"
+            "GUIDE:\n"
+            "## Impresión\n- Capa de 0.2 mm, 4 perímetros.\n"
+            "## Post-procesado\n- Lijar el borde del encaje.\n"
+            "## Ensamblaje\n- Fijar el pilón con tornillos M5."
+        )
+    if "Prompt Engineer" in prompt:
+        # Sampled at temperature 0.7 upstream: no two prompts are identical
+        lighting = _random.choice(["soft rim lighting", "studio softbox lighting", "golden hour light"])
+        return ("Photorealistic studio shot of a carbon fiber prosthetic socket with titanium pylon, "
+                f"voronoi lattice, {lighting}, white background, seed {_random.randrange(10**6)}")
+    return "OK"
+
+
+class FakeChatModel:
+    """
+    Drop-in for ChatGoogleGenerativeAI.ainvoke: canned answers per agent prompt,
+    simulated latency/errors, and Gemini-style usage metadata.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+
+    async def ainvoke(self, messages: List[Any], **kwargs) -> AIMessage:
+        await simulateUpstream(FAKE_LLM_LATENCY)
+        prompt = messageText(messages)
+        content = cannedResponse(prompt)
+        inputTokens = len(prompt) // 4 + IMAGE_TOKENS * imageCount(messages)
+        outputTokens = len(content) // 4
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": inputTokens,
+            "output_tokens": outputTokens,
+            "total_tokens": inputTokens + outputTokens,
+        })
+
+
+class FakeImagePart:
+    def __init__(self, image: Image.Image):
+        self.inline_data = True
+        self._image = image
+
+    def as_image(self) -> Image.Image:
+        return self._image
+
+
+class FakeUsage:
+    def __init__(self, promptTokens: int, candidatesTokens: int):
+        self.prompt_token_count = promptTokens
+        self.candidates_token_count = candidatesTokens
+
+
+class FakeImageResponse:
+    def __init__(self, image: Image.Image, promptTokens: int):
+        self.parts = [FakeImagePart(image)]
+        self.usage_metadata = FakeUsage(promptTokens, GENERATED_IMAGE_TOKENS)
+
+
+class FakeModels:
+    async def generate_content(self, model: str, contents: Any = None, config: Any = None) -> FakeImageResponse:
+        await simulateUpstream(FAKE_LLM_IMAGE_LATENCY)
+        shade = _random.randrange(64, 192)
+        return FakeImageResponse(Image.new("RGB", (512, 512), (shade, shade, shade)), len(str(contents)) // 4)
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.models = FakeModels()
+
+
+class FakeGenaiClient:
+    """
+    Drop-in for google.genai.Client (only `client.aio.models.generate_content` is used).
+    """
+
+    def __init__(self):
+        self.aio = FakeAsyncClient()
+
+
+def fakeImageBytes(seed: int, size=(640, 480)) -> bytes:
+    """
+    Distinct synthetic JPEG per seed (distinct hash, so no cache hits between requests).
+    """
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
@@ -0,0 +1,609 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services import metrics
+from app.services.cache import makeCacheKey
+from app.services.llm import getChatModel, getGenaiClient
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+def parseNamedValues(raw: str) -> Dict[str, float]:
+    """
+    Parses "name=value,name=value" (e.g. "gemini-2.5-flash=10,gemini-2.5-flash-image=10").
+    """
+    values = {}
+    for item in raw.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            values[name.strip()] = float(value)
+    return values
+
+
+# Requests per minute per model (models not listed use LLM_DEFAULT_RPM; 0 = unlimited)
+LLM_MODEL_RPM = parseNamedValues(os.getenv("LLM_MODEL_RPM", ""))
+LLM_DEFAULT_RPM = float(os.getenv("LLM_DEFAULT_RPM", "60"))
+# Requests per minute across all models sharing one API key (0 = unlimited)
+LLM_KEY_RPM = float(os.getenv("LLM_KEY_RPM", "0"))
+# Calls allowed back-to-back before the per-minute rate applies
+LLM_BURST = int(os.getenv("LLM_BURST", "5"))
+# After a quota error (429) the model's bucket is paused this long
+LLM_QUOTA_COOLDOWN_S = float(os.getenv("LLM_QUOTA_COOLDOWN_S", "10"))
+# Identical in-flight calls share one upstream request
+LLM_COALESCE = os.getenv("LLM_COALESCE", "true").lower() in ("1", "true", "yes")
+# Hedging: a call still pending past this latency percentile of its agent gets a
+# duplicate request, first response wins (0 = off). Only uses spare quota.
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Image generation is slow by nature and expensive to duplicate: not hedged by default
+LLM_HEDGE_AGENTS = [a.strip() for a in os.getenv(
+    "LLM_HEDGE_AGENTS", "validator,triage,analyst,prompt_engineer,technical_writer").split(",") if a.strip()]
+# Latencies kept per agent for the percentile
+LATENCY_WINDOW = 200
+
+# Circuit breaker per model: opens when, over the last LLM_BREAKER_WINDOW calls (at least
+# LLM_BREAKER_MIN_CALLS), the share of failures reaches LLM_BREAKER_ERROR_RATE.
+# Calls slower than LLM_BREAKER_SLOW_CALL_S, and calls cut off at their caller's time
+# budget while upstream had them, count as failures.
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_SLOW_CALL_S = float(os.getenv("LLM_BREAKER_SLOW_CALL_S", "20"))
+# Open for this long, then half-open: LLM_BREAKER_PROBES trial calls decide whether to close
+LLM_BREAKER_OPEN_S = float(os.getenv("LLM_BREAKER_OPEN_S", "30"))
+LLM_BREAKER_PROBES = int(os.getenv("LLM_BREAKER_PROBES", "1"))
+# Cancellations this close to a call's deadline are the deadline firing
+_DEADLINE_SLACK_S = 0.05
+
+# Lower value = served first when calls wait for quota.
+# Measurements gate the geometry (their fallback is a generic socket); the preview
+# image and its prompt are cosmetic and go last.
+AGENT_PRIORITIES = {
+    "validator": 0,
+    "triage": 0,
+    "analyst": 0,
+    "technical_writer": 1,
+    "prompt_engineer": 2,
+    "visualizer": 2,
+}
+DEFAULT_PRIORITY = 1
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a call does not finish within the caller's time budget."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling upstream while a model's circuit breaker is open."""
+
+
+def fallbackReason(error: Exception) -> str:
+    """
+    Short reason for an agent's fallback message.
+    """
+    if isinstance(error, CircuitOpenError):
+        return "skipped (model unavailable)"
+    if isinstance(error, DeadlineExceededError):
+        return "timed out"
+    return "failed"
+
+
+def isQuotaError(error: Exception) -> bool:
+    text = f"{type(error).__name__} {error}"
+    return "429" in text or "RESOURCE_EXHAUSTED" in text or "RateLimit" in text
+
+
+def messagesKey(messages: List[Any], imageHash: Optional[str] = None) -> List[Any]:
+    """
+    Coalescing-key form of chat messages: text parts as they are, image parts as the
+    image's content hash (never the multi-megabyte data URL itself).
+    """
+    keyed = []
+    for message in messages:
+        content = message.content
+        if isinstance(content, list):
+            content = [imagePartKey(part, imageHash) if isinstance(part, dict) and part.get("type") == "image_url"
+                       else part for part in content]
+        keyed.append((message.type, content))
+    return keyed
+
+
+def imagePartKey(part: Dict[str, Any], imageHash: Optional[str]) -> Dict[str, str]:
+    if imageHash:
+        return {"type": "image_url", "imageHash": imageHash}
+    # No hash from the caller: digest the URL directly instead of serializing it into the key
+    url = part.get("image_url")
+    url = url.get("url", "") if isinstance(url, dict) else str(url or "")
+    return {"type": "image_url", "urlSha256": hashlib.sha256(url.encode("utf-8")).hexdigest()}
+
+
+def usageTokens(response: Any) -> Tuple[int, int]:
+    """
+    (input, output) tokens from a LangChain message or a google-genai response.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return 0, 0
+    if isinstance(usage, dict):
+        return usage.get("input_tokens", 0) or 0, usage.get("output_tokens", 0) or 0
+    return getattr(usage, "prompt_token_count", 0) or 0, getattr(usage, "candidates_token_count", 0) or 0
+
+
+def recordUsage(agent: str, model: str, seconds: float, response: Any):
+    inputTokens, outputTokens = usageTokens(response)
+    metrics.llmRequests.inc(agent=agent, model=model, outcome="ok")
+    metrics.llmDuration.observe(seconds, agent=agent, model=model)
+    metrics.llmTokens.inc(inputTokens, agent=agent, model=model, direction="input")
+    metrics.llmTokens.inc(outputTokens, agent=agent, model=model, direction="output")
+    metrics.llmCost.inc(metrics.estimateCost(model, inputTokens, outputTokens), agent=agent, model=model)
+
+
+class TokenBucket:
+    """
+    Async token bucket: `ratePerMinute` sustained, up to `burst` calls at once.
+    Waiters are served by priority (then arrival order), not by whoever wakes up first.
+    """
+
+    def __init__(self, name: str, ratePerMinute: float, burst: int = LLM_BURST):
+        self.name = name
+        self.rate = ratePerMinute / 60.0
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self._updatedAt = time.monotonic()
+        self._pausedUntil = 0.0
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+
+        self.granted = 0
+        self.throttled = 0
+        self.waitedSeconds = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updatedAt) * self.rate)
+        self._updatedAt = now
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._pausedUntil and self.tokens >= 1.0
+
+    async def acquire(self, priority: int = DEFAULT_PRIORITY):
+        self._refill()
+        if not self._waiters and self._available():
+            self.tokens -= 1.0
+            self.granted += 1
+            return
+
+        self.throttled += 1
+        startedAt = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._serve())
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.tokens += 1.0  # Granted but no longer wanted: give it back
+            raise
+        self.waitedSeconds += time.monotonic() - startedAt
+
+    async def _serve(self):
+        while self._waiters:
+            self._refill()
+            if self._available():
+                _, _, future = heapq.heappop(self._waiters)
+                if not future.done():
+                    self.tokens -= 1.0
+                    self.granted += 1
+                    future.set_result(None)
+                continue
+            delay = max(self._pausedUntil - time.monotonic(), (1.0 - self.tokens) / self.rate)
+            await asyncio.sleep(max(delay, 0.001))
+
+    def hasSpare(self) -> bool:
+        """
+        True if a call could start right now without making anyone wait.
+        """
+        self._refill()
+        return not self._waiters and self._available()
+
+    def take(self):
+        self.tokens -= 1.0
+        self.granted += 1
+
+    def pause(self, seconds: float):
+        """
+        Stops granting for `seconds` (upstream reported quota exhaustion).
+        """
+        self.tokens = 0.0
+        self._pausedUntil = max(self._pausedUntil, time.monotonic() + seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ratePerMinute": round(self.rate * 60.0, 2),
+            "tokens": round(self.tokens, 2),
+            "waiting": len(self._waiters),
+            "granted": self.granted,
+            "throttled": self.throttled,
+            "waitedSeconds": round(self.waitedSeconds, 3),
+        }
+
+
+class CircuitBreaker:
+    """
+    closed    -> calls pass; outcomes are recorded in a sliding window
+    open      -> calls fail fast with CircuitOpenError for `openSeconds`
+    half-open -> up to `probes` trial calls pass; all succeed -> closed, any fails -> open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, window: int = LLM_BREAKER_WINDOW, minCalls: int = LLM_BREAKER_MIN_CALLS,
+                 errorRate: float = LLM_BREAKER_ERROR_RATE, slowCallSeconds: float = LLM_BREAKER_SLOW_CALL_S,
+                 openSeconds: float = LLM_BREAKER_OPEN_S, probes: int = LLM_BREAKER_PROBES):
+        self.name = name
+        self.minCalls = minCalls
+        self.errorRate = errorRate
+        self.slowCallSeconds = slowCallSeconds
+        self.openSeconds = openSeconds
+        self.probes = max(1, probes)
+
+        self.state = self.CLOSED
+        self._outcomes: deque = deque(maxlen=window)
+        self._openedAt = 0.0
+        self._probesInFlight = 0
+        self._probeSuccesses = 0
+
+        self.successes = 0
+        self.failures = 0
+        self.slowCalls = 0
+        self.rejected = 0
+        self.opened = 0
+
+    def allow(self) -> bool:
+        """
+        Admits a call (returns True; call record() or cancel() afterwards) or rejects it.
+        """
+        if self.state == self.OPEN:
+            if time.monotonic() - self._openedAt < self.openSeconds:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probesInFlight = 0
+            self._probeSuccesses = 0
+            logger.info(f"Circuit {self.name}: half-open, probing")
+        if self.state == self.HALF_OPEN:
+            if self._probesInFlight >= self.probes:
+                self.rejected += 1
+                return False
+            self._probesInFlight += 1
+        return True
+
+    def cancel(self):
+        """
+        An admitted call was abandoned before producing an outcome.
+        """
+        if self.state == self.HALF_OPEN:
+            self._probesInFlight = max(0, self._probesInFlight - 1)
+
+    def record(self, success: bool, seconds: float):
+        if success and seconds >= self.slowCallSeconds:
+            self.slowCalls += 1
+            success = False
+        if success:
+            self.successes += 1
+        else:
+            self.failures += 1
+
+        if self.state == self.HALF_OPEN:
+            self._probesInFlight = max(0, self._probesInFlight - 1)
+            if not success:
+                self._open()
+                return
+            self._probeSuccesses += 1
+            if self._probeSuccesses >= self.probes:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+                logger.info(f"Circuit {self.name}: closed")
+            return
+        if self.state == self.OPEN:
+            return  # Straggler from before the circuit opened
+
+        self._outcomes.append(success)
+        failed = self._outcomes.count(False)
+        if len(self._outcomes) >= self.minCalls and failed / len(self._outcomes) >= self.errorRate:
+            self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._openedAt = time.monotonic()
+        self.opened += 1
+        self._outcomes.clear()
+        logger.warning(f"Circuit {self.name}: open for {self.openSeconds:g}s, calls fail fast")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "successes": self.successes,
+            "failures": self.failures,
+            "slowCalls": self.slowCalls,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
+
+
+class LlmGateway:
+    """
+    Single entry point for every Gemini call (LangChain chat models and the
+    google-genai image client):
+
+    - token buckets per model and per API key, served by agent priority
+    - identical in-flight calls (same model, agent, prompt and image content) are
+      coalesced into one upstream request whose response every caller receives
+    - a quota error (429) pauses the model's bucket so queued calls wait instead
+      of failing one after another into their fallbacks
+    - per-call timeouts (the agent's time budget, see services/deadlines.py) and
+      hedged duplicates for calls that run past their agent's usual latency
+    - a circuit breaker per model: while upstream is failing or too slow, calls fail
+      fast with CircuitOpenError and agents go straight to their fallbacks
+    """
+
+    def __init__(self, modelRpm: Dict[str, float] = LLM_MODEL_RPM, defaultRpm: float = LLM_DEFAULT_RPM,
+                 keyRpm: float = LLM_KEY_RPM, burst: int = LLM_BURST,
+                 quotaCooldownSeconds: float = LLM_QUOTA_COOLDOWN_S, coalesce: bool = LLM_COALESCE,
+                 hedgePercentile: float = LLM_HEDGE_PERCENTILE, hedgeMinSamples: int = LLM_HEDGE_MIN_SAMPLES,
+                 hedgeAgents: List[str] = LLM_HEDGE_AGENTS):
+        self.modelRpm = modelRpm
+        self.defaultRpm = defaultRpm
+        self.keyRpm = keyRpm
+        self.burst = burst
+        self.quotaCooldownSeconds = quotaCooldownSeconds
+        self.coalesce = coalesce
+        self.hedgePercentile = hedgePercentile
+        self.hedgeMinSamples = hedgeMinSamples
+        self.hedgeAgents = set(hedgeAgents)
+
+        self._latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._inFlight: Dict[str, Dict[str, Any]] = {}
+
+        self.calls = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.quotaErrors = 0
+        self.timeouts = 0
+        self.hedged = 0
+        self.hedgeWins = 0
+
+    def _bucket(self, name: str, ratePerMinute: float) -> Optional[TokenBucket]:
+        if ratePerMinute <= 0:
+            return None
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = self._buckets[name] = TokenBucket(name, ratePerMinute, self.burst)
+        return bucket
+
+    def _bucketsFor(self, model: str) -> List[TokenBucket]:
+        """
+        Buckets a call on `model` must pass, key-wide first and the model's own last.
+        """
+        # Quota is per project/key: hash it so the key never appears in stats or logs
+        apiKey = hashlib.sha256((os.getenv("GOOGLE_API_KEY") or "").encode()).hexdigest()[:8]
+        buckets = [
+            self._bucket(f"key:{apiKey}", self.keyRpm),
+            self._bucket(f"model:{model}", self.modelRpm.get(model, self.defaultRpm)),
+        ]
+        return [bucket for bucket in buckets if bucket is not None]
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(model)
+        return breaker
+
+    # --- Public API ---
+
+    async def ainvoke(self, agent: str, model: str, messages: List[Any],
+                      timeout: Optional[float] = None, imageHash: Optional[str] = None, **kwargs) -> Any:
+        """
+        Rate-limited, coalesced `getChatModel(model).ainvoke(messages, **kwargs)`.
+        Calls with the same text and the same image (`imageHash`, the state's content hash) coalesce.
+        Raises DeadlineExceededError after `timeout` seconds.
+        """
+        key = makeCacheKey("chat", agent, model, messagesKey(messages, imageHash), kwargs)
+        return await self._call(agent, model, key, lambda: getChatModel(model).ainvoke(messages, **kwargs),
+                                timeout)
+
+    async def generateContent(self, agent: str, model: str, contents: List[Any], config: Any = None,
+                              timeout: Optional[float] = None) -> Any:
+        """
+        Rate-limited, coalesced `client.aio.models.generate_content(...)` (image generation).
+        Raises DeadlineExceededError after `timeout` seconds.
+        """
+        configKey = config.model_dump(exclude_none=True) if hasattr(config, "model_dump") else config
+        key = makeCacheKey("genai", agent, model, contents, configKey)
+        return await self._call(agent, model, key, lambda: getGenaiClient().aio.models.generate_content(
+            model=model, contents=contents, config=config), timeout)
+
+    # --- Internals ---
+
+    async def _call(self, agent: str, model: str, key: str, request: Callable[[], Awaitable[Any]],
+                    timeout: Optional[float] = None) -> Any:
+        startedAt = time.monotonic()
+        deadlineAt = startedAt + timeout if timeout is not None else None
+        response = None
+        outcome = "error"
+        try:
+            response, coalesced = await asyncio.wait_for(self._shared(agent, model, key, request, deadlineAt),
+                                                         timeout)
+            outcome = "coalesced" if coalesced else "ok"
+            return response
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            outcome = "timeout"
+            metrics.llmRequests.inc(agent=agent, model=model, outcome=outcome)
+            raise DeadlineExceededError(f"{agent} call on {model} exceeded its {timeout:.1f}s budget") from None
+        except CircuitOpenError:
+            outcome = "circuit_open"
+            raise
+        finally:
+            # Per-request breakdown (?timings=true): this caller's wait, quota and coalescing included
+            timings = metrics.currentTimings.get()
+            if timings is not None:
+                inputTokens, outputTokens = usageTokens(response)
+                timings.addLlmCall(agent, model, time.monotonic() - startedAt, inputTokens, outputTokens, outcome)
+
+    async def _shared(self, agent: str, model: str, key: str, request: Callable[[], Awaitable[Any]],
+                      deadlineAt: Optional[float] = None):
+        """
+        Returns (response, coalesced): joins an identical in-flight call if there is one.
+        """
+        if not self.coalesce:
+            return await self._send(agent, model, request, deadlineAt), False
+
+        entry = self._inFlight.get(key)
+        if entry is None:
+            entry = {"task": asyncio.create_task(self._send(agent, model, request, deadlineAt)), "callers": 0}
+            self._inFlight[key] = entry
+            entry["task"].add_done_callback(lambda _: self._inFlight.pop(key, None))
+            coalesced = False
+        else:
+            self.coalesced += 1
+            metrics.llmRequests.inc(agent=agent, model=model, outcome="coalesced")
+            logger.info(f"Gateway: coalesced {agent} call on {model}")
+            coalesced = True
+
+        entry["callers"] += 1
+        try:
+            # Shielded: one caller giving up must not cancel the others' response
+            return await asyncio.shield(entry["task"]), coalesced
+        finally:
+            entry["callers"] -= 1
+            if entry["callers"] == 0 and not entry["task"].done():
+                entry["task"].cancel()
+
+    async def _send(self, agent: str, model: str, request: Callable[[], Awaitable[Any]],
+                    deadlineAt: Optional[float] = None) -> Any:
+        breaker = self.breaker(model)
+        if not breaker.allow():
+            metrics.llmRequests.inc(agent=agent, model=model, outcome="circuit_open")
+            raise CircuitOpenError(f"{model} is unavailable (circuit open), {agent} skipped")
+
+        priority = AGENT_PRIORITIES.get(agent, DEFAULT_PRIORITY)
+        buckets = self._bucketsFor(model)
+        startedAt = None
+        try:
+            for bucket in buckets:
+                await bucket.acquire(priority)
+
+            self.calls += 1
+            startedAt = time.monotonic()
+            hedgeAfter = self._hedgeDelay(agent)
+            if hedgeAfter is None:
+                response = await request()
+            else:
+                response = await self._hedged(agent, model, buckets, request, hedgeAfter)
+        except asyncio.CancelledError:
+            # Abandoned: a call upstream had not answered by the caller's deadline (agent budgets
+            # are often below the slow-call threshold) or that was already slow is a failure;
+            # a client going away, or a call still waiting for quota, says nothing about upstream
+            now = time.monotonic()
+            elapsed = now - startedAt if startedAt is not None else 0.0
+            timedOut = deadlineAt is not None and now >= deadlineAt - _DEADLINE_SLACK_S
+            if startedAt is not None and (timedOut or elapsed >= breaker.slowCallSeconds):
+                breaker.record(False, elapsed)
+            else:
+                breaker.cancel()
+            raise
+        except Exception as e:
+            breaker.record(False, time.monotonic() - startedAt if startedAt is not None else 0.0)
+            self.errors += 1
+            quota = isQuotaError(e)
+            metrics.llmRequests.inc(agent=agent, model=model, outcome="quota" if quota else "error")
+            if quota:
+                self.quotaErrors += 1
+                logger.warning(f"Gateway: quota exhausted on {model}, pausing for {self.quotaCooldownSeconds:g}s")
+                # Gemini quotas are per model: other models keep flowing
+                modelBucket = self._buckets.get(f"model:{model}")
+                if modelBucket is not None:
+                    modelBucket.pause(self.quotaCooldownSeconds)
+            raise
+        elapsed = time.monotonic() - startedAt
+        breaker.record(True, elapsed)
+        self._latencies[agent].append(elapsed)
+        recordUsage(agent, model, elapsed, response)
+        return response
+
+    def _hedgeDelay(self, agent: str) -> Optional[float]:
+        """
+        The agent's latency percentile, or None if it is not hedged (yet).
+        """
+        samples = self._latencies[agent]
+        if self.hedgePercentile <= 0 or agent not in self.hedgeAgents or len(samples) < self.hedgeMinSamples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedgePercentile / 100.0))]
+
+    async def _hedged(self, agent: str, model: str, buckets: List[TokenBucket],
+                      request: Callable[[], Awaitable[Any]], hedgeAfter: float) -> Any:
+        """
+        Sends the request; if it is still pending after `hedgeAfter` seconds and there is
+        spare quota, sends a duplicate and returns whichever succeeds first.
+        """
+        primary = asyncio.create_task(request())
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedgeAfter)
+            if done or not all(bucket.hasSpare() for bucket in buckets):
+                return await primary
+
+            for bucket in buckets:
+                bucket.take()
+            self.hedged += 1
+            logger.info(f"Gateway: hedging {agent} call on {model} after {hedgeAfter:.2f}s")
+            backup = asyncio.create_task(request())
+            tasks.add(backup)
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.hedgeWins += 1
+                        return task.result()
+            return primary.result()  # Both failed: raise the original error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "quotaErrors": self.quotaErrors,
+            "timeouts": self.timeouts,
+            "hedged": self.hedged,
+            "hedgeWins": self.hedgeWins,
+            "inFlight": len(self._inFlight),
+            "buckets": {name: bucket.stats() for name, bucket in self._buckets.items()},
+            "breakers": {name: breaker.stats() for name, breaker in self._breakers.items()},
+        }
+
+
+# Shared gateway: every agent's Gemini calls go through it
+llmGateway = LlmGateway()
@@ -0,0 +1,428 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Design pipelines allowed to run at once (each one makes several Gemini calls)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Jobs allowed to wait for a worker; beyond this, submissions get HTTP 429
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100"))
+# Finished jobs stay queryable this long
+JOB_RESULT_TTL_S = float(os.getenv("JOB_RESULT_TTL_S", "3600"))
+# Optional SQLite file: queued/running jobs survive a restart (leave empty for memory only)
+JOBS_DB = os.getenv("JOBS_DB", "")
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Internal job kind: a worker slot lent to a request handler (see JobQueue.reserve)
+_SLOT = "slot"
+
+Handler = Callable[[Dict[str, Any], bytes], Awaitable[Dict[str, Any]]]
+
+
+class JobQueueFullError(RuntimeError):
+    """Raised when the job queue is at capacity (mapped to HTTP 429)."""
+
+
+class SlotReservation:
+    """
+    A worker slot for work that runs in the caller's own task (synchronous and
+    streaming endpoints). Obtain with JobQueue.reserve(), then `async with slot:`.
+    The slot only enters the queue once the caller starts waiting for it, so a
+    reservation that is never used cannot hold a worker.
+    """
+
+    def __init__(self, queue: "JobQueue", priority: str):
+        self.queue = queue
+        self.priority = priority
+        self.jobId: Optional[str] = None
+        self._granted: Optional[asyncio.Future] = None
+        self._released: Optional[asyncio.Future] = None
+
+    def enqueue(self):
+        if self.jobId is None:
+            self.jobId, self._granted, self._released = self.queue._enqueueSlot(self.priority)
+
+    def position(self) -> int:
+        return self.queue.position(self.jobId) if self.jobId else -1
+
+    async def acquire(self):
+        self.enqueue()
+        await asyncio.shield(self._granted)
+
+    def release(self):
+        if self.jobId is None:
+            return
+        if not self._granted.done():
+            self.queue.cancel(self.jobId)
+        if not self._released.done():
+            self._released.set_result(None)
+
+    async def __aenter__(self):
+        try:
+            await self.acquire()
+        except BaseException:
+            self.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class JobQueue:
+    """
+    In-process priority queue for design pipelines.
+
+    - `workers` jobs run at once; lower priority value first, FIFO within a priority
+    - at most `queueLimit` jobs wait; submit()/reserve() raise JobQueueFullError beyond that
+    - background jobs (submit) run a registered handler and keep their result for
+      `resultTtlSeconds`; with `dbPath` they are persisted in SQLite and re-queued
+      on restart if they had not finished
+    - slot reservations (reserve) share the same workers for requests that run
+      the pipeline themselves, so every entry point respects one concurrency limit
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, queueLimit: int = JOB_QUEUE_LIMIT,
+                 resultTtlSeconds: float = JOB_RESULT_TTL_S, dbPath: Optional[str] = JOBS_DB or None):
+        self.workers = workers
+        self.queueLimit = queueLimit
+        self.resultTtlSeconds = resultTtlSeconds
+        self.dbPath = dbPath
+
+        self._handlers: Dict[str, Handler] = {}
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._sequence = itertools.count()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks = []
+        self._db: Optional[sqlite3.Connection] = None
+
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def register(self, kind: str, handler: Handler):
+        """
+        Registers the coroutine run for background jobs of `kind`: handler(payload, data) -> result.
+        Results must be JSON-serializable.
+        """
+        self._handlers[kind] = handler
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+        self._restore()
+        logger.info(f"Job queue started ({self.workers} workers, queue limit {self.queueLimit})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # --- Submission ---
+
+    def submit(self, kind: str, payload: Dict[str, Any], data: bytes = b"", priority: str = "normal") -> str:
+        """
+        Queues a background job and returns its id.
+        `payload` must be JSON-serializable; `data` carries optional binary input.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        job = self._newJob(kind, priority)
+        job["_payload"] = payload
+        job["_data"] = data
+        self._persist(job)
+        self._enqueue(job)
+        return job["jobId"]
+
+    def reserve(self, priority: str = "normal") -> SlotReservation:
+        """
+        Returns a worker slot for the caller's own work. Raises JobQueueFullError
+        immediately (before any work starts) when the queue is full.
+        """
+        self._checkCapacity()
+        return SlotReservation(self, priority)
+
+    def _enqueueSlot(self, priority: str):
+        job = self._newJob(_SLOT, priority)
+        loop = asyncio.get_running_loop()
+        job["_granted"] = loop.create_future()
+        job["_released"] = loop.create_future()
+        self._enqueue(job)
+        return job["jobId"], job["_granted"], job["_released"]
+
+    def _checkCapacity(self):
+        if self._queue is None:
+            raise RuntimeError("Job queue is not started")
+        if self.queued >= self.queueLimit:
+            self.rejected += 1
+            raise JobQueueFullError(f"Job queue full ({self.queued} jobs waiting)")
+
+    def _newJob(self, kind: str, priority: str) -> Dict[str, Any]:
+        self._expire()
+        self._checkCapacity()
+        return {
+            "jobId": uuid.uuid4().hex,
+            "kind": kind,
+            "status": QUEUED,
+            "priority": priority if priority in PRIORITIES else "normal",
+            "createdAt": time.time(),
+            "startedAt": None,
+            "finishedAt": None,
+            "result": None,
+            "error": None,
+            "_order": next(self._sequence),
+            "_done": asyncio.get_running_loop().create_future(),
+        }
+
+    def _enqueue(self, job: Dict[str, Any]):
+        self._jobs[job["jobId"]] = job
+        self.queued += 1
+        self._queue.put_nowait((PRIORITIES[job["priority"]], job["_order"], job["jobId"]))
+
+    # --- Queries ---
+
+    def position(self, jobId: str) -> int:
+        """
+        Number of queued jobs that will start before this one (0 = next; -1 = not queued).
+        """
+        job = self._jobs.get(jobId)
+        if job is None or job["status"] != QUEUED:
+            return -1
+        key = (PRIORITIES[job["priority"]], job["_order"])
+        return sum(
+            1 for other in self._jobs.values()
+            if other["status"] == QUEUED and (PRIORITIES[other["priority"]], other["_order"]) < key
+        )
+
+    def get(self, jobId: str) -> Optional[Dict[str, Any]]:
+        """
+        Public view of a job (status, timings, result or error), or None if unknown/expired.
+        """
+        job = self._jobs.get(jobId)
+        if job is None:
+            return self._load(jobId)
+        view = {key: value for key, value in job.items() if not key.startswith("_")}
+        if job["status"] == QUEUED:
+            view["position"] = self.position(jobId)
+        return view
+
+    async def wait(self, jobId: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Waits until the job finishes (or `timeout` elapses) and returns its public view.
+        """
+        job = self._jobs.get(jobId)
+        if job is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(job["_done"]), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.get(jobId)
+
+    def cancel(self, jobId: str) -> bool:
+        """
+        Cancels a job that has not started yet.
+        """
+        job = self._jobs.get(jobId)
+        if job is None or job["status"] != QUEUED:
+            return False
+        self.queued -= 1
+        self._finish(job, CANCELLED)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    # --- Execution ---
+
+    async def _worker(self):
+        while True:
+            _, _, jobId = await self._queue.get()
+            job = self._jobs.get(jobId)
+            if job is None or job["status"] != QUEUED:
+                continue  # Cancelled while waiting
+
+            self.queued -= 1
+            self.running += 1
+            job["status"] = RUNNING
+            job["startedAt"] = time.time()
+            self._persist(job)
+            try:
+                if job["kind"] == _SLOT:
+                    # Lend this worker to the caller until it releases the slot
+                    job["_granted"].set_result(None)
+                    await job["_released"]
+                    self._finish(job, DONE)
+                else:
+                    result = await self._handlers[job["kind"]](job["_payload"], job["_data"])
+                    job["result"] = result
+                    self._finish(job, DONE)
+                self.completed += 1
+            except asyncio.CancelledError:
+                # Shutdown: a persisted job stays "running" and is re-queued on the next start
+                raise
+            except Exception as e:
+                logger.error(f"Job {jobId} ({job['kind']}) failed: {e}", exc_info=True)
+                job["error"] = str(e)
+                self._finish(job, FAILED)
+                self.failed += 1
+            finally:
+                self.running -= 1
+
+    def _finish(self, job: Dict[str, Any], status: str):
+        job["status"] = status
+        job["finishedAt"] = time.time()
+        # Inputs are not needed any more (the image can be several MB)
+        job.pop("_payload", None)
+        job.pop("_data", None)
+        if not job["_done"].done():
+            job["_done"].set_result(None)
+        if job["kind"] == _SLOT:
+            self._jobs.pop(job["jobId"], None)
+            return
+        self._persist(job)
+
+    def _expire(self):
+        cutoff = time.time() - self.resultTtlSeconds
+        for jobId in [jid for jid, job in self._jobs.items()
+                      if job["finishedAt"] is not None and job["finishedAt"] < cutoff]:
+            del self._jobs[jobId]
+
+    # --- Persistence (optional) ---
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if not self.dbPath:
+            return None
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.dbPath)), exist_ok=True)
+            db = sqlite3.connect(self.dbPath, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, priority TEXT NOT NULL,"
+                " status TEXT NOT NULL, payload TEXT, data BLOB, result TEXT, error TEXT,"
+                " created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+            )
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _persist(self, job: Dict[str, Any]):
+        if job["kind"] == _SLOT:
+            return
+        try:
+            db = self._connect()
+            if db is None:
+                return
+            if job["status"] == QUEUED:
+                db.execute(
+                    "INSERT OR REPLACE INTO jobs (job_id, kind, priority, status, payload, data, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job["jobId"], job["kind"], job["priority"], QUEUED,
+                     json.dumps(job["_payload"]), job["_data"], job["createdAt"])
+                )
+            else:
+                db.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = ?, started_at = ?, finished_at = ?,"
+                    " data = CASE WHEN ? IS NULL THEN data ELSE NULL END WHERE job_id = ?",
+                    (job["status"], json.dumps(job["result"], default=str) if job["result"] is not None else None,
+                     job["error"], job["startedAt"], job["finishedAt"], job["finishedAt"], job["jobId"])
+                )
+                if job["finishedAt"] is not None:
+                    db.execute("DELETE FROM jobs WHERE finished_at < ?", (time.time() - self.resultTtlSeconds,))
+            db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Job {job['jobId']} persistence failed: {e}")
+
+    def _restore(self):
+        """
+        Re-queues persisted jobs that were queued or running when the process stopped.
+        """
+        try:
+            db = self._connect()
+            if db is None:
+                return
+            rows = db.execute(
+                "SELECT job_id, kind, priority, payload, data, created_at FROM jobs"
+                " WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Job restore failed: {e}")
+            return
+
+        loop = asyncio.get_running_loop()
+        for jobId, kind, priority, payload, data, createdAt in rows:
+            if kind not in self._handlers:
+                logger.warning(f"Job {jobId}: no handler for kind '{kind}', skipped")
+                continue
+            job = {
+                "jobId": jobId, "kind": kind, "status": QUEUED, "priority": priority,
+                "createdAt": createdAt, "startedAt": None, "finishedAt": None,
+                "result": None, "error": None,
+                "_order": next(self._sequence), "_done": loop.create_future(),
+                "_payload": json.loads(payload), "_data": data or b"",
+            }
+            self._persist(job)
+            self._enqueue(job)
+        if rows:
+            logger.info(f"Job queue: re-queued {len(rows)} unfinished jobs")
+
+    def _load(self, jobId: str) -> Optional[Dict[str, Any]]:
+        try:
+            db = self._connect()
+            if db is None:
+                return None
+            row = db.execute(
+                "SELECT kind, priority, status, result, error, created_at, started_at, finished_at"
+                " FROM jobs WHERE job_id = ? AND (finished_at IS NULL OR finished_at >= ?)",
+                (jobId, time.time() - self.resultTtlSeconds)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Job {jobId} lookup failed: {e}")
+            return None
+        if row is None:
+            return None
+        kind, priority, status, result, error, createdAt, startedAt, finishedAt = row
+        return {
+            "jobId": jobId, "kind": kind, "status": status, "priority": priority,
+            "createdAt": createdAt, "startedAt": startedAt, "finishedAt": finishedAt,
+            "result": json.loads(result) if result else None, "error": error,
+        }
+
+
+# Shared queue, started/stopped with the application (see main.py)
+jobQueue = JobQueue()
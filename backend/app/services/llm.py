@@ -0,0 +1,68 @@
+import logging
+import os
+import threading
+from typing import Dict
+
+from app.services.fake_llm import FakeChatModel, FakeGenaiClient
+from dotenv import load_dotenv
+from google import genai
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# "gemini" (default) or "fake": local stand-in for benchmarks/load tests (see services/fake_llm.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+
+# One client per model, shared by every request and agent.
+# Built lazily so importing the app never requires network or an API key.
+_chatModels: Dict[str, ChatGoogleGenerativeAI] = {}
+_genaiClient = None
+_lock = threading.Lock()
+
+
+def getChatModel(model: str) -> ChatGoogleGenerativeAI:
+    """
+    Returns the shared LangChain chat client for `model`, building it on first use.
+    Per-agent generation settings (e.g. temperature) are passed at call time:
+
+        await getChatModel("gemini-2.5-flash").ainvoke(messages, temperature=0.0)
+    """
+    llm = _chatModels.get(model)
+    if llm is None:
+        with _lock:
+            llm = _chatModels.get(model)
+            if llm is None:
+                logger.info(f"Creating shared chat client for {model} ({LLM_BACKEND})")
+                if LLM_BACKEND == "fake":
+                    llm = FakeChatModel(model)
+                else:
+                    llm = ChatGoogleGenerativeAI(
+                        model=model,
+                        google_api_key=os.getenv("GOOGLE_API_KEY")
+                    )
+                _chatModels[model] = llm
+    return llm
+
+
+def getGenaiClient() -> genai.Client:
+    """
+    Returns the shared google-genai client (used for image generation via `client.aio`).
+    """
+    global _genaiClient
+    if _genaiClient is None:
+        with _lock:
+            if _genaiClient is None:
+                logger.info(f"Creating shared google-genai client ({LLM_BACKEND})")
+                if LLM_BACKEND == "fake":
+                    _genaiClient = FakeGenaiClient()
+                else:
+                    _genaiClient = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+    return _genaiClient
+
+
+def isImageBackendConfigured() -> bool:
+    """
+    True if image generation can be attempted (API key set, or the fake backend).
+    """
+    return LLM_BACKEND == "fake" or bool(os.getenv("GOOGLE_API_KEY"))
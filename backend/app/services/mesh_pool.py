@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Worker processes for CPU-bound geometry (0 = run in a thread inside the API process)
+MESH_WORKERS = int(os.getenv("MESH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# Jobs allowed to wait for a free worker before new submissions are rejected
+MESH_QUEUE_LIMIT = int(os.getenv("MESH_QUEUE_LIMIT", "32"))
+MESH_JOB_TIMEOUT_S = float(os.getenv("MESH_JOB_TIMEOUT_S", "30"))
+
+_SHM_MARKER = "__shm__"
+
+
+class MeshPoolFullError(RuntimeError):
+    """Raised when the mesh job queue is at capacity."""
+
+
+def _exportArrays(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Worker side: moves every ndarray of a job result into a shared memory block,
+    so only a small descriptor is pickled back to the API process.
+    """
+    exported = {}
+    for key, value in result.items():
+        if isinstance(value, np.ndarray) and value.nbytes > 0:
+            block = shared_memory.SharedMemory(create=True, size=value.nbytes)
+            np.ndarray(value.shape, dtype=value.dtype, buffer=block.buf)[...] = value
+            exported[key] = {_SHM_MARKER: block.name, "shape": value.shape, "dtype": value.dtype.str}
+            block.close()
+        else:
+            exported[key] = value
+    return exported
+
+
+def _importArrays(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    API side: reads arrays back from shared memory and releases the blocks.
+    """
+    imported = {}
+    for key, value in result.items():
+        if isinstance(value, dict) and _SHM_MARKER in value:
+            block = shared_memory.SharedMemory(name=value[_SHM_MARKER])
+            try:
+                imported[key] = np.ndarray(value["shape"], dtype=np.dtype(value["dtype"]), buffer=block.buf).copy()
+            finally:
+                block.close()
+                block.unlink()
+        else:
+            imported[key] = value
+    return imported
+
+
+def _releaseArrays(result: Dict[str, Any]):
+    for value in result.values():
+        if isinstance(value, dict) and _SHM_MARKER in value:
+            try:
+                block = shared_memory.SharedMemory(name=value[_SHM_MARKER])
+                block.close()
+                block.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _releaseWhenDone(future):
+    # The worker cannot be interrupted: free its shared memory whenever it finishes
+    future.add_done_callback(
+        lambda f: _releaseArrays(f.result()) if not f.cancelled() and f.exception() is None else None)
+
+
+def _initWorker():
+    # Pays the NumPy/numpy-stl import cost and welds the socket templates once per worker,
+    # at startup instead of on the first request
+    import app.geometry.jobs  # noqa: F401
+    from app.geometry.library import baseModelLibrary
+    baseModelLibrary.load()
+
+
+def _warmUp():
+    # Starts the workers (and their initializer) at startup
+    pass
+
+
+def _runJob(fn: Callable[..., Dict[str, Any]], args: tuple, kwargs: dict) -> Dict[str, Any]:
+    return _exportArrays(fn(*args, **kwargs))
+
+
+class MeshWorkerPool:
+    """
+    Process pool for mesh generation/export, so heavy NumPy work never runs on the
+    event loop that serves FastAPI and LangGraph.
+
+    - `workers` processes (spawned, not forked, to stay clear of the loop's threads)
+    - bounded queue: at most `workers + queueLimit` jobs in flight, extra submissions
+      fail fast with MeshPoolFullError
+    - per-job timeout; a job whose caller times out or is cancelled frees its shared
+      memory when the worker finishes
+    - a pool broken by a dead worker is replaced, and the job retried once
+    - job results (dicts) have their ndarrays returned through shared memory
+    """
+
+    def __init__(self, workers: int = MESH_WORKERS, queueLimit: int = MESH_QUEUE_LIMIT,
+                 timeoutS: float = MESH_JOB_TIMEOUT_S):
+        self.workers = workers
+        self.queueLimit = queueLimit
+        self.timeoutS = timeoutS
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.timedOut = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self._executor is None and self.workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_initWorker
+            )
+            for _ in range(self.workers):
+                self._executor.submit(_warmUp)
+            logger.info(f"Mesh worker pool started ({self.workers} workers, queue {self.queueLimit})")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn: Callable[..., Dict[str, Any]], *args, timeoutS: Optional[float] = None,
+                  **kwargs) -> Dict[str, Any]:
+        """
+        Runs `fn(*args, **kwargs)` in a worker and returns its result dict.
+        `fn` must be a module-level function returning a dict (ndarrays allowed).
+        """
+        if self.pending >= max(1, self.workers) + self.queueLimit:
+            self.rejected += 1
+            raise MeshPoolFullError(f"Mesh queue full ({self.pending} jobs pending)")
+
+        self.pending += 1
+        try:
+            if self.workers <= 0:
+                result = await asyncio.wait_for(
+                    asyncio.to_thread(fn, *args, **kwargs), timeout=timeoutS or self.timeoutS)
+                self.completed += 1
+                return result
+
+            for attempt in range(2):
+                self.start()
+                executor = self._executor
+                try:
+                    exported = await self._submit(executor, fn, args, kwargs, timeoutS or self.timeoutS)
+                except BrokenProcessPool:
+                    # A worker died (crash, OOM kill): every later submit would fail too
+                    self._restart(executor)
+                    if attempt:
+                        raise
+                    continue
+                self.completed += 1
+                return _importArrays(exported)
+
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+
+    async def _submit(self, executor: ProcessPoolExecutor, fn: Callable[..., Dict[str, Any]], args: tuple,
+                      kwargs: dict, timeoutS: float) -> Dict[str, Any]:
+        future = executor.submit(_runJob, fn, args, kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeoutS)
+        except asyncio.TimeoutError:
+            self.timedOut += 1
+            _releaseWhenDone(future)
+            raise
+        except asyncio.CancelledError:
+            # The caller went away (client disconnect, cancelled batch item, node deadline)
+            _releaseWhenDone(future)
+            raise
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        # Every job in flight sees the same broken pool: only the first one replaces it
+        if self._executor is broken:
+            logger.warning("Mesh worker pool is broken (a worker died), restarting it")
+            self.restarts += 1
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self.start()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timedOut": self.timedOut,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
+
+
+# Shared pool, started/stopped with the application (see main.py)
+meshPool = MeshWorkerPool()
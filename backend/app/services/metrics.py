@@ -0,0 +1,222 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Prometheus text exposition (format 0.0.4), kept dependency-free: a handful of
+# counters/histograms updated on the hot path with one dict lookup + lock each.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "biostride_"
+
+# List prices in USD per million tokens (input, output), for cost estimates only
+MODEL_PRICES_USD_PER_MTOK = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-image": (0.30, 30.0),
+}
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TRIANGLE_BUCKETS = (1000, 5000, 10000, 25000, 50000, 100000, 250000, 500000)
+
+Sample = Tuple[Dict[str, str], float]
+
+
+def escapeLabel(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def formatLabels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escapeLabel(value)}"' for key, value in labels.items()) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelNames: Tuple[str, ...] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelNames = labelNames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelNames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelNames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelNames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{formatLabels(dict(zip(self.labelNames, key)))} {value:g}" for key, value in items
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelNames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        super().__init__(name, help, labelNames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = self.header()
+        for key, (counts, total) in items:
+            labels = dict(zip(self.labelNames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{formatLabels({**labels, 'le': le})} {cumulative}")
+            lines.append(f"{self.name}_sum{formatLabels(labels)} {total:g}")
+            lines.append(f"{self.name}_count{formatLabels(labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Metrics updated by the app, plus collectors read at scrape time (gauges built
+    from existing stats() of the caches, job queue, gateway...).
+    """
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, List[Sample]]]]] = []
+
+    def counter(self, name: str, help: str, labelNames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labelNames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelNames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DURATION_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelNames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect: Callable[[], Iterable[Tuple[str, str, List[Sample]]]]):
+        """
+        Registers `collect() -> [(name, help, [(labels, value), ...]), ...]`, exported as gauges.
+        """
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for collect in self._collectors:
+            for name, help, samples in collect():
+                lines += [f"# HELP {PREFIX}{name} {help}", f"# TYPE {PREFIX}{name} gauge"]
+                lines += [f"{PREFIX}{name}{formatLabels(labels)} {float(value):g}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+nodeDuration = registry.histogram("node_duration_seconds", "Wall time per graph node run.", ("node",))
+nodeRuns = registry.counter("node_runs_total", "Graph node runs by outcome.", ("node", "status"))
+llmDuration = registry.histogram("llm_request_duration_seconds",
+                                 "Upstream model call latency (quota wait excluded).", ("agent", "model"))
+llmRequests = registry.counter("llm_requests_total",
+                               "Model calls by outcome (ok, error, quota, timeout, circuit_open, coalesced).",
+                               ("agent", "model", "outcome"))
+llmTokens = registry.counter("llm_tokens_total", "Tokens reported by the model's usage metadata.",
+                             ("agent", "model", "direction"))
+llmCost = registry.counter("llm_cost_usd_total", "Estimated model spend at list prices.", ("agent", "model"))
+fallbacks = registry.counter("fallbacks_total", "Agent results replaced by a fallback.", ("agent",))
+speculations = registry.counter("speculative_analyst_runs_total",
+                                "Speculative analyst runs by outcome (VISION_MODE=speculative).", ("outcome",))
+meshTriangles = registry.histogram("mesh_triangles", "Triangles per generated socket mesh.", (),
+                                   buckets=TRIANGLE_BUCKETS)
+
+
+def estimateCost(model: str, inputTokens: int, outputTokens: int) -> float:
+    inputPrice, outputPrice = MODEL_PRICES_USD_PER_MTOK.get(model, (0.0, 0.0))
+    return (inputTokens * inputPrice + outputTokens * outputPrice) / 1e6
+
+
+class RequestTimings:
+    """
+    Per-request breakdown (?timings=true): node wall times and model calls as seen by
+    this request. Bound to the request through `currentTimings`, which graph nodes and
+    their model calls inherit (asyncio copies the context into each task).
+    """
+
+    def __init__(self):
+        self.startedAt = time.perf_counter()
+        self.nodes: List[Dict[str, Any]] = []
+        self.llmCalls: List[Dict[str, Any]] = []
+        self.fallbacks: List[str] = []
+
+    def addNode(self, node: str, seconds: float, status: str):
+        self.nodes.append({"node": node, "ms": round(seconds * 1000, 1), "status": status})
+
+    def addLlmCall(self, agent: str, model: str, seconds: float, inputTokens: int, outputTokens: int,
+                   outcome: str):
+        self.llmCalls.append({
+            "agent": agent, "model": model, "ms": round(seconds * 1000, 1),
+            "inputTokens": inputTokens, "outputTokens": outputTokens, "outcome": outcome,
+        })
+
+    def summary(self) -> Dict[str, Any]:
+        billed = [call for call in self.llmCalls if call["outcome"] == "ok"]
+        inputTokens = sum(call["inputTokens"] for call in billed)
+        outputTokens = sum(call["outputTokens"] for call in billed)
+        return {
+            "totalMs": round((time.perf_counter() - self.startedAt) * 1000, 1),
+            "nodes": self.nodes,
+            "llmCalls": self.llmCalls,
+            "llmMs": round(sum(call["ms"] for call in self.llmCalls), 1),
+            "inputTokens": inputTokens,
+            "outputTokens": outputTokens,
+            "estimatedCostUsd": round(sum(
+                estimateCost(call["model"], call["inputTokens"], call["outputTokens"]) for call in billed), 6),
+            "fallbacks": self.fallbacks,
+        }
+
+
+currentTimings: ContextVar[Optional[RequestTimings]] = ContextVar("currentTimings", default=None)
+
+
+def recordFallback(agent: str):
+    """
+    Called by an agent when it returns fallback data instead of a model result.
+    """
+    fallbacks.inc(agent=agent)
+    timings = currentTimings.get()
+    if timings is not None:
+        timings.fallbacks.append(agent)
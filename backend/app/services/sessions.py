@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Checkpointed design sessions kept for re-design (oldest / idle ones are dropped)
+DESIGN_SESSIONS_MAX = int(os.getenv("DESIGN_SESSIONS_MAX", "64"))
+DESIGN_SESSION_TTL_S = float(os.getenv("DESIGN_SESSION_TTL_S", "3600"))
+
+# Graph branches that read each user input. Vision results never depend on them.
+# Activity only drives the engineering branch (material, wall, guide): the preview image is kept.
+REDESIGN_DEPENDENCIES = {
+    "activityLevel": ("designer",),
+    "limbConfiguration": ("designer", "prompt_engineer"),
+    "userNotes": ("prompt_engineer",),
+}
+
+
+class SessionNotFoundError(KeyError):
+    """Raised for unknown or expired design sessions."""
+
+
+def redesignSteps(current: Dict[str, Any], changes: Dict[str, Any]) -> List[str]:
+    """
+    Returns the branches to re-run for the inputs that actually changed
+    (in graph order: "designer" before "prompt_engineer").
+    """
+    steps = set()
+    for key, value in changes.items():
+        if current.get(key) != value:
+            steps.update(REDESIGN_DEPENDENCIES.get(key, ()))
+    return [step for step in ("designer", "prompt_engineer") if step in steps]
+
+
+class DesignSessions:
+    """
+    Registry of design sessions. Each session is a LangGraph checkpointer thread
+    (thread_id = sessionId) holding the last state of a design run, so a re-design
+    can resume from it instead of repeating the vision and image-generation calls.
+
+    Bounded by count and idle time; evicted threads are deleted from the checkpointer.
+    Runs on the same session are serialized with a per-session lock.
+    """
+
+    def __init__(self, checkpointer, maxSessions: int = DESIGN_SESSIONS_MAX,
+                 ttlSeconds: float = DESIGN_SESSION_TTL_S):
+        self.checkpointer = checkpointer
+        self.maxSessions = maxSessions
+        self.ttlSeconds = ttlSeconds
+        self._lastUsed: "OrderedDict[str, float]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def config(sessionId: str) -> Dict[str, Any]:
+        return {"configurable": {"thread_id": sessionId}}
+
+    def create(self) -> str:
+        sessionId = uuid.uuid4().hex
+        self._lastUsed[sessionId] = time.monotonic()
+        self._locks[sessionId] = asyncio.Lock()
+        self._evict()
+        return sessionId
+
+    def lock(self, sessionId: str) -> asyncio.Lock:
+        """
+        Marks the session as used and returns its lock.
+        """
+        self._evict()
+        if sessionId not in self._lastUsed:
+            raise SessionNotFoundError(sessionId)
+        self._lastUsed[sessionId] = time.monotonic()
+        self._lastUsed.move_to_end(sessionId)
+        return self._locks[sessionId]
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [sid for sid, used in self._lastUsed.items() if now - used > self.ttlSeconds]
+        overflow = max(0, len(self._lastUsed) - len(expired) - self.maxSessions)
+        expired += [sid for sid in self._lastUsed if sid not in expired][:overflow]
+        for sessionId in expired:
+            if self._locks[sessionId].locked():
+                continue  # Run in progress: evicted on a later pass
+            self._lastUsed.pop(sessionId)
+            self._locks.pop(sessionId)
+            self.checkpointer.delete_thread(sessionId)
+            logger.info(f"Design session {sessionId} evicted")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sessions": len(self._lastUsed), "maxSessions": self.maxSessions}
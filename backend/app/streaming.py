@@ -0,0 +1,136 @@
+import asyncio
+import contextlib
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.models.state import AuraState
+from app.services.deadlines import newDeadline
+
+logger = logging.getLogger(__name__)
+
+# State keys pushed to the client as soon as a node produces them
+STREAMED_FIELDS = (
+    "isValidLimb",
+    "subjectType",
+    "anatomicalFeatures",
+    "visualPrompt",
+    "prosthesisImageUrl",
+    "tryOnImageUrl",
+    "designParameters",
+    "stlPath",
+    "previewMeshes",
+    "meshAudit",
+    "safetyNotes",
+    "designReasoning",
+    "alternativeMaterial",
+    "assemblyGuide",
+)
+
+
+def toResponseState(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns a JSON-safe copy of the graph state (internal image handles removed).
+    """
+    response_state = dict(state)
+    response_state.pop("imageBlob", None)
+    response_state.pop("imagePayload", None)
+    return response_state
+
+
+def formatSseEvent(event: str, data: Dict[str, Any]) -> str:
+    """
+    Encodes one Server-Sent Events frame.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def streamDesignEvents(graph, initial_state: AuraState,
+                             config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """
+    Runs the agent graph and yields SSE frames as each node finishes.
+
+    Events:
+        node   -> {node, durationMs, elapsedMs, messages, artifacts}
+        result -> final state (same shape as /api/process-design)
+        error  -> {error}
+    """
+    started = time.perf_counter()
+    nodeStarts: Dict[str, float] = {}
+    sentArtifacts: Dict[str, str] = {}
+
+    try:
+        async for ev in graph.astream_events(initial_state, config, version="v2"):
+            kind = ev["event"]
+            name = ev["name"]
+            metadata = ev.get("metadata", {})
+
+            # Root graph finished: final state
+            if kind == "on_chain_end" and not ev.get("parent_ids"):
+                yield formatSseEvent("result", toResponseState(ev["data"]["output"]))
+                continue
+
+            # Only node-level runs (not the LLM/runnable calls nested inside them)
+            if metadata.get("langgraph_node") != name or len(ev.get("parent_ids", [])) != 1:
+                continue
+
+            if kind == "on_chain_start":
+                nodeStarts[ev["run_id"]] = time.perf_counter()
+                continue
+
+            if kind != "on_chain_end":
+                continue
+
+            now = time.perf_counter()
+            output = ev["data"].get("output") or {}
+            if not isinstance(output, dict):
+                continue
+
+            # Partial artifacts that changed since the last event
+            artifacts = {}
+            for key in STREAMED_FIELDS:
+                if key not in output:
+                    continue
+                snapshot = json.dumps(output[key], default=str, sort_keys=True)
+                if sentArtifacts.get(key) != snapshot:
+                    artifacts[key] = output[key]
+                    sentArtifacts[key] = snapshot
+
+            startedAt = nodeStarts.pop(ev["run_id"], now)
+            yield formatSseEvent("node", {
+                "node": name,
+                "durationMs": round((now - startedAt) * 1000, 1),
+                "elapsedMs": round((now - started) * 1000, 1),
+                # Nodes return only their own (appended) messages
+                "messages": output.get("messages", []),
+                "artifacts": artifacts,
+            })
+
+    except Exception as e:
+        logger.error(f"Error streaming design: {str(e)}", exc_info=True)
+        yield formatSseEvent("error", {"error": str(e)})
+
+
+async def queuedDesignEvents(graph, initial_state: AuraState, config: Optional[Dict[str, Any]],
+                             slot, lock: Optional[asyncio.Lock] = None) -> AsyncIterator[str]:
+    """
+    Waits for a job queue slot (see app/services/jobs.py), reporting the queue position
+    as a `queued` event, then streams the run like streamDesignEvents. The run holds the
+    design session's `lock`, so a re-design of the same session waits for it to finish.
+    """
+    try:
+        slot.enqueue()
+        position = slot.position()
+        if position > 0:
+            yield formatSseEvent("queued", {"position": position})
+        async with slot, lock or contextlib.nullcontext():
+            # The time budget starts once a worker picks the run up
+            initial_state = {**initial_state, "deadline": newDeadline()}
+            async for frame in streamDesignEvents(graph, initial_state, config):
+                yield frame
+    except Exception as e:
+        logger.error(f"Error queueing design stream: {str(e)}", exc_info=True)
+        yield formatSseEvent("error", {"error": str(e)})
+    finally:
+        slot.release()
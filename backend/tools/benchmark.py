@@ -0,0 +1,292 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Allow running as a script from backend/ (python tools/benchmark.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.fake_llm import fakeImageBytes  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "baseline.json")
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """
+    p50/p95/p99/mean/max of a list of milliseconds (nearest-rank).
+    """
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))]
+
+    return {
+        "count": len(ordered),
+        "p50": round(rank(50), 1),
+        "p95": round(rank(95), 1),
+        "p99": round(rank(99), 1),
+        "mean": round(sum(ordered) / len(ordered), 1),
+        "max": round(ordered[-1], 1),
+    }
+
+
+def parseSse(body: str) -> List[Dict[str, Any]]:
+    events = []
+    for frame in body.split("\n\n"):
+        event, data = None, None
+        for line in frame.splitlines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        if event:
+            events.append({"event": event, "data": data})
+    return events
+
+
+def currentRssMb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+async def sampleMemory(samples: List[float], stop: asyncio.Event):
+    while not stop.is_set():
+        rss = currentRssMb()
+        if rss is not None:
+            samples.append(rss)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.1)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def runOne(client: httpx.AsyncClient, index: int, args) -> Dict[str, Any]:
+    """
+    Sends one design request and returns its end-to-end time and per-node durations.
+    """
+    image = fakeImageBytes(0 if args.same_image else index)
+    files = {"image": (f"bench_{index}.jpg", image, "image/jpeg")}
+    data = {"limbConfig": "Below Knee", "activity": ["Walk", "Run"], "notes": ""}
+    path = "/api/process-design/stream" if args.endpoint == "stream" else "/api/process-design?timings=true"
+
+    startedAt = time.perf_counter()
+    try:
+        response = await client.post(path, files=files, data=data)
+    except httpx.HTTPError as e:
+        return {"ok": False, "status": type(e).__name__, "ms": (time.perf_counter() - startedAt) * 1000, "nodes": {}}
+    elapsedMs = (time.perf_counter() - startedAt) * 1000
+
+    nodes: Dict[str, float] = {}
+    ok = response.status_code == 200
+    if ok and args.endpoint == "stream":
+        events = parseSse(response.text)
+        for event in events:
+            if event["event"] == "node":
+                node = event["data"]["node"]
+                nodes[node] = nodes.get(node, 0.0) + event["data"]["durationMs"]
+        ok = any(event["event"] == "result" for event in events)
+    elif ok:
+        for node in response.json().get("timings", {}).get("nodes", []):
+            nodes[node["node"]] = nodes.get(node["node"], 0.0) + node["ms"]
+    return {"ok": ok, "status": response.status_code, "ms": elapsedMs, "nodes": nodes}
+
+
+async def runBenchmark(args) -> Dict[str, Any]:
+    inProcess = not args.url
+    gatewayStats = None
+
+    async def drive(client: httpx.AsyncClient):
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(index: int):
+            async with semaphore:
+                return await runOne(client, index, args)
+
+        for index in range(args.warmup):
+            await runOne(client, -1 - index, args)
+        startedAt = time.perf_counter()
+        results = await asyncio.gather(*[bounded(index) for index in range(args.requests)])
+        return results, time.perf_counter() - startedAt
+
+    memorySamples: List[float] = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sampleMemory(memorySamples, stop))
+    timeout = httpx.Timeout(args.timeout)
+
+    if inProcess:
+        from app.main import app
+        from app.services.gateway import llmGateway
+
+        # ASGI transport skips the lifespan: run it here (library load, mesh pool, job queue)
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=timeout) as client:
+                results, wallSeconds = await drive(client)
+        gatewayStats = {key: value for key, value in llmGateway.stats().items() if not isinstance(value, dict)}
+    else:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout) as client:
+            results, wallSeconds = await drive(client)
+
+    stop.set()
+    await sampler
+
+    nodeTimes: Dict[str, List[float]] = {}
+    for result in results:
+        for node, ms in result["nodes"].items():
+            nodeTimes.setdefault(node, []).append(ms)
+    statusCounts: Dict[str, int] = {}
+    for result in results:
+        statusCounts[str(result["status"])] = statusCounts.get(str(result["status"]), 0) + 1
+    succeeded = [result for result in results if result["ok"]]
+
+    return {
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "endpoint": args.endpoint,
+            "sameImage": args.same_image,
+            "target": args.url or "in-process",
+            **(serverSettings() if inProcess else {}),
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "commit": gitCommit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "endToEndMs": percentiles([result["ms"] for result in succeeded]),
+        "nodesMs": {node: percentiles(times) for node, times in sorted(nodeTimes.items())},
+        "throughputRps": round(len(succeeded) / wallSeconds, 3) if wallSeconds else 0.0,
+        "wallSeconds": round(wallSeconds, 2),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "statusCodes": statusCounts,
+        "memoryMb": {
+            "peakRss": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if inProcess else None,
+            "meanRss": round(sum(memorySamples) / len(memorySamples), 1) if memorySamples and inProcess else None,
+        },
+        "gateway": gatewayStats,
+    }
+
+
+def serverSettings() -> Dict[str, Any]:
+    """
+    Effective settings of the in-process app that shape the numbers.
+    """
+    from app import graph
+    from app.services import fake_llm, gateway, jobs, llm, mesh_pool
+
+    return {
+        "llmBackend": llm.LLM_BACKEND,
+        "fakeLatency": fake_llm.FAKE_LLM_LATENCY,
+        "fakeImageLatency": fake_llm.FAKE_LLM_IMAGE_LATENCY,
+        "fakeErrorRate": fake_llm.FAKE_LLM_ERROR_RATE,
+        "llmDefaultRpm": gateway.LLM_DEFAULT_RPM,
+        "jobWorkers": jobs.JOB_WORKERS,
+        "meshWorkers": mesh_pool.MESH_WORKERS,
+        "visionMode": graph.VISION_MODE,
+    }
+
+
+def gitCommit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Lists regressions beyond `tolerance` (0.25 = 25%): slower p95s, lower throughput, new failures.
+    """
+    regressions = []
+
+    def check(label: str, current: Optional[float], previous: Optional[float], higherIsWorse: bool = True):
+        if not current or not previous:
+            return
+        change = (current - previous) / previous
+        print(f"  {label:<32} {previous:>10.1f} -> {current:>10.1f}  ({change:+.0%})")
+        if (change if higherIsWorse else -change) > tolerance:
+            regressions.append(f"{label}: {previous:.1f} -> {current:.1f} ({change:+.0%})")
+
+    print("Comparison with baseline:")
+    check("end-to-end p95 (ms)", result["endToEndMs"].get("p95"), baseline.get("endToEndMs", {}).get("p95"))
+    check("end-to-end p50 (ms)", result["endToEndMs"].get("p50"), baseline.get("endToEndMs", {}).get("p50"))
+    for node, stats in result["nodesMs"].items():
+        check(f"{node} p95 (ms)", stats.get("p95"), baseline.get("nodesMs", {}).get(node, {}).get("p95"))
+    check("throughput (req/s)", result["throughputRps"], baseline.get("throughputRps"), higherIsWorse=False)
+    check("peak RSS (MB)", result["memoryMb"].get("peakRss"), baseline.get("memoryMb", {}).get("peakRss"))
+    if result["failed"] > baseline.get("failed", 0):
+        regressions.append(f"failed requests: {baseline.get('failed', 0)} -> {result['failed']}")
+    return regressions
+
+
+def printSummary(result: Dict[str, Any]):
+    e2e = result["endToEndMs"]
+    print(f"{result['succeeded']} ok / {result['failed']} failed in {result['wallSeconds']}s "
+          f"-> {result['throughputRps']} req/s, peak RSS {result['memoryMb']['peakRss']} MB")
+    if e2e:
+        print(f"  {'end-to-end':<20} p50 {e2e['p50']:>9.1f}  p95 {e2e['p95']:>9.1f}  p99 {e2e['p99']:>9.1f} ms")
+    for node, stats in result["nodesMs"].items():
+        print(f"  {node:<20} p50 {stats['p50']:>9.1f}  p95 {stats['p95']:>9.1f}  p99 {stats['p99']:>9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test for the design pipeline. By default runs the app in-process against the "
+                    "local Gemini stand-in (LLM_BACKEND=fake), so no API quota is used.")
+    parser.add_argument("-n", "--requests", type=int, default=20)
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=1, help="Requests sent (and ignored) before measuring")
+    parser.add_argument("--endpoint", choices=("stream", "sync"), default="stream",
+                        help="stream: per-node timings from SSE events; sync: from the ?timings=true breakdown")
+    parser.add_argument("--same-image", action="store_true", help="Reuse one image (measures the cached path)")
+    parser.add_argument("--url", help="Benchmark a running server instead (start it with LLM_BACKEND=fake)")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help=f"Write results as a new baseline (e.g. {DEFAULT_BASELINE})")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE,
+                        help="Compare with a baseline file; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    if not args.url:
+        os.environ.setdefault("LLM_BACKEND", "fake")
+        # The stand-in has no quota: measure the pipeline, not the gateway's rate limits
+        # (set LLM_DEFAULT_RPM / LLM_MODEL_RPM explicitly to benchmark them)
+        os.environ.setdefault("LLM_DEFAULT_RPM", "0")
+
+    result = asyncio.run(runBenchmark(args))
+    printSummary(result)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
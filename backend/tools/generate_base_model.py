@@ -1,53 +1,32 @@
+import json
 import os
+import sys
 
 import numpy as np
-from stl import mesh
 
+# Allow running as a script from backend/ (python tools/generate_base_model.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-def createBaseCylinder(filename="base_socket.stl", radius=50, height=200):
+from app.geometry.socket import buildSocketMesh, saveBinaryStl  # noqa: E402
+
+
+def createBaseCylinder(filename="base_socket.stl", radius=50, height=200, wallThickness=5.0,
+                       subjectType="ANY", limbConfiguration="ANY", angularSegments=96, axialSegments=48):
     """
-    Creates a simple cylinder mesh to serve as a base prosthetic socket model.
+    Creates a cylindrical socket mesh to serve as a base prosthetic socket model.
+    Uses the same vectorized generator as the Design Engineer (app/geometry/socket.py)
+    and registers its nominal size in index.json for the base model library.
     Saved to backend/assets/base_models/
     """
-    # Create 8 vertices for a simplified rectangular prism (approximating a cylinder for MVP)
-    # A real cylinder would use more vertices, but this is enough to prove numpy-stl works.
-    # Actually, let's just make a cube for simplicity of generation,
-    # or use numpy-stl's functionality if available,
-    # but manually defining vertices is safer without external deps for generation logic.
-
-    # Let's make a simple box for the "socket"
-    # width = 2*radius, depth = 2*radius
-
-    w = radius
-    h = height
-
-    # Define the 8 vertices of a cube centered at 0,0,0 for X-Y
-    vertices = np.array([
-        [-w, -w, 0],
-        [+w, -w, 0],
-        [+w, +w, 0],
-        [-w, +w, 0],
-        [-w, -w, h],
-        [+w, -w, h],
-        [+w, +w, h],
-        [-w, +w, h],
-    ])
-
-    # Define the 12 triangles composing the cube
-    faces = np.array([
-        [0, 3, 1], [1, 3, 2],  # Bottom
-        [0, 4, 7], [0, 7, 3],  # Left
-        [4, 5, 6], [4, 6, 7],  # Top
-        [5, 1, 2], [5, 2, 6],  # Right
-        [2, 3, 6], [3, 7, 6],  # Back
-        [0, 1, 5], [0, 5, 4]  # Front
-    ])
-
-    # Create the mesh
-    socketMesh = mesh.Mesh(np.zeros(faces.shape[0], dtype=mesh.Mesh.dtype))
-    for i, f in enumerate(faces):
-        for j in range(3):
-            socketMesh.vectors[i][j] = vertices[f[j], :]
+    circumference = 2 * np.pi * radius
+    vertices, faces = buildSocketMesh(
+        stumpLengthMm=height,
+        circumferenceMm=circumference,
+        shape="cylindrical",
+        wallThicknessMm=wallThickness,
+        angularSegments=angularSegments,
+        axialSegments=axialSegments
+    )
 
     # Ensure directory exists
     # Go up one level from 'tools' to 'backend', then into 'assets/base_models'
@@ -55,8 +34,24 @@ def createBaseCylinder(filename="base_socket.stl", radius=50, height=200):
     os.makedirs(saveDir, exist_ok=True)
 
     savePath = os.path.join(saveDir, filename)
-    socketMesh.save(savePath)
-    print(f"Base model created at: {savePath}")
+    triangles = saveBinaryStl(vertices, faces, savePath)
+    print(f"Base model created at: {savePath} ({triangles} triangles)")
+
+    # Library metadata (nominal inner cavity size) used by app/geometry/library.py
+    indexPath = os.path.join(saveDir, "index.json")
+    index = {}
+    if os.path.exists(indexPath):
+        with open(indexPath) as f:
+            index = json.load(f)
+    index[filename] = {
+        "subjectType": subjectType,
+        "limbConfiguration": limbConfiguration,
+        "lengthMm": float(height),
+        "circumferenceMm": round(float(circumference), 2),
+        "wallThicknessMm": float(wallThickness)
+    }
+    with open(indexPath, "w") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
 
 
 if __name__ == "__main__":
@@ -68,9 +68,14 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Update Parameter Box (Bottom Left)
     if (data.designParameters) {
+        const print = data.designParameters.print;
+        const printLine = print
+            ? `<br><span class="text-xs text-google-subtext font-normal">~${print.massG}g · $${print.costUsd} · ${print.printTimeH}h print</span>`
+            : '';
         materialLabel.innerHTML = `
             ${primaryMat} <br>
             <span class="text-xs text-google-subtext font-normal">Wall: ${data.designParameters.wallThicknessMm}mm</span>
+            ${printLine}
         `;
     }
 
@@ -150,45 +155,59 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 
     // 4. Update / Iteration Handler
+    // Sends the request as new notes to the design session: the backend re-runs only
+    // the affected agents (here Prompt Engineer -> Visualizer) and reuses the rest.
+    const updateBtn = document.getElementById('updateBtn');
+    const promptInput = document.getElementById('promptInput');
+
     updateBtn.addEventListener('click', async () => {
         const text = promptInput.value.trim();
         if (!text) return;
 
+        if (!data.sessionId) {
+            alert("This design has no session to update. Please generate it again from the studio.");
+            return;
+        }
+
         // Visual Feedback
         updateBtn.disabled = true;
         updateBtn.innerHTML = '<i class="fa-solid fa-spinner animate-spin"></i>';
 
-        // Add log to small terminal
-        const p = document.createElement('div');
-        p.className = "text-blue-400 text-xs mb-1";
-        p.innerText = `> Iterating: "${text}"...`;
-        logsArea.appendChild(p);
-
         try {
-            // We now assume using the same endpoint but passing current state would be ideal behavior.
-            // For this UI demo, we simulate the agent processing the "Iron Man" request.
-
-            setTimeout(() => {
-                const successMsg = document.createElement('div');
-                successMsg.className = "text-green-400 text-xs mb-1";
-                successMsg.innerText = `> Designer: Updated specs based on input.`;
-                logsArea.appendChild(successMsg);
-
-                updateBtn.disabled = false;
-                updateBtn.innerHTML = 'Update';
-                promptInput.value = '';
-
-                // Here we would update generatedImage.src with the new URL from backend
-                // generatedImage.src = response.newUrl;
-                alert(`Agent Response: "I have updated the design with ${text} style while maintaining biomechanical constraints."`);
-
-            }, 1500);
+            const formData = new FormData();
+            formData.append('notes', text);
+
+            const response = await fetch(`/api/designs/${data.sessionId}`, {
+                method: 'PATCH',
+                body: formData
+            });
+            const result = await response.json();
+            if (!response.ok) {
+                throw new Error(result.error || `Server error ${response.status}`);
+            }
+
+            // Keep the updated design for reloads
+            Object.assign(data, result);
+            localStorage.setItem('auraDesignData', JSON.stringify(data));
+
+            if (result.prosthesisImageUrl) {
+                generatedImage.src = result.prosthesisImageUrl;
+            }
+            const lastMessage = (result.messages || []).slice(-1)[0];
+            agentNote.textContent = `"${lastMessage || 'Design updated.'}"`;
+            promptInput.value = '';
 
         } catch (e) {
             console.error(e);
+            alert(`Update failed: ${e.message}`);
+        } finally {
             updateBtn.disabled = false;
-            updateBtn.innerHTML = 'Update';
+            updateBtn.innerHTML = '<i class="fa-solid fa-arrow-up"></i>';
         }
     });
 
+    promptInput.addEventListener('keydown', (event) => {
+        if (event.key === 'Enter') updateBtn.click();
+    });
+
 });
@@ -74,6 +74,55 @@ document.addEventListener('DOMContentLoaded', () => {
         logsArea.scrollTop = logsArea.scrollHeight;
     }
 
+    // Parses a text/event-stream body and calls onEvent(eventName, jsonData) per frame
+    async function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let payload = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) payload += line.slice(5).trim();
+                });
+                if (payload) onEvent(event, JSON.parse(payload));
+            }
+        }
+    }
+
+    function onDesignReady(data) {
+        if (data.error) {
+            addLog("Error: " + data.error, 'error');
+            return;
+        }
+
+        addLog("SUCCESS: Design Generated. Redirecting...", 'green');
+
+        // Save Result Data and Original Image (Preview) to move to the next page
+        localStorage.setItem('auraDesignData', JSON.stringify(data));
+
+        // We also need the original image. Since we can't easily pass the File object,
+        // we rely on the DataURI we generated for the preview.
+        const previewSrc = document.getElementById('imagePreview').src;
+        localStorage.setItem('auraOriginalImage', previewSrc);
+
+        // Simulation Delay to let user read "SUCCESS"
+        setTimeout(() => {
+            window.location.href = 'editor.html';
+        }, 1500);
+    }
+
     form.addEventListener('submit', async (e) => {
         e.preventDefault();
 
@@ -110,32 +159,28 @@ document.addEventListener('DOMContentLoaded', () => {
 
         try {
             addLog("Sending data to Google Cloud (Backend)...");
-            const response = await fetch('/api/process-design', {
+            const response = await fetch('/api/process-design/stream', {
                 method: 'POST',
                 body: formData
             });
 
-            const data = await response.json();
-
-            if (response.ok) {
-                addLog("SUCCESS: Design Generated. Redirecting...", 'green');
-
-                // Save Result Data and Original Image (Preview) to move to the next page
-                localStorage.setItem('auraDesignData', JSON.stringify(data));
-
-                // We also need the original image. Since we can't easily pass the File object,
-                // we rely on the DataURI we generated for the preview.
-                const previewSrc = document.getElementById('imagePreview').src;
-                localStorage.setItem('auraOriginalImage', previewSrc);
-
-                // Simulation Delay to let user read "SUCCESS"
-                setTimeout(() => {
-                    window.location.href = 'editor.html';
-                }, 1500);
-
-            } else {
+            if (!response.ok) {
+                const data = await response.json();
                 addLog("Error: " + JSON.stringify(data), 'error');
+                return;
             }
+
+            // Agents report progress as Server-Sent Events while the graph runs
+            await readEventStream(response, (event, data) => {
+                if (event === 'node') {
+                    data.messages.forEach(msg => addLog(msg));
+                    addLog(`System: ${data.node} finished in ${(data.durationMs / 1000).toFixed(1)}s`);
+                } else if (event === 'result') {
+                    onDesignReady(data);
+                } else if (event === 'error') {
+                    addLog("Error: " + data.error, 'error');
+                }
+            });
         } catch (err) {
             addLog("Network Error: " + err.message, 'error');
         }